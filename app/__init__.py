@@ -17,12 +17,14 @@ login_manager = LoginManager()
 csrf = CSRFProtect()
 
 
-def create_app(config_name=None):
+def create_app(config_name=None, config_overrides=None):
     """
     Application Factory Pattern
 
     Args:
         config_name: Nome da configuração ('development', 'production', 'testing')
+        config_overrides: Dicionário opcional aplicado sobre a configuração antes
+                          de inicializar as extensões (ex: processos auxiliares)
 
     Returns:
         Flask app instance
@@ -35,6 +37,9 @@ def create_app(config_name=None):
 
     from app.config import config
     app.config.from_object(config[config_name])
+    app.config['CONFIG_NAME'] = config_name
+    if config_overrides:
+        app.config.update(config_overrides)
 
     # Inicializar extensões
     db.init_app(app)
@@ -90,6 +95,14 @@ def create_app(config_name=None):
             'csrf_token': generate_csrf
         }
 
+    # Níveis de acesso memorizados valem apenas para a requisição corrente
+    from app.services.permission_service import PermissionService
+    app.teardown_request(PermissionService.limpar_cache)
+
+    # Gravação da auditoria em segundo plano
+    from app.services.auditoria_service import AuditoriaService
+    AuditoriaService.init_app(app)
+
     # Criar diretórios necessários
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
@@ -13,6 +13,8 @@ class Config:
 
     # Sessão
     PERMANENT_SESSION_LIFETIME = timedelta(hours=24)
+    # Segundos em que identidade, perfil e status do usuário são lidos da sessão sem consultar o banco
+    USUARIO_CACHE_TTL = int(os.environ.get('USUARIO_CACHE_TTL', 60))
     SESSION_COOKIE_SECURE = True
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SAMESITE = 'Lax'
@@ -21,6 +23,44 @@ class Config:
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads')
 
+    # Cache de PDFs de avaliações concluídas (default: <UPLOAD_FOLDER>/cache_pdf)
+    PDF_CACHE_FOLDER = os.environ.get('PDF_CACHE_FOLDER')
+
+    # PDFs maiores que este limite são gravados em disco durante o envio
+    # (a renderização pelo ReportLab continua ocorrendo em memória)
+    PDF_SPOOL_MAX_BYTES = int(os.environ.get('PDF_SPOOL_MAX_BYTES', 1024 * 1024))
+
+    # Exportação em lote de relatórios (ZIP)
+    EXPORTACAO_FOLDER = os.environ.get('EXPORTACAO_FOLDER')  # default: <UPLOAD_FOLDER>/exportacoes
+    EXPORTACAO_PROCESSOS = int(os.environ.get('EXPORTACAO_PROCESSOS', 2))  # 0 = gera os PDFs no próprio processo
+    EXPORTACAO_LIMITE_SINCRONO = int(os.environ.get('EXPORTACAO_LIMITE_SINCRONO', 50))
+    # Exportações sem progresso há mais tempo que isto são consideradas interrompidas (minutos)
+    EXPORTACAO_TEMPO_MAXIMO = int(os.environ.get('EXPORTACAO_TEMPO_MAXIMO', 120))
+
+    # Máximo de avaliações exibidas no gráfico de evolução (históricos maiores são amostrados)
+    EVOLUCAO_MAX_PONTOS = int(os.environ.get('EVOLUCAO_MAX_PONTOS', 60))
+
+    # Auditoria de acessos: 'assincrono' grava em lote por uma thread; 'sincrono' grava na requisição
+    AUDITORIA_MODO = os.environ.get('AUDITORIA_MODO', 'assincrono')
+    AUDITORIA_LOTE = int(os.environ.get('AUDITORIA_LOTE', 200))
+    AUDITORIA_INTERVALO = float(os.environ.get('AUDITORIA_INTERVALO', 2.0))  # segundos
+    # Ações gravadas sempre de forma síncrona (trilha exigida pela LGPD)
+    AUDITORIA_ACOES_SINCRONAS = (
+        'acesso_negado', 'excluir', 'exportar', 'exportar_pdf', 'download',
+        'compartilhar', 'vincular_responsavel', 'desvincular_responsavel',
+    )
+
+    # Retenção da auditoria: meses mantidos no banco antes de arquivar em JSONL compactado
+    AUDITORIA_RETENCAO_MESES = int(os.environ.get('AUDITORIA_RETENCAO_MESES', 24))
+    AUDITORIA_ARQUIVO_FOLDER = os.environ.get('AUDITORIA_ARQUIVO_FOLDER')  # default: <UPLOAD_FOLDER>/auditoria
+    AUDITORIA_PARTICOES_FUTURAS = int(os.environ.get('AUDITORIA_PARTICOES_FUTURAS', 3))
+
+    # Sincronização de respostas capturadas offline: máximo de itens por lote
+    SINCRONIZACAO_MAX_ITENS = int(os.environ.get('SINCRONIZACAO_MAX_ITENS', 500))
+
+    # Busca incremental (autocomplete) de pacientes e avaliadores: máximo de sugestões
+    AUTOCOMPLETE_MAX_RESULTADOS = int(os.environ.get('AUTOCOMPLETE_MAX_RESULTADOS', 20))
+
     # Localização
     BABEL_DEFAULT_LOCALE = 'pt_BR'
     BABEL_DEFAULT_TIMEZONE = 'America/Sao_Paulo'
@@ -50,6 +90,8 @@ class TestingConfig(Config):
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'  # Use SQLite in-memory for tests
     WTF_CSRF_ENABLED = False
     SESSION_COOKIE_SECURE = False
+    EXPORTACAO_PROCESSOS = 0
+    AUDITORIA_MODO = 'sincrono'
 
 
 config = {
@@ -4,10 +4,13 @@ Modelos de dados SPM-TO
 from app.models.user import User
 from app.models.paciente import Paciente, paciente_responsavel
 from app.models.instrumento import Instrumento, Dominio, Questao, TabelaReferencia
-from app.models.avaliacao import Avaliacao, Resposta
+from app.models.avaliacao import Avaliacao, Resposta, SincronizacaoResposta
 from app.models.plano import PlanoTemplateItem, PlanoItem
-from app.models.auditoria import AuditoriaAcesso, CompartilhamentoPaciente
+from app.models.auditoria import AuditoriaAcesso, CompartilhamentoPaciente, ResumoAcessoDiario
 from app.models.anexo import AnexoAvaliacao
+from app.models.exportacao import ExportacaoRelatorio
+from app.models.resultado import ResultadoDominio
+from app.models.acesso import AcessoPaciente
 
 # Novos modelos - Arquitetura modular e prontuário
 from app.models.modulo import Modulo
@@ -26,11 +29,16 @@ __all__ = [
     'TabelaReferencia',
     'Avaliacao',
     'Resposta',
+    'SincronizacaoResposta',
     'PlanoTemplateItem',
     'PlanoItem',
     'AuditoriaAcesso',
     'CompartilhamentoPaciente',
+    'ResumoAcessoDiario',
     'AnexoAvaliacao',
+    'ExportacaoRelatorio',
+    'ResultadoDominio',
+    'AcessoPaciente',
     # Novos modelos
     'Modulo',
     'Prontuario',
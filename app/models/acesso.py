@@ -0,0 +1,28 @@
+"""
+Modelo de Acesso a Pacientes - concessões materializadas por usuário
+"""
+from app import db
+
+
+class AcessoPaciente(db.Model):
+    """
+    Nível de acesso efetivo de um usuário a um paciente
+
+    Tabela derivada das concessões (criador, vínculo, avaliações e compartilhamentos
+    ativos), mantida pelo AcessoPacienteService na mesma transação que as altera.
+    Permite filtrar listagens com um único join indexado.
+    """
+    __tablename__ = 'acesso_paciente'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    paciente_id = db.Column(db.Integer, db.ForeignKey('pacientes.id', ondelete='CASCADE'), primary_key=True)
+
+    # Índice em PermissionService.NIVEIS: 1=leitura, 2=edicao, 3=completo
+    nivel = db.Column(db.SmallInteger, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_acesso_paciente_paciente_id', 'paciente_id'),
+    )
+
+    def __repr__(self):
+        return f'<AcessoPaciente U:{self.user_id} P:{self.paciente_id} nivel={self.nivel}>'
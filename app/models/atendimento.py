@@ -71,6 +71,11 @@ class Atendimento(db.Model):
     data_atualizacao = db.Column(db.DateTime, default=datetime.utcnow,
                                   onupdate=datetime.utcnow, nullable=False)
 
+    # Chave da paginação da listagem do paciente (mais recentes primeiro)
+    __table_args__ = (
+        db.Index('ix_atendimentos_paciente_data_id', 'paciente_id', 'data_hora', 'id'),
+    )
+
     # Relacionamentos
     prontuario = db.relationship('Prontuario', back_populates='atendimentos')
     paciente = db.relationship('Paciente', backref=db.backref('atendimentos', lazy='dynamic'))
@@ -30,6 +30,13 @@ class AuditoriaAcesso(db.Model):
     # Timestamp
     data_acesso = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
 
+    # Consultas de revisão de acesso filtram por paciente ou usuário dentro de um período.
+    # No Postgres a tabela é particionada por mês em data_acesso (ver AuditoriaService).
+    __table_args__ = (
+        db.Index('ix_auditoria_acessos_paciente_data', 'paciente_id', 'data_acesso'),
+        db.Index('ix_auditoria_acessos_user_data', 'user_id', 'data_acesso'),
+    )
+
     # Relacionamentos
     user = db.relationship('User', backref='acessos_auditados')
     paciente = db.relationship('Paciente', backref='auditorias_acesso')
@@ -62,6 +69,7 @@ class CompartilhamentoPaciente(db.Model):
     # Timestamps
     data_compartilhamento = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     data_revogacao = db.Column(db.DateTime)
+    data_expiracao = db.Column(db.DateTime)  # Revogado automaticamente pela varredura após esta data
 
     # Motivo/observações
     motivo = db.Column(db.Text)
@@ -73,3 +81,41 @@ class CompartilhamentoPaciente(db.Model):
 
     def __repr__(self):
         return f'<CompartilhamentoPaciente P:{self.paciente_id} -> U:{self.recebeu_user_id}>'
+
+    # Índices parciais: o histórico de revogados cresce sem pesar nas consultas de acesso
+    __table_args__ = (
+        db.Index('ix_compartilhamentos_ativos_recebeu', 'recebeu_user_id', 'paciente_id',
+                 postgresql_where=db.text('ativo'), sqlite_where=db.text('ativo')),
+        db.Index('ix_compartilhamentos_ativos_expiracao', 'data_expiracao',
+                 postgresql_where=db.text('ativo AND data_expiracao IS NOT NULL'),
+                 sqlite_where=db.text('ativo AND data_expiracao IS NOT NULL')),
+    )
+
+
+class ResumoAcessoDiario(db.Model):
+    """
+    Resumo diário dos acessos por (usuário, paciente, ação)
+
+    Construído incrementalmente a partir de auditoria_acessos pelo
+    RelatorioAcessoService; atende às revisões de acesso sem varrer a auditoria.
+    """
+    __tablename__ = 'resumos_acesso_diario'
+
+    id = db.Column(db.Integer, primary_key=True)
+    data = db.Column(db.Date, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    paciente_id = db.Column(db.Integer, db.ForeignKey('pacientes.id', ondelete='CASCADE'), nullable=False)
+    acao = db.Column(db.String(50), nullable=False)
+
+    total = db.Column(db.Integer, nullable=False, default=0)
+    primeiro_acesso = db.Column(db.DateTime, nullable=False)
+    ultimo_acesso = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('data', 'user_id', 'paciente_id', 'acao', name='uq_resumo_acesso_diario'),
+        db.Index('ix_resumos_acesso_paciente_data', 'paciente_id', 'data'),
+        db.Index('ix_resumos_acesso_user_data', 'user_id', 'data'),
+    )
+
+    def __repr__(self):
+        return f'<ResumoAcessoDiario {self.data} U:{self.user_id} P:{self.paciente_id} {self.acao}={self.total}>'
@@ -17,7 +17,7 @@ class Avaliacao(db.Model):
     avaliador_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
 
     # Informações da avaliação (espelhando o cabeçalho das planilhas)
-    data_avaliacao = db.Column(db.Date, nullable=False, index=True)
+    data_avaliacao = db.Column(db.Date, nullable=False)
     relacionamento_respondente = db.Column(db.String(100), nullable=False, default='Responsavel')
     # Ex: 'pai', 'mãe', 'professor', 'terapeuta'
 
@@ -61,11 +61,22 @@ class Avaliacao(db.Model):
     t_score_tot = db.Column(db.Integer)
     classificacao_tot = db.Column(db.String(50))
 
+    # Progresso (mantido pelo RespostaService a cada gravação de respostas)
+    questoes_respondidas = db.Column(db.Integer, default=0, nullable=False, server_default='0')
+    total_questoes = db.Column(db.Integer, default=0, nullable=False, server_default='0')
+
     # Auditoria
     data_criacao = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     data_atualizacao = db.Column(db.DateTime, default=datetime.utcnow,
                                   onupdate=datetime.utcnow, nullable=False)
     data_conclusao = db.Column(db.DateTime)
+    # Última extração dos resultados por domínio (mesmo sem nenhum resultado, ex: COPM sem problemas)
+    data_resultados = db.Column(db.DateTime)
+
+    # Chave da paginação da listagem (mais recentes primeiro)
+    __table_args__ = (
+        db.Index('ix_avaliacoes_data_id', 'data_avaliacao', 'id'),
+    )
 
     # Relacionamentos
     paciente = db.relationship('Paciente', back_populates='avaliacoes')
@@ -75,6 +86,8 @@ class Avaliacao(db.Model):
                                 lazy='dynamic', cascade='all, delete-orphan')
     plano_itens = db.relationship('PlanoItem', back_populates='avaliacao',
                                   lazy='dynamic', cascade='all, delete-orphan')
+    sincronizacoes = db.relationship('SincronizacaoResposta', back_populates='avaliacao',
+                                     lazy='dynamic', cascade='all, delete-orphan')
 
     def calcular_escores(self):
         """
@@ -103,10 +116,18 @@ class Avaliacao(db.Model):
         Returns:
             bool: True se completa
         """
-        total_questoes = sum([d.questoes.filter_by(ativo=True).count()
-                             for d in self.instrumento.dominios.filter_by(ativo=True)])
-        total_respostas = self.respostas.count()
-        return total_respostas >= total_questoes
+        return self.questoes_respondidas >= self.total_questoes
+
+    def get_progresso_percentual(self):
+        """
+        Percentual de questões ativas respondidas
+
+        Returns:
+            int: 0 a 100
+        """
+        if not self.total_questoes:
+            return 0
+        return min(100, int(self.questoes_respondidas / self.total_questoes * 100))
 
     def __repr__(self):
         return f'<Avaliacao {self.id} - Paciente {self.paciente_id}>'
@@ -137,6 +158,9 @@ class Resposta(db.Model):
     data_atualizacao = db.Column(db.DateTime, default=datetime.utcnow,
                                   onupdate=datetime.utcnow, nullable=False)
 
+    # Momento em que a resposta foi dada (no dispositivo, para respostas sincronizadas)
+    registrado_em = db.Column(db.DateTime)
+
     # Relacionamentos
     avaliacao = db.relationship('Avaliacao', back_populates='respostas')
     questao = db.relationship('Questao', back_populates='respostas')
@@ -148,3 +172,37 @@ class Resposta(db.Model):
 
     def __repr__(self):
         return f'<Resposta Q{self.questao_id}: {self.valor}>'
+
+
+class SincronizacaoResposta(db.Model):
+    """
+    Item de resposta recebido de um dispositivo (captura offline)
+
+    A chave de idempotência gerada pelo cliente garante que um item reenviado
+    não seja aplicado duas vezes; o resultado original é devolvido.
+    """
+    __tablename__ = 'sincronizacoes_resposta'
+
+    id = db.Column(db.Integer, primary_key=True)
+    chave = db.Column(db.String(64), nullable=False)
+    avaliacao_id = db.Column(db.Integer, db.ForeignKey('avaliacoes.id', ondelete='CASCADE'),
+                             nullable=False)
+    questao_id = db.Column(db.Integer, nullable=False)  # 0 quando o item não traz uma questão válida
+    valor = db.Column(db.String(20))  # Nulo em itens rejeitados
+
+    # 'aplicada', 'conflito' (resposta do servidor mais recente) ou 'rejeitada'
+    resultado = db.Column(db.String(20), nullable=False)
+
+    registrado_em = db.Column(db.DateTime)  # Relógio do dispositivo
+    recebido_em = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    avaliacao = db.relationship('Avaliacao', back_populates='sincronizacoes')
+
+    # A chave é única por avaliação (o índice também atende às consultas por avaliação)
+    __table_args__ = (
+        db.UniqueConstraint('avaliacao_id', 'chave',
+                           name='uq_sincronizacao_avaliacao_chave'),
+    )
+
+    def __repr__(self):
+        return f'<SincronizacaoResposta {self.chave} Q{self.questao_id}: {self.resultado}>'
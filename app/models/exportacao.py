@@ -0,0 +1,77 @@
+"""
+Modelo de Exportação em Lote de Relatórios
+"""
+from datetime import datetime
+from app import db
+
+
+class ExportacaoRelatorio(db.Model):
+    """Registro de uma exportação em lote de relatórios em PDF (arquivo ZIP)"""
+    __tablename__ = 'exportacoes_relatorio'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+
+    # Filtros usados na seleção (escola, data_inicio, data_fim, avaliador_id)
+    filtros = db.Column(db.JSON)
+
+    # Status: 'pendente', 'processando', 'concluida', 'erro'
+    status = db.Column(db.String(20), nullable=False, default='pendente')
+
+    STATUS_PENDENTE = 'pendente'
+    STATUS_PROCESSANDO = 'processando'
+    STATUS_CONCLUIDA = 'concluida'
+    STATUS_ERRO = 'erro'
+
+    # Execução em segundo plano (seleções grandes) ou em streaming direto
+    em_segundo_plano = db.Column(db.Boolean, default=False, nullable=False)
+
+    # Progresso
+    total_avaliacoes = db.Column(db.Integer, default=0, nullable=False)
+    avaliacoes_processadas = db.Column(db.Integer, default=0, nullable=False)
+
+    # Arquivo gerado (somente exportações em segundo plano)
+    nome_arquivo = db.Column(db.String(255))
+    tamanho_bytes = db.Column(db.Integer)
+    mensagem_erro = db.Column(db.Text)
+
+    # Metadados
+    data_criacao = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    data_conclusao = db.Column(db.DateTime)
+    # Atualizada a cada gravação de progresso; indica se a geração ainda está ativa
+    data_atualizacao = db.Column(db.DateTime, default=datetime.utcnow,
+                                 onupdate=datetime.utcnow, nullable=False)
+
+    # Relacionamentos
+    usuario = db.relationship('User', backref=db.backref('exportacoes_relatorio', lazy='dynamic'))
+
+    def __repr__(self):
+        return f'<ExportacaoRelatorio {self.id} - {self.status}>'
+
+    @property
+    def percentual(self):
+        """Percentual de avaliações já incluídas no arquivo"""
+        if not self.total_avaliacoes:
+            return 0
+        return round(self.avaliacoes_processadas * 100 / self.total_avaliacoes)
+
+    @property
+    def disponivel(self):
+        """Indica se o arquivo ZIP pode ser baixado"""
+        return self.status == self.STATUS_CONCLUIDA and bool(self.nome_arquivo)
+
+    def to_dict(self):
+        """Converte para dicionário"""
+        return {
+            'id': self.id,
+            'status': self.status,
+            'filtros': self.filtros,
+            'em_segundo_plano': self.em_segundo_plano,
+            'total_avaliacoes': self.total_avaliacoes,
+            'avaliacoes_processadas': self.avaliacoes_processadas,
+            'percentual': self.percentual,
+            'disponivel': self.disponivel,
+            'mensagem_erro': self.mensagem_erro,
+            'data_criacao': self.data_criacao.isoformat() if self.data_criacao else None,
+            'data_conclusao': self.data_conclusao.isoformat() if self.data_conclusao else None
+        }
@@ -27,6 +27,9 @@ class Instrumento(db.Model):
     instrucoes = db.Column(db.Text)
     ativo = db.Column(db.Boolean, default=True, nullable=False)
 
+    # Incrementada a cada alteração do instrumento, domínios ou questões (invalida caches)
+    versao = db.Column(db.Integer, default=1, nullable=False, server_default='1')
+
     # Auditoria
     data_criacao = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     data_atualizacao = db.Column(db.DateTime, default=datetime.utcnow,
@@ -60,6 +63,9 @@ class Dominio(db.Model):
     # Invertido: Nunca=1, Ocasional=2, Frequente=3, Sempre=4
     escala_invertida = db.Column(db.Boolean, default=False, nullable=False)
 
+    # Domínios inativos saem do questionário e do progresso das avaliações
+    ativo = db.Column(db.Boolean, default=True, nullable=False)
+
     # Relacionamentos
     instrumento = db.relationship('Instrumento', back_populates='dominios')
     questoes = db.relationship('Questao', back_populates='dominio',
@@ -38,6 +38,11 @@ class Paciente(db.Model):
     data_atualizacao = db.Column(db.DateTime, default=datetime.utcnow,
                                   onupdate=datetime.utcnow, nullable=False)
 
+    # Ordem alfabética: sugestões do autocomplete e chave da paginação da listagem
+    __table_args__ = (
+        db.Index('ix_pacientes_nome_id', 'nome', 'id'),
+    )
+
     # Relacionamentos
     avaliacoes = db.relationship('Avaliacao', back_populates='paciente',
                                  lazy='dynamic', cascade='all, delete-orphan')
@@ -0,0 +1,57 @@
+"""
+Modelo de Resultado por Domínio - escores armazenados de avaliações concluídas
+"""
+from datetime import datetime
+from app import db
+
+
+class ResultadoDominio(db.Model):
+    """
+    Escore de um domínio (ou do total) de uma avaliação concluída
+
+    Guarda os escores de qualquer instrumento em formato uniforme, permitindo
+    consultar a série temporal de um paciente sem recalcular as avaliações.
+    """
+    __tablename__ = 'resultados_dominio'
+
+    id = db.Column(db.Integer, primary_key=True)
+    avaliacao_id = db.Column(db.Integer, db.ForeignKey('avaliacoes.id', ondelete='CASCADE'), nullable=False, index=True)
+
+    # Desnormalizados da avaliação para a série temporal sair de uma única consulta
+    paciente_id = db.Column(db.Integer, db.ForeignKey('pacientes.id', ondelete='CASCADE'), nullable=False)
+    instrumento_id = db.Column(db.Integer, db.ForeignKey('instrumentos.id'), nullable=False)
+    data_avaliacao = db.Column(db.Date, nullable=False)
+
+    # Domínio / seção / dimensão ('TOTAL' para o escore global)
+    dominio_codigo = db.Column(db.String(50), nullable=False)
+    dominio_nome = db.Column(db.String(200), nullable=False)
+    ordem = db.Column(db.Integer, default=0, nullable=False)
+
+    # Escores
+    escore = db.Column(db.Float)
+    escore_maximo = db.Column(db.Float)
+    t_score = db.Column(db.Float)
+    classificacao = db.Column(db.String(100))
+
+    data_atualizacao = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    CODIGO_TOTAL = 'TOTAL'
+
+    __table_args__ = (
+        db.UniqueConstraint('avaliacao_id', 'dominio_codigo', name='uq_resultado_avaliacao_dominio'),
+        db.Index('ix_resultados_dominio_paciente_instrumento', 'paciente_id', 'instrumento_id', 'data_avaliacao'),
+    )
+
+    # Relacionamentos
+    avaliacao = db.relationship('Avaliacao', backref=db.backref('resultados', lazy='dynamic',
+                                                                cascade='all, delete-orphan'))
+
+    def __repr__(self):
+        return f'<ResultadoDominio {self.avaliacao_id} {self.dominio_codigo}={self.escore}>'
+
+    @property
+    def percentual(self):
+        """Escore em percentual do máximo (quando o instrumento define máximo)"""
+        if self.escore is None or not self.escore_maximo:
+            return None
+        return round(self.escore * 100 / self.escore_maximo, 1)
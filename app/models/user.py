@@ -15,7 +15,7 @@ class User(UserMixin, db.Model):
     username = db.Column(db.String(80), unique=True, nullable=False, index=True)
     email = db.Column(db.String(120), unique=True, nullable=False, index=True)
     password_hash = db.Column(db.String(255), nullable=False)
-    nome_completo = db.Column(db.String(200), nullable=False)
+    nome_completo = db.Column(db.String(200), nullable=False, index=True)
 
     # Tipo de usuário: admin, terapeuta, professor, familiar
     tipo = db.Column(db.String(20), nullable=False, default='terapeuta')
@@ -46,5 +46,6 @@ class User(UserMixin, db.Model):
 
 @login_manager.user_loader
 def load_user(user_id):
-    """Carrega usuário para Flask-Login"""
-    return User.query.get(int(user_id))
+    """Carrega usuário para Flask-Login (com cache de identidade na sessão)"""
+    from app.services.usuario_sessao_service import UsuarioSessaoService
+    return UsuarioSessaoService.carregar(user_id)
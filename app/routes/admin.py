@@ -1,12 +1,13 @@
 """
 Blueprint de Administração
 """
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, Response
 from flask_login import login_required, current_user
 from functools import wraps
 from app import db
 from app.models.user import User
 from app.forms.user_forms import UserCreateForm, UserEditForm
+from app.services.usuario_sessao_service import UsuarioSessaoService
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -120,6 +121,7 @@ def editar_usuario(id):
             usuario.set_password(form.password.data)
 
         db.session.commit()
+        UsuarioSessaoService.invalidar(usuario.id)
 
         flash(f'Usuário {usuario.username} atualizado com sucesso!', 'success')
         return redirect(url_for('admin.listar_usuarios'))
@@ -168,6 +170,7 @@ def deletar_usuario(id):
 
     usuario.ativo = False
     db.session.commit()
+    UsuarioSessaoService.invalidar(usuario.id)
 
     flash(f'Usuário {usuario.username} desativado com sucesso!', 'success')
     return redirect(url_for('admin.listar_usuarios'))
@@ -182,6 +185,7 @@ def ativar_usuario(id):
 
     usuario.ativo = True
     db.session.commit()
+    UsuarioSessaoService.invalidar(usuario.id)
 
     flash(f'Usuário {usuario.username} reativado com sucesso!', 'success')
     return redirect(url_for('admin.listar_usuarios'))
@@ -193,3 +197,102 @@ def ativar_usuario(id):
 def configuracoes():
     """Configurações do sistema"""
     return render_template('admin/configuracoes.html')
+
+
+@admin_bp.route('/auditoria')
+@login_required
+@admin_required
+def auditoria():
+    """Revisão da trilha de auditoria (paginada e sempre restrita a um período)"""
+    from datetime import datetime as dt
+    from app.services.auditoria_service import AuditoriaService
+
+    page = request.args.get('page', 1, type=int)
+    user_id = request.args.get('user_id', type=int)
+    paciente_id = request.args.get('paciente_id', type=int)
+    acao = request.args.get('acao', '', type=str)
+    data_inicio = request.args.get('data_inicio', '', type=str)
+    data_fim = request.args.get('data_fim', '', type=str)
+
+    try:
+        inicio = dt.strptime(data_inicio, '%Y-%m-%d').date() if data_inicio else None
+        fim = dt.strptime(data_fim, '%Y-%m-%d').date() if data_fim else None
+    except ValueError:
+        flash('Período inválido', 'warning')
+        inicio = fim = None
+
+    eventos = AuditoriaService.consultar(
+        data_inicio=inicio,
+        data_fim=fim,
+        user_id=user_id,
+        paciente_id=paciente_id,
+        acao=acao or None
+    ).paginate(page=page, per_page=50, error_out=False)
+
+    # Nomes apenas dos usuários da página e do filtro; a escolha do usuário
+    # é feita por busca incremental (avaliacoes.autocomplete_avaliadores)
+    ids_usuarios = {evento.user_id for evento in eventos.items if evento.user_id}
+    if user_id:
+        ids_usuarios.add(user_id)
+    nomes_usuarios = dict(
+        db.session.query(User.id, User.nome_completo).filter(User.id.in_(ids_usuarios)).all()
+    ) if ids_usuarios else {}
+
+    return render_template('admin/auditoria.html',
+                         eventos=eventos,
+                         nomes_usuarios=nomes_usuarios,
+                         user_id=user_id,
+                         paciente_id=paciente_id,
+                         acao=acao,
+                         data_inicio=data_inicio,
+                         data_fim=data_fim)
+
+
+@admin_bp.route('/auditoria/revisao')
+@login_required
+@admin_required
+def revisao_acessos():
+    """Revisão de acessos: quem acessou um paciente e usuários com acesso a muitos pacientes"""
+    from datetime import datetime as dt
+    from app.services.relatorio_acesso_service import RelatorioAcessoService
+
+    relatorio = request.args.get('relatorio', '', type=str)
+    formato = request.args.get('formato', '', type=str)
+    paciente_id = request.args.get('paciente_id', type=int)
+    dias = request.args.get('dias', 90, type=int)
+    minimo = request.args.get('minimo', 20, type=int)
+    data_inicio = request.args.get('data_inicio', '', type=str)
+    data_fim = request.args.get('data_fim', '', type=str)
+
+    # Somente leitura: os resumos são atualizados pelo comando `flask resumir-acessos`
+    linhas = []
+    cabecalho = []
+    if relatorio == 'paciente' and paciente_id:
+        linhas = RelatorioAcessoService.acessos_ao_paciente(paciente_id, dias=dias)
+        cabecalho = ['user_id', 'usuario', 'acessos', 'dias_com_acesso', 'primeiro_acesso', 'ultimo_acesso']
+    elif relatorio == 'usuarios':
+        try:
+            inicio = dt.strptime(data_inicio, '%Y-%m-%d').date() if data_inicio else None
+            fim = dt.strptime(data_fim, '%Y-%m-%d').date() if data_fim else None
+        except ValueError:
+            flash('Período inválido', 'warning')
+            inicio = fim = None
+        linhas = RelatorioAcessoService.usuarios_com_muitos_pacientes(minimo, inicio, fim)
+        cabecalho = ['user_id', 'usuario', 'pacientes', 'acessos']
+
+    if formato == 'csv' and cabecalho:
+        return Response(
+            RelatorioAcessoService.gerar_csv(cabecalho, linhas),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename=revisao_acessos_{relatorio}.csv'}
+        )
+
+    return render_template('admin/revisao_acessos.html',
+                         resumido_ate=RelatorioAcessoService.ultimo_dia_resumido(),
+                         relatorio=relatorio,
+                         linhas=linhas,
+                         paciente_id=paciente_id,
+                         dias=dias,
+                         minimo=minimo,
+                         data_inicio=data_inicio,
+                         data_fim=data_fim)
@@ -10,7 +10,9 @@ from app import db
 from app.forms import AtendimentoForm, FinalizarAtendimentoForm
 from app.models import Atendimento, Paciente, Prontuario, Avaliacao, AuditoriaAcesso
 from app.services.permission_service import PermissionService
+from app.services.auditoria_service import AuditoriaService
 from app.utils.decorators import can_view_patient, can_edit_patient
+from app.utils.paginacao import paginar_por_chave
 
 
 atendimento_bp = Blueprint('atendimento', __name__)
@@ -31,7 +33,8 @@ def listar(paciente_id):
     # Filtros
     tipo_filtro = request.args.get('tipo', '').strip()
     status_filtro = request.args.get('status', '').strip()
-    page = request.args.get('page', 1, type=int)
+    apos = request.args.get('apos', '')
+    antes = request.args.get('antes', '')
     per_page = 20
 
     # Query base
@@ -43,19 +46,22 @@ def listar(paciente_id):
     if status_filtro:
         query = query.filter(Atendimento.status == status_filtro)
 
-    # Ordenar por data (mais recentes primeiro)
-    query = query.order_by(Atendimento.data_hora.desc())
-
-    # Paginar
-    paginacao = query.paginate(page=page, per_page=per_page, error_out=False)
+    # Paginação por chave, mais recentes primeiro (a página não exibe total: sem contagem)
+    paginacao = paginar_por_chave(query, (Atendimento.data_hora, Atendimento.id), por_pagina=per_page,
+                                  apos=apos, antes=antes, descendente=True)
     atendimentos = paginacao.items
 
+    # Todos os atendimentos são do mesmo paciente: um único nível decide os botões de edição
+    nivel = PermissionService.niveis_acesso_pacientes(current_user, [paciente_id])[paciente_id]
+    pode_editar = PermissionService.nivel_atende(nivel, PermissionService.NIVEL_EDICAO)
+
     return render_template(
         'atendimento/listar.html',
         paciente=paciente,
         prontuario=prontuario,
         atendimentos=atendimentos,
         paginacao=paginacao,
+        pode_editar=pode_editar,
         tipo_filtro=tipo_filtro,
         status_filtro=status_filtro
     )
@@ -72,16 +78,11 @@ def visualizar(atendimento_id):
         abort(403)
 
     # Registrar auditoria
-    auditoria = AuditoriaAcesso(
-        user_id=current_user.id,
-        recurso_tipo='atendimento',
-        recurso_id=atendimento.id,
+    AuditoriaService.registrar(
+        current_user, 'atendimento', atendimento.id, 'visualizar_atendimento',
         paciente_id=atendimento.paciente_id,
-        acao='visualizar_atendimento',
         detalhes=f'Visualizou atendimento #{atendimento.id} do paciente {atendimento.paciente.nome}'
     )
-    db.session.add(auditoria)
-    db.session.commit()
 
     return render_template(
         'atendimento/visualizar.html',
@@ -1,19 +1,22 @@
 """
 Rotas para gerenciamento de avaliações
 """
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask import Blueprint, current_app, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required, current_user
 from app import db
-from app.models import Avaliacao, Paciente, Instrumento, Questao, Resposta, Dominio
+from app.models import Avaliacao, Paciente, Instrumento, Resposta
 from app.forms import AvaliacaoForm, RespostaForm
+from app.services.autocomplete_service import AutocompleteService
 from app.services.calculo_service import CalculoService
-from app.services.classificacao_service import ClassificacaoService
+from app.services.carregamento_service import CarregamentoService
+from app.services.finalizacao_service import FinalizacaoService
 from app.services.modulos_service import ModulosService
 from app.services.permission_service import PermissionService
+from app.services.questionario_service import QuestionarioService
+from app.services.resposta_service import RespostaService
 from app.utils.decorators import can_view_avaliacao, can_edit_avaliacao
-from app.utils.schema_utils import questao_has_column
+from app.utils.paginacao import contar, paginar_por_chave
 from sqlalchemy import func
-from datetime import datetime
 
 avaliacoes_bp = Blueprint('avaliacoes', __name__)
 
@@ -25,7 +28,8 @@ def listar():
     from app.models.user import User
     from datetime import datetime as dt
 
-    page = request.args.get('page', 1, type=int)
+    apos = request.args.get('apos', '')
+    antes = request.args.get('antes', '')
     per_page = 20
 
     # Filtros
@@ -39,18 +43,10 @@ def listar():
     # Query base
     query = Avaliacao.query.join(Paciente).join(Instrumento)
 
-    # Filtrar avaliações baseado nos pacientes que o usuário tem acesso
-    if not current_user.is_admin():
-        # Obter IDs de pacientes que o usuário pode acessar
-        pacientes_query = Paciente.query
-        pacientes_query = PermissionService.filtrar_pacientes_por_permissao(pacientes_query, current_user)
-        pacientes_ids = [p.id for p in pacientes_query.all()]
-
-        # Filtrar avaliações apenas destes pacientes
-        if pacientes_ids:
-            query = query.filter(Avaliacao.paciente_id.in_(pacientes_ids))
-        else:
-            query = query.filter(False)  # Nenhum resultado
+    # Filtrar avaliações pelos pacientes que o usuário tem acesso (join em acesso_paciente)
+    query = PermissionService.filtrar_pacientes_por_permissao(query, current_user)
+    query_base = query
+    filtros_aplicados = False
 
     # Filtro por paciente específico
     if paciente_id:
@@ -59,20 +55,24 @@ def listar():
             flash('Você não tem permissão para visualizar avaliações deste paciente', 'danger')
             return redirect(url_for('avaliacoes.listar'))
         query = query.filter(Avaliacao.paciente_id == paciente_id)
+        filtros_aplicados = True
 
     # Filtro por avaliador
     if avaliador_id:
-        query = query.filter_by(avaliador_id=avaliador_id)
+        query = query.filter(Avaliacao.avaliador_id == avaliador_id)
+        filtros_aplicados = True
 
     # Filtro por status
     if status:
-        query = query.filter_by(status=status)
+        query = query.filter(Avaliacao.status == status)
+        filtros_aplicados = True
 
     # Filtro por período
     if data_inicio:
         try:
             data_inicio_dt = dt.strptime(data_inicio, '%Y-%m-%d').date()
             query = query.filter(Avaliacao.data_avaliacao >= data_inicio_dt)
+            filtros_aplicados = True
         except ValueError:
             flash('Data de início inválida', 'warning')
 
@@ -80,32 +80,38 @@ def listar():
         try:
             data_fim_dt = dt.strptime(data_fim, '%Y-%m-%d').date()
             query = query.filter(Avaliacao.data_avaliacao <= data_fim_dt)
+            filtros_aplicados = True
         except ValueError:
             flash('Data de fim inválida', 'warning')
 
     # Filtro por busca (nome do paciente)
     if busca:
-        query = query.join(Paciente).filter(
-            Paciente.nome.ilike(f'%{busca}%')
-        )
+        query = query.filter(Paciente.nome.ilike(f'%{busca}%'))
+        filtros_aplicados = True
 
-    # Ordenar e paginar
-    avaliacoes = query.order_by(db.desc(Avaliacao.data_avaliacao)).paginate(
-        page=page, per_page=per_page, error_out=False
+    # Paginação por chave (mais recentes primeiro): custo constante em qualquer página
+    avaliacoes = paginar_por_chave(
+        query, (Avaliacao.data_avaliacao, Avaliacao.id), por_pagina=per_page,
+        apos=apos, antes=antes, descendente=True
     )
 
-    # Estatísticas dos filtros
-    total_filtrado = query.count()
-    total_geral = Avaliacao.query.count()
+    # Níveis de acesso das linhas da página em uma consulta (botões de ação)
+    niveis = PermissionService.niveis_acesso_avaliacoes(current_user, [a.id for a in avaliacoes.items])
+
+    # Estatísticas dos filtros (estimadas em bases grandes): sem filtros o total filtrado é o geral
+    avaliacoes.total, avaliacoes.total_aproximado = contar(query, aproximado=True)
+    total_filtrado = avaliacoes.total
+    total_geral = contar(query_base, aproximado=True)[0] if filtros_aplicados else total_filtrado
 
-    # Listas para os filtros
-    pacientes = Paciente.query.filter_by(ativo=True).order_by(Paciente.nome).all()
-    avaliadores = User.query.filter_by(ativo=True).order_by(User.nome_completo).all()
+    # Filtros de paciente e avaliador usam busca incremental: só os selecionados vão para a página
+    paciente_selecionado = db.session.get(Paciente, paciente_id) if paciente_id else None
+    avaliador_selecionado = db.session.get(User, avaliador_id) if avaliador_id else None
 
     return render_template('avaliacoes/listar.html',
                           avaliacoes=avaliacoes,
-                          pacientes=pacientes,
-                          avaliadores=avaliadores,
+                          niveis=niveis,
+                          paciente_selecionado=paciente_selecionado,
+                          avaliador_selecionado=avaliador_selecionado,
                           paciente_id=paciente_id,
                           avaliador_id=avaliador_id,
                           status=status,
@@ -115,6 +121,15 @@ def listar():
                           total_filtrado=total_filtrado,
                           total_geral=total_geral)
 
+@avaliacoes_bp.route('/avaliadores/autocomplete')
+@login_required
+def autocomplete_avaliadores():
+    """Sugestões de avaliadores ativos para o filtro da listagem (JSON)"""
+    limite = AutocompleteService.limite(request.args.get('limite', type=int))
+    sugestoes = AutocompleteService.avaliadores(request.args.get('q', ''), limite)
+    return jsonify({'success': True, 'resultados': sugestoes})
+
+
 @avaliacoes_bp.route('/nova', methods=['GET', 'POST'])
 @login_required
 def nova():
@@ -130,11 +145,18 @@ def nova():
     # Criar formulário
     form = AvaliacaoForm()
 
-    # Buscar pacientes ativos
-    pacientes = Paciente.query.filter_by(ativo=True).order_by(Paciente.nome).all()
-    form.paciente_id.choices = [(0, 'Selecione o paciente...')] + [
-        (p.id, f"{p.nome} - {p.calcular_idade()[0]} anos") for p in pacientes
-    ]
+    # O paciente é escolhido por busca incremental (pacientes.autocomplete): as opções
+    # trazem apenas o paciente pré-selecionado ou enviado, para validar o formulário
+    paciente_escolhido = paciente_id if request.method == 'GET' else form.paciente_id.data
+    form.paciente_id.choices = [(0, 'Selecione o paciente...')]
+    if paciente_escolhido:
+        paciente = PermissionService.filtrar_pacientes_por_permissao(
+            Paciente.query.filter_by(id=paciente_escolhido, ativo=True), current_user
+        ).first()
+        if paciente:
+            form.paciente_id.choices.append(
+                (paciente.id, f"{paciente.nome} - {paciente.calcular_idade()[0]} anos")
+            )
 
     # Buscar instrumentos disponíveis
     instrumentos_disponiveis = Instrumento.query.filter_by(ativo=True).order_by(Instrumento.nome).all()
@@ -219,17 +241,10 @@ def nova():
 @can_view_avaliacao
 def visualizar(id):
     """Visualiza detalhes de uma avaliação"""
-    avaliacao = Avaliacao.query.get_or_404(id)
+    avaliacao = CarregamentoService.avaliacao(id, 'detalhe')
 
-    # Buscar respostas agrupadas por domínio
-    respostas = (
-        Resposta.query
-        .join(Questao)
-        .join(Dominio)
-        .filter(Resposta.avaliacao_id == id)
-        .order_by(Dominio.ordem, Questao.numero)
-        .all()
-    )
+    # Respostas com questão e domínio já carregados, agrupadas por domínio
+    respostas = CarregamentoService.respostas(id)
 
     # Agrupar respostas por domínio
     respostas_por_dominio = {}
@@ -239,12 +254,10 @@ def visualizar(id):
             respostas_por_dominio[dominio_nome] = []
         respostas_por_dominio[dominio_nome].append(resposta)
 
-    # Calcular progresso
-    total_questoes = Questao.query.join(Dominio).filter(
-        Dominio.instrumento_id == avaliacao.instrumento_id
-    ).count()
-    questoes_respondidas = len(respostas)
-    progresso = int((questoes_respondidas / total_questoes * 100)) if total_questoes > 0 else 0
+    # Progresso (contadores mantidos na avaliação)
+    total_questoes = avaliacao.total_questoes
+    questoes_respondidas = avaliacao.questoes_respondidas
+    progresso = avaliacao.get_progresso_percentual()
 
     perfil_sensorial_relatorio = None
     if avaliacao.instrumento and avaliacao.instrumento.codigo.startswith('PERFIL_SENS'):
@@ -269,15 +282,8 @@ def responder(id):
     avaliacao = Avaliacao.query.get_or_404(id)
     avaliacao_concluida = avaliacao.status == 'concluida'
 
-    # Buscar todas as questões do instrumento, ordenadas por domínio e número
-    questoes = (
-        Questao.query
-        .join(Dominio)
-        .filter(Dominio.instrumento_id == avaliacao.instrumento_id)
-        .filter(Questao.ativo == True)
-        .order_by(Dominio.ordem, Questao.numero)
-        .all()
-    )
+    # Questões do instrumento, ordenadas por domínio e número (pacote em cache)
+    questoes = list(QuestionarioService.obter(avaliacao.instrumento).questoes)
 
     if not questoes:
         flash('Este instrumento não possui questões cadastradas!', 'warning')
@@ -313,31 +319,9 @@ def responder(id):
     form = RespostaForm()
     form.questao_id.data = questao_atual.id
 
-    # Configurar opções dinamicamente conforme o instrumento
-    opcao_descricoes = dict(RespostaForm.DEFAULT_DESCRIPTIONS)
-    opcoes_customizadas = questao_atual.opcoes_resposta if questao_has_column('opcoes_resposta') else None
-    if isinstance(opcoes_customizadas, (list, tuple)) and opcoes_customizadas:
-        choices = []
-        descricoes = {}
-        for raw in opcoes_customizadas:
-            if '|' in raw:
-                valor_opcao, label_text = raw.split('|', 1)
-            else:
-                valor_opcao, label_text = raw, raw
-
-            valor_opcao = valor_opcao.strip()
-            label_principal, _, complemento = label_text.partition('(')
-            label_principal = label_principal.strip()
-            choices.append((valor_opcao, label_principal))
-
-            complemento = complemento.strip().rstrip(')')
-            if complemento:
-                descricoes[valor_opcao] = complemento
-
-        form.valor.choices = choices
-        opcao_descricoes = descricoes or dict(RespostaForm.DEFAULT_DESCRIPTIONS)
-    else:
-        form.valor.choices = RespostaForm.DEFAULT_CHOICES
+    # Opções conforme o instrumento (já interpretadas no pacote)
+    form.valor.choices = list(questao_atual.choices)
+    opcao_descricoes = questao_atual.descricoes
 
     # Preencher com resposta existente
     if resposta_existente and request.method == 'GET':
@@ -365,13 +349,12 @@ def responder(id):
                 )
                 db.session.add(resposta)
 
-            db.session.commit()
-
-            # Se avaliação já estava concluída, recalcular escores automaticamente
+            # Se avaliação já estava concluída, a resposta é gravada junto com o recálculo
             if avaliacao_concluida:
-                CalculoService.atualizar_escores_avaliacao(avaliacao)
-                ClassificacaoService.classificar_avaliacao(avaliacao)
+                FinalizacaoService.recalcular(avaliacao)
                 flash('Resposta atualizada! Resultados recalculados.', 'success')
+            else:
+                db.session.commit()
 
             # Verificar se é a última questão
             if questao_idx == len(questoes) - 1:
@@ -385,10 +368,10 @@ def responder(id):
             db.session.rollback()
             flash(f'Erro ao salvar resposta: {str(e)}', 'danger')
 
-    # Calcular progresso
+    # Progresso (contadores mantidos na avaliação)
     total_questoes = len(questoes)
-    questoes_respondidas = len(respostas_existentes)
-    progresso = int((questoes_respondidas / total_questoes * 100)) if total_questoes > 0 else 0
+    questoes_respondidas = avaliacao.questoes_respondidas
+    progresso = avaliacao.get_progresso_percentual()
 
     return render_template(
         'avaliacoes/responder.html',
@@ -409,6 +392,129 @@ def responder(id):
     )
 
 
+@avaliacoes_bp.route('/<int:id>/responder/pagina')
+@login_required
+@can_edit_avaliacao
+def responder_pagina(id):
+    """Responde todas as questões (de um domínio ou do instrumento) em uma página, com salvamento automático"""
+    avaliacao = Avaliacao.query.get_or_404(id)
+    dominio_id = request.args.get('dominio', None, type=int)
+
+    pacote = QuestionarioService.obter(avaliacao.instrumento)
+    questoes = [q for q in pacote.questoes if not dominio_id or q.dominio_id == dominio_id]
+
+    if not questoes:
+        flash('Este instrumento não possui questões cadastradas!', 'warning')
+        return redirect(url_for('avaliacoes.visualizar', id=id))
+
+    respostas_existentes = dict(
+        db.session.query(Resposta.questao_id, Resposta.valor).filter_by(avaliacao_id=id).all()
+    )
+    questoes_respondidas, total_questoes = RespostaService.progresso(avaliacao)
+    progresso = avaliacao.get_progresso_percentual()
+
+    return render_template(
+        'avaliacoes/responder_pagina.html',
+        avaliacao=avaliacao,
+        dominios=pacote.dominios,
+        dominio_id=dominio_id,
+        questoes=questoes,
+        respostas_existentes=respostas_existentes,
+        questoes_respondidas=questoes_respondidas,
+        total_questoes=total_questoes,
+        progresso=progresso
+    )
+
+
+@avaliacoes_bp.route('/<int:id>/respostas', methods=['POST'])
+@login_required
+@can_edit_avaliacao
+def salvar_respostas(id):
+    """
+    Grava várias respostas de uma vez (JSON)
+
+    Corpo: {"respostas": {"<questao_id>": "<valor>", ...}}
+    """
+    avaliacao = Avaliacao.query.get_or_404(id)
+
+    dados = request.get_json(silent=True) or {}
+    respostas = dados.get('respostas')
+    if not isinstance(respostas, dict) or not respostas:
+        return jsonify({'success': False, 'error': 'Nenhuma resposta enviada'}), 400
+
+    try:
+        # Avaliação concluída: respostas e recálculo dos escores no mesmo commit
+        concluida = avaliacao.status == 'concluida'
+        salvas, erros = RespostaService.salvar_lote(avaliacao, respostas, commit=not concluida)
+        if erros:
+            return jsonify({'success': False, 'error': 'Respostas inválidas', 'erros': erros}), 400
+
+        if concluida:
+            FinalizacaoService.recalcular(avaliacao)
+
+        respondidas, total = RespostaService.progresso(avaliacao)
+        return jsonify({
+            'success': True,
+            'salvas': salvas,
+            'respondidas': respondidas,
+            'total': total,
+            'progresso': avaliacao.get_progresso_percentual()
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@avaliacoes_bp.route('/<int:id>/pacote')
+@login_required
+@can_view_avaliacao
+def pacote(id):
+    """Pacote do instrumento e respostas atuais para captura offline (JSON)"""
+    avaliacao = Avaliacao.query.get_or_404(id)
+    return jsonify({'success': True, **RespostaService.pacote(avaliacao)}), 200
+
+
+@avaliacoes_bp.route('/<int:id>/sincronizar', methods=['POST'])
+@login_required
+@can_edit_avaliacao
+def sincronizar(id):
+    """
+    Recebe respostas capturadas offline (JSON)
+
+    Corpo: {"itens": [{"chave": "...", "questao_id": 1, "valor": "...", "registrado_em": "ISO 8601"}, ...]}
+    """
+    avaliacao = Avaliacao.query.get_or_404(id)
+
+    dados = request.get_json(silent=True) or {}
+    itens = dados.get('itens')
+    if not isinstance(itens, list) or not itens:
+        return jsonify({'success': False, 'error': 'Nenhum item enviado'}), 400
+
+    limite = current_app.config.get('SINCRONIZACAO_MAX_ITENS', 500)
+    if len(itens) > limite:
+        return jsonify({'success': False, 'error': f'Máximo de {limite} itens por lote'}), 413
+
+    try:
+        resultados = RespostaService.sincronizar(avaliacao, itens, commit=False)
+
+        # Avaliação concluída: respostas aplicadas e recálculo dos escores no mesmo commit
+        if avaliacao.status == 'concluida' and any(r.get('resultado') == 'aplicada' for r in resultados):
+            FinalizacaoService.recalcular(avaliacao)
+        else:
+            db.session.commit()
+
+        respondidas, total = RespostaService.progresso(avaliacao)
+        return jsonify({
+            'success': True,
+            'resultados': resultados,
+            'respondidas': respondidas,
+            'total': total
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @avaliacoes_bp.route('/<int:id>/finalizar', methods=['GET', 'POST'])
 @login_required
 @can_edit_avaliacao
@@ -417,30 +523,17 @@ def finalizar(id):
     avaliacao = Avaliacao.query.get_or_404(id)
 
     # Verificar se todas as questões foram respondidas
-    total_questoes = Questao.query.join(Dominio).filter(
-        Dominio.instrumento_id == avaliacao.instrumento_id,
-        Questao.ativo == True
-    ).count()
-
-    questoes_respondidas = Resposta.query.filter_by(avaliacao_id=id).count()
+    total_questoes = avaliacao.total_questoes
 
-    if questoes_respondidas < total_questoes:
-        flash(f'Ainda faltam {total_questoes - questoes_respondidas} questão(ões) para responder!', 'warning')
+    if not avaliacao.esta_completa():
+        faltam = total_questoes - avaliacao.questoes_respondidas
+        flash(f'Ainda faltam {faltam} questão(ões) para responder!', 'warning')
         return redirect(url_for('avaliacoes.responder', id=id))
 
     if request.method == 'POST':
         try:
-            # Calcular escores
-            CalculoService.atualizar_escores_avaliacao(avaliacao)
-
-            # Classificar resultados
-            ClassificacaoService.classificar_avaliacao(avaliacao)
-
-            # Atualizar status e data de conclusão
-            avaliacao.status = 'concluida'
-            avaliacao.data_conclusao = datetime.utcnow()
-
-            db.session.commit()
+            # Escores, classificações, resultados por domínio e status em uma transação
+            FinalizacaoService.finalizar(avaliacao)
 
             flash('Avaliação finalizada com sucesso! Escores calculados e classificados.', 'success')
             return redirect(url_for('avaliacoes.visualizar', id=id))
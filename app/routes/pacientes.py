@@ -1,15 +1,18 @@
 """
 Rotas para gerenciamento de pacientes
 """
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required, current_user
-from sqlalchemy import or_
+from datetime import date
+from sqlalchemy import func, or_, select
 
 from app import db
 from app.forms import PacienteForm
-from app.models import Paciente, Avaliacao
+from app.models import Atendimento, Paciente, Avaliacao
+from app.services.autocomplete_service import AutocompleteService
 from app.services.permission_service import PermissionService
 from app.utils.decorators import can_view_patient, can_edit_patient, can_delete_patient
+from app.utils.paginacao import contar, paginar_por_chave
 
 
 pacientes_bp = Blueprint('pacientes', __name__)
@@ -22,7 +25,8 @@ def listar():
     busca = request.args.get('busca', '').strip()
     sexo_filtro = request.args.get('sexo', '').strip()
     ativo_filtro = request.args.get('ativo', '').strip()
-    page = request.args.get('page', 1, type=int)
+    apos = request.args.get('apos', '')
+    antes = request.args.get('antes', '')
     per_page = 15
 
     # Aplicar filtro de permissão - usuários só veem seus pacientes
@@ -45,20 +49,45 @@ def listar():
     elif ativo_filtro == 'false':
         query = query.filter(Paciente.ativo.is_(False))
 
-    query = query.order_by(Paciente.nome)
-
-    paginacao = query.paginate(page=page, per_page=per_page, error_out=False)
-    pacientes = paginacao.items
-
-    for paciente in pacientes:
-        idade_anos, idade_meses = paciente.calcular_idade()
-        paciente.idade = idade_anos
-        paciente.idade_meses = idade_meses
-        paciente.num_avaliacoes = Avaliacao.query.filter_by(paciente_id=paciente.id).count()
+    # Total sobre a consulta filtrada, antes das colunas agregadas
+    total, total_aproximado = contar(query, aproximado=True)
+
+    # Agregados por paciente na própria consulta da página (subconsultas correlacionadas,
+    # avaliadas só para as linhas da página pelos índices de paciente_id)
+    num_avaliacoes = select(func.count(Avaliacao.id)).where(
+        Avaliacao.paciente_id == Paciente.id
+    ).correlate(Paciente).scalar_subquery()
+    ultima_avaliacao = select(func.max(Avaliacao.data_avaliacao)).where(
+        Avaliacao.paciente_id == Paciente.id
+    ).correlate(Paciente).scalar_subquery()
+    ultimo_atendimento = select(func.max(Atendimento.data_hora)).where(
+        Atendimento.paciente_id == Paciente.id
+    ).correlate(Paciente).scalar_subquery()
+    query = query.add_columns(num_avaliacoes, ultima_avaliacao, ultimo_atendimento)
+
+    # Paginação por chave em ordem alfabética
+    paginacao = paginar_por_chave(query, (Paciente.nome, Paciente.id), por_pagina=per_page,
+                                  apos=apos, antes=antes)
+    paginacao.total, paginacao.total_aproximado = total, total_aproximado
+
+    # Idades calculadas em uma passada, com a mesma data de referência
+    hoje = date.today()
+    pacientes = []
+    for paciente, total_avaliacoes, data_ultima_avaliacao, data_ultimo_atendimento in paginacao.items:
+        paciente.idade, paciente.idade_meses = paciente.calcular_idade(hoje)
+        paciente.num_avaliacoes = total_avaliacoes
+        paciente.ultima_avaliacao = data_ultima_avaliacao
+        paciente.ultimo_atendimento = data_ultimo_atendimento
+        pacientes.append(paciente)
+    paginacao.items = pacientes
+
+    # Níveis de acesso de todas as linhas em uma consulta (botões de ação)
+    niveis = PermissionService.niveis_acesso_pacientes(current_user, [p.id for p in pacientes])
 
     return render_template(
         'pacientes/listar.html',
         pacientes=pacientes,
+        niveis=niveis,
         paginacao=paginacao,
         busca=busca,
         sexo_filtro=sexo_filtro,
@@ -66,6 +95,15 @@ def listar():
     )
 
 
+@pacientes_bp.route('/autocomplete')
+@login_required
+def autocomplete():
+    """Sugestões de pacientes ativos visíveis ao usuário (JSON)"""
+    limite = AutocompleteService.limite(request.args.get('limite', type=int))
+    sugestoes = AutocompleteService.pacientes(current_user, request.args.get('q', ''), limite)
+    return jsonify({'success': True, 'resultados': sugestoes})
+
+
 @pacientes_bp.route('/novo', methods=['GET', 'POST'])
 @login_required
 def novo():
@@ -310,6 +348,7 @@ def compartilhar(id):
     user_id = request.form.get('user_id', type=int)
     tipo_acesso = request.form.get('tipo_acesso', 'leitura')
     motivo = request.form.get('motivo', '')
+    data_expiracao = request.form.get('data_expiracao')
 
     if not user_id:
         flash('Usuário não especificado', 'danger')
@@ -323,8 +362,13 @@ def compartilhar(id):
         return redirect(url_for('pacientes.visualizar', id=id))
 
     try:
+        if data_expiracao:
+            from datetime import datetime as dt
+            # Válido até o fim do dia informado
+            data_expiracao = dt.strptime(data_expiracao, '%Y-%m-%d').replace(hour=23, minute=59, second=59)
+
         compartilhamento = PermissionService.compartilhar_paciente(
-            id, current_user.id, user_id, tipo_acesso, motivo
+            id, current_user.id, user_id, tipo_acesso, motivo, data_expiracao or None
         )
 
         if compartilhamento:
@@ -325,6 +325,7 @@ def sugerir_itens(avaliacao_id):
 def gerar_pdf(avaliacao_id):
     """Gera relatório PDF do PEI"""
     from app.services.pei_pdf_service import PeiPDFService
+    from app.services.pdf_template_service import PDFTemplateService
 
     avaliacao = Avaliacao.query.get_or_404(avaliacao_id)
 
@@ -338,22 +339,21 @@ def gerar_pdf(avaliacao_id):
         flash('Nenhum item do PEI foi selecionado para esta avaliação.', 'warning')
         return redirect(url_for('pei.visualizar_pei', avaliacao_id=avaliacao_id))
 
+    arquivo = PDFTemplateService.arquivo_temporario()
     try:
-        pdf_buffer = PeiPDFService.gerar_relatorio_pei(avaliacao, itens_pei)
+        PeiPDFService.gerar_relatorio_pei(avaliacao, itens_pei, arquivo)
 
         # Registrar na auditoria
         PermissionService.registrar_acesso(
             current_user, 'pei', avaliacao_id, 'exportar_pdf'
         )
 
-        from flask import send_file
-        return send_file(
-            pdf_buffer,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=f'PEI_{avaliacao.paciente.nome}_{avaliacao.data_avaliacao.strftime("%Y%m%d")}.pdf'
+        return PDFTemplateService.resposta_pdf(
+            arquivo,
+            f'PEI_{avaliacao.paciente.nome}_{avaliacao.data_avaliacao.strftime("%Y%m%d")}.pdf'
         )
 
     except Exception as e:
+        arquivo.close()
         flash(f'Erro ao gerar PDF: {str(e)}', 'danger')
         return redirect(url_for('pei.visualizar_pei', avaliacao_id=avaliacao_id))
@@ -13,6 +13,7 @@ from app.forms import (
 )
 from app.models import PlanoTerapeutico, ObjetivoTerapeutico, Paciente, Prontuario, AuditoriaAcesso
 from app.services.permission_service import PermissionService
+from app.services.auditoria_service import AuditoriaService
 from app.utils.decorators import can_view_patient, can_edit_patient
 
 
@@ -63,16 +64,11 @@ def visualizar(plano_id):
     }
 
     # Registrar auditoria
-    auditoria = AuditoriaAcesso(
-        user_id=current_user.id,
-        recurso_tipo='plano_terapeutico',
-        recurso_id=plano.id,
+    AuditoriaService.registrar(
+        current_user, 'plano_terapeutico', plano.id, 'visualizar_plano_terapeutico',
         paciente_id=plano.paciente_id,
-        acao='visualizar_plano_terapeutico',
         detalhes=f'Visualizou plano terapêutico #{plano.id} do paciente {plano.paciente.nome}'
     )
-    db.session.add(auditoria)
-    db.session.commit()
 
     return render_template(
         'plano_terapeutico/visualizar.html',
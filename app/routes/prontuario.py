@@ -10,6 +10,7 @@ from app import db
 from app.forms import ProntuarioForm, EncerrarProntuarioForm
 from app.models import Prontuario, Paciente, Atendimento, PlanoTerapeutico, AuditoriaAcesso
 from app.services.permission_service import PermissionService
+from app.services.auditoria_service import AuditoriaService
 from app.utils.decorators import can_view_patient, can_edit_patient
 
 
@@ -29,16 +30,11 @@ def visualizar(paciente_id):
         return redirect(url_for('prontuario.criar', paciente_id=paciente_id))
 
     # Registrar auditoria
-    auditoria = AuditoriaAcesso(
-        user_id=current_user.id,
-        recurso_tipo='prontuario',
-        recurso_id=prontuario.id,
+    AuditoriaService.registrar(
+        current_user, 'prontuario', prontuario.id, 'visualizar_prontuario',
         paciente_id=paciente_id,
-        acao='visualizar_prontuario',
         detalhes=f'Visualizou prontuário do paciente {paciente.nome}'
     )
-    db.session.add(auditoria)
-    db.session.commit()
 
     # Buscar dados relacionados
     atendimentos_recentes = prontuario.atendimentos.limit(5).all()
@@ -1,14 +1,20 @@
 """
 Blueprint de Relatórios
 """
+import os
 from collections import OrderedDict
-from flask import Blueprint, render_template, Response, make_response, request, redirect, url_for, flash
-from flask_login import login_required
+from datetime import datetime as dt
+from flask import (Blueprint, render_template, Response, request, redirect, url_for, flash,
+                   send_file, jsonify, abort, stream_with_context, current_app)
+from flask_login import login_required, current_user
 from app import db
+from sqlalchemy.orm import joinedload
 from app.models.avaliacao import Avaliacao
+from app.models.exportacao import ExportacaoRelatorio
 from app.models.instrumento import Instrumento
 from app.models.paciente import Paciente
 from app.models.plano import PlanoItem, PlanoTemplateItem
+from app.services.carregamento_service import CarregamentoService
 from app.services.grafico_service import GraficoService
 from app.services.modulos_service import ModulosService
 from io import BytesIO
@@ -20,7 +26,7 @@ relatorios_bp = Blueprint('relatorios', __name__)
 @login_required
 def avaliacao(id):
     """Relatório completo de avaliação"""
-    avaliacao_obj = Avaliacao.query.get_or_404(id)
+    avaliacao_obj = CarregamentoService.avaliacao(id, 'relatorio')
 
     # Gerar gráficos
     grafico_radar = None
@@ -61,39 +67,166 @@ def avaliacao(id):
 def avaliacao_pdf(id):
     """Gera relatório de avaliação em PDF"""
     from app.services.pdf_service import PDFService
+    from app.services.pdf_cache_service import PDFCacheService
+    from app.services.pdf_template_service import PDFTemplateService
+
+    avaliacao_obj = CarregamentoService.avaliacao(id, 'relatorio')
+    nome_arquivo = f'avaliacao_{id}_{avaliacao_obj.paciente.nome.replace(" ", "_")}.pdf'
+
+    # Avaliações concluídas são servidas do cache versionado (com suporte a GET condicional)
+    if PDFCacheService.pode_usar_cache(avaliacao_obj):
+        # Arquivo aberto antes do envio: uma nova versão pode remover o caminho em seguida
+        arquivo, versao, ultima_modificacao = PDFCacheService.abrir_pdf(avaliacao_obj)
+        response = send_file(
+            arquivo,
+            mimetype='application/pdf',
+            as_attachment=True,
+            download_name=nome_arquivo,
+            conditional=True,
+            etag=versao,
+            last_modified=ultima_modificacao,
+            max_age=0
+        )
+        if response.status_code == 200:
+            response.content_length = os.fstat(arquivo.fileno()).st_size
+        return response
+
+    # Gerar PDF em arquivo temporário (em disco acima do limite de memória)
+    arquivo = PDFTemplateService.arquivo_temporario()
+    try:
+        PDFService.gerar_relatorio_avaliacao(avaliacao_obj, arquivo)
+    except Exception:
+        arquivo.close()
+        raise
+
+    return PDFTemplateService.resposta_pdf(arquivo, nome_arquivo)
+
+
+@relatorios_bp.route('/exportar', methods=['GET', 'POST'])
+@login_required
+def exportar():
+    """Exportação em lote dos relatórios concluídos (ZIP de PDFs)"""
+    from app.services.exportacao_service import ExportacaoService
 
-    avaliacao_obj = Avaliacao.query.get_or_404(id)
-
-    # Gerar PDF
-    pdf_buffer = PDFService.gerar_relatorio_avaliacao(avaliacao_obj)
+    if request.method == 'POST':
+        escola = request.form.get('escola', '').strip()
+        data_inicio = request.form.get('data_inicio', '').strip()
+        data_fim = request.form.get('data_fim', '').strip()
+        avaliador_id = request.form.get('avaliador_id', type=int)
+
+        try:
+            data_inicio_dt = dt.strptime(data_inicio, '%Y-%m-%d').date() if data_inicio else None
+            data_fim_dt = dt.strptime(data_fim, '%Y-%m-%d').date() if data_fim else None
+        except ValueError:
+            flash('Período inválido', 'warning')
+            return redirect(url_for('relatorios.exportar'))
+
+        selecao = ExportacaoService.selecionar_avaliacoes(
+            current_user,
+            escola=escola or None,
+            data_inicio=data_inicio_dt,
+            data_fim=data_fim_dt,
+            avaliador_id=avaliador_id
+        )
+        if not selecao:
+            flash('Nenhuma avaliação concluída encontrada para os filtros informados.', 'warning')
+            return redirect(url_for('relatorios.exportar'))
+
+        filtros = {
+            'escola': escola or None,
+            'data_inicio': data_inicio or None,
+            'data_fim': data_fim or None,
+            'avaliador_id': avaliador_id
+        }
+        em_segundo_plano = len(selecao) > current_app.config['EXPORTACAO_LIMITE_SINCRONO']
+        exportacao = ExportacaoService.criar_exportacao(current_user, filtros, len(selecao), em_segundo_plano)
+
+        if em_segundo_plano:
+            ExportacaoService.iniciar_em_segundo_plano(exportacao, selecao)
+            flash(f'Exportação de {len(selecao)} relatórios iniciada. '
+                  'O arquivo ficará disponível nesta página quando concluído.', 'info')
+            return redirect(url_for('relatorios.exportar'))
+
+        nome_arquivo = f'relatorios_{dt.now().strftime("%Y%m%d_%H%M%S")}.zip'
+        return Response(
+            stream_with_context(ExportacaoService.gerar_conteudo(exportacao.id, selecao)),
+            mimetype='application/zip',
+            headers={'Content-Disposition': f'attachment; filename={nome_arquivo}'}
+        )
+
+    exportacoes = ExportacaoRelatorio.query.filter_by(user_id=current_user.id)\
+                                           .order_by(ExportacaoRelatorio.data_criacao.desc())\
+                                           .limit(20).all()
+
+    return render_template('relatorios/exportar.html',
+                          exportacoes=exportacoes)
+
+
+def _obter_exportacao_do_usuario(exportacao_id):
+    exportacao = ExportacaoRelatorio.query.get_or_404(exportacao_id)
+    if exportacao.user_id != current_user.id and not current_user.is_admin():
+        abort(403)
+    return exportacao
+
+
+@relatorios_bp.route('/exportacoes/<int:id>/status')
+@login_required
+def exportacao_status(id):
+    """Progresso de uma exportação em lote (JSON)"""
+    return jsonify(_obter_exportacao_do_usuario(id).to_dict())
 
-    # Criar resposta
-    response = make_response(pdf_buffer.getvalue())
-    response.headers['Content-Type'] = 'application/pdf'
-    response.headers['Content-Disposition'] = \
-        f'attachment; filename=avaliacao_{id}_{avaliacao_obj.paciente.nome.replace(" ", "_")}.pdf'
 
-    return response
+@relatorios_bp.route('/exportacoes/<int:id>/download')
+@login_required
+def exportacao_download(id):
+    """Download do ZIP gerado em segundo plano"""
+    from app.services.exportacao_service import ExportacaoService
+
+    exportacao = _obter_exportacao_do_usuario(id)
+    if not exportacao.disponivel:
+        flash('A exportação ainda não está disponível.', 'warning')
+        return redirect(url_for('relatorios.exportar'))
+
+    return send_file(
+        ExportacaoService.caminho_arquivo(exportacao),
+        mimetype='application/zip',
+        as_attachment=True,
+        download_name=f'relatorios_exportacao_{exportacao.id}.zip'
+    )
 
 
 @relatorios_bp.route('/evolucao/<int:paciente_id>')
 @login_required
 def evolucao(paciente_id):
     """Relatório de evolução do paciente"""
+    from app.services.evolucao_service import EvolucaoService
+
     paciente = Paciente.query.get_or_404(paciente_id)
 
     # Obter avaliações concluídas ordenadas por data
     avaliacoes = paciente.avaliacoes.filter_by(status='concluida')\
+                                     .options(joinedload(Avaliacao.instrumento))\
                                      .order_by(Avaliacao.data_avaliacao).all()
 
+    # Instrumentos disponíveis (o mais recente é o padrão)
+    instrumentos = EvolucaoService.instrumentos_do_paciente(paciente_id)
+    instrumento_selecionado = None
+    instrumento_id = request.args.get('instrumento_id', type=int)
+    for instrumento, _, _ in instrumentos:
+        if instrumento_id is None or instrumento.id == instrumento_id:
+            instrumento_selecionado = instrumento
+            break
+
     # Gerar gráfico de evolução
     grafico_evolucao = None
-    if len(avaliacoes) > 0:
-        grafico_evolucao = GraficoService.criar_grafico_evolucao(avaliacoes)
+    if instrumento_selecionado:
+        grafico_evolucao = EvolucaoService.obter_grafico(paciente_id, instrumento_selecionado)
 
     return render_template('relatorios/evolucao.html',
                           paciente=paciente,
                           avaliacoes=avaliacoes,
+                          instrumentos=instrumentos,
+                          instrumento_selecionado=instrumento_selecionado,
                           grafico_evolucao=grafico_evolucao)
 
 
@@ -101,7 +234,7 @@ def evolucao(paciente_id):
 @login_required
 def pei(avaliacao_id):
     """Relatório de PEI (Plano Educacional Individualizado)"""
-    avaliacao_obj = Avaliacao.query.get_or_404(avaliacao_id)
+    avaliacao_obj = CarregamentoService.avaliacao(avaliacao_id, 'pei')
 
     # Identificar itens críticos (aqueles com classificação de disfunção)
     itens_criticos = []
@@ -109,7 +242,7 @@ def pei(avaliacao_id):
     # Organizar respostas por domínio
     dominios_respostas = {}
 
-    for resposta in avaliacao_obj.respostas:
+    for resposta in CarregamentoService.respostas(avaliacao_obj.id):
         dominio_codigo = resposta.questao.dominio.codigo
         if dominio_codigo not in dominios_respostas:
             dominios_respostas[dominio_codigo] = {
@@ -140,11 +273,7 @@ def pei(avaliacao_id):
                 'valor': resposta.valor
             })
 
-    plano_selecionado = (
-        avaliacao_obj.plano_itens.join(PlanoItem.template_item)
-        .order_by(PlanoTemplateItem.ordem)
-        .all()
-    )
+    plano_selecionado = CarregamentoService.plano_itens(avaliacao_obj)
 
     plano_por_dominio = OrderedDict()
     for item in plano_selecionado:
@@ -6,7 +6,11 @@ from app.forms.paciente_form import PacienteForm
 from app.services.calculo_service import CalculoService
 from app.services.classificacao_service import ClassificacaoService
 from app.services.grafico_service import GraficoService
+from app.services.evolucao_service import EvolucaoService
+from app.services.pdf_template_service import PDFTemplateService
 from app.services.pdf_service import PDFService
+from app.services.pdf_cache_service import PDFCacheService
+from app.services.exportacao_service import ExportacaoService
 from app.services.dashboard_service import DashboardService
 from app.services.permission_service import PermissionService
 from app.services.upload_service import UploadService
@@ -15,7 +19,11 @@ __all__ = [
     'CalculoService',
     'ClassificacaoService',
     'GraficoService',
+    'EvolucaoService',
+    'PDFTemplateService',
     'PDFService',
+    'PDFCacheService',
+    'ExportacaoService',
     'DashboardService',
     'PermissionService',
     'UploadService'
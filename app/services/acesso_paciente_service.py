@@ -0,0 +1,236 @@
+"""
+Service para manutenção da tabela materializada de acesso a pacientes
+"""
+from datetime import datetime
+from sqlalchemy import and_, case, event, exists, func, inspect, literal, or_, select, union_all
+from app import db
+from app.models import AcessoPaciente, Avaliacao, CompartilhamentoPaciente, Paciente
+from app.models.paciente import paciente_responsavel
+
+
+class AcessoPacienteService:
+    """Mantém acesso_paciente sincronizada com as concessões de acesso"""
+
+    @staticmethod
+    def compartilhamento_vigente(agora=None):
+        """
+        Condição SQL de compartilhamento que concede acesso: ativo e não expirado
+
+        Compartilhamentos com prazo vencido deixam de valer imediatamente, mesmo
+        antes da varredura (flask expirar-compartilhamentos) revogá-los.
+
+        Args:
+            agora: Instante de referência (default: agora, UTC)
+        """
+        if agora is None:
+            agora = datetime.utcnow()
+        return and_(
+            CompartilhamentoPaciente.ativo.is_(True),
+            or_(
+                CompartilhamentoPaciente.data_expiracao.is_(None),
+                CompartilhamentoPaciente.data_expiracao > agora
+            )
+        )
+
+    @staticmethod
+    def compartilhamento_vencido(user_id, paciente_id, agora=None):
+        """
+        Condição SQL: o usuário tem compartilhamento do paciente com prazo vencido
+        ainda não revogado pela varredura (ainda presente em acesso_paciente)
+
+        Args:
+            user_id: ID do usuário
+            paciente_id: ID (ou coluna) do paciente
+            agora: Instante de referência (default: agora, UTC)
+        """
+        if agora is None:
+            agora = datetime.utcnow()
+        return exists().where(
+            CompartilhamentoPaciente.paciente_id == paciente_id,
+            CompartilhamentoPaciente.recebeu_user_id == user_id,
+            CompartilhamentoPaciente.ativo.is_(True),
+            CompartilhamentoPaciente.data_expiracao <= agora
+        )
+
+    @staticmethod
+    def graus_vigentes(user_id, paciente_ids):
+        """
+        Recalcula a partir das concessões vigentes o grau de acesso de um usuário
+
+        Usado para os pacientes cuja linha em acesso_paciente ainda reflete um
+        compartilhamento vencido.
+
+        Args:
+            user_id: ID do usuário
+            paciente_ids: IDs dos pacientes
+
+        Returns:
+            dict: {paciente_id: grau} (0 = sem acesso)
+        """
+        paciente_ids = list(paciente_ids)
+        if not paciente_ids:
+            return {}
+
+        concessoes = AcessoPacienteService._concessoes(paciente_ids)
+        graus = dict(db.session.execute(
+            select(concessoes.c.paciente_id, func.max(concessoes.c.grau)).where(
+                concessoes.c.user_id == user_id
+            ).group_by(concessoes.c.paciente_id)
+        ).all())
+        return {paciente_id: graus.get(paciente_id) or 0 for paciente_id in paciente_ids}
+
+    @staticmethod
+    def _concessoes(paciente_ids=None):
+        """
+        Concessões (user_id, paciente_id, grau) de todas as origens de acesso
+
+        Args:
+            paciente_ids: Restringe aos pacientes informados (None = todos)
+        """
+        avaliacoes_de_outros = exists().where(
+            Avaliacao.paciente_id == Paciente.id,
+            Avaliacao.avaliador_id != Paciente.criador_id
+        )
+
+        consultas = [
+            select(
+                Paciente.criador_id.label('user_id'),
+                Paciente.id.label('paciente_id'),
+                case((avaliacoes_de_outros, 2), else_=3).label('grau')
+            ),
+            select(
+                paciente_responsavel.c.user_id,
+                paciente_responsavel.c.paciente_id,
+                literal(2).label('grau')
+            ),
+            select(
+                Avaliacao.avaliador_id.label('user_id'),
+                Avaliacao.paciente_id,
+                literal(1).label('grau')
+            ),
+            select(
+                CompartilhamentoPaciente.recebeu_user_id.label('user_id'),
+                CompartilhamentoPaciente.paciente_id,
+                case(
+                    {'leitura': 1, 'edicao': 2, 'completo': 3},
+                    value=CompartilhamentoPaciente.tipo_acesso,
+                    else_=0
+                ).label('grau')
+            ).where(AcessoPacienteService.compartilhamento_vigente())
+        ]
+
+        if paciente_ids is not None:
+            colunas = (Paciente.id, paciente_responsavel.c.paciente_id,
+                       Avaliacao.paciente_id, CompartilhamentoPaciente.paciente_id)
+            consultas = [
+                consulta.where(coluna.in_(paciente_ids))
+                for consulta, coluna in zip(consultas, colunas)
+            ]
+
+        return union_all(*consultas).subquery()
+
+    @staticmethod
+    def _inserir(connection, paciente_ids=None):
+        concessoes = AcessoPacienteService._concessoes(paciente_ids)
+        grau = func.max(concessoes.c.grau)
+        niveis = select(
+            concessoes.c.user_id, concessoes.c.paciente_id, grau
+        ).join(
+            Paciente, Paciente.id == concessoes.c.paciente_id
+        ).where(
+            concessoes.c.user_id.isnot(None)
+        ).group_by(
+            concessoes.c.user_id, concessoes.c.paciente_id
+        ).having(grau > 0)
+
+        connection.execute(
+            AcessoPaciente.__table__.insert().from_select(['user_id', 'paciente_id', 'nivel'], niveis)
+        )
+
+    @staticmethod
+    def recalcular_pacientes(paciente_ids, connection=None):
+        """
+        Recalcula os acessos dos pacientes informados na transação corrente
+
+        As linhas dos pacientes são bloqueadas (SELECT ... FOR UPDATE, em ordem
+        de ID) antes da reconstrução: transações concorrentes que alteram
+        concessões do mesmo paciente reconstroem uma de cada vez, sem violar a
+        chave (user_id, paciente_id).
+
+        Args:
+            paciente_ids: IDs dos pacientes afetados
+            connection: Conexão a usar (default: a da sessão atual)
+        """
+        paciente_ids = sorted(set(paciente_ids))
+        if not paciente_ids:
+            return
+
+        if connection is None:
+            connection = db.session.connection()
+
+        connection.execute(
+            select(Paciente.id).where(Paciente.id.in_(paciente_ids)).order_by(Paciente.id).with_for_update()
+        )
+        connection.execute(
+            AcessoPaciente.__table__.delete().where(AcessoPaciente.paciente_id.in_(paciente_ids))
+        )
+        AcessoPacienteService._inserir(connection, paciente_ids)
+
+    @staticmethod
+    def reconstruir():
+        """
+        Reconstrói toda a tabela a partir das concessões
+
+        Returns:
+            int: Quantidade de linhas de acesso geradas
+        """
+        connection = db.session.connection()
+        connection.execute(AcessoPaciente.__table__.delete())
+        AcessoPacienteService._inserir(connection)
+        db.session.commit()
+        return AcessoPaciente.query.count()
+
+
+def _alterou(objeto, *atributos):
+    estado = inspect(objeto)
+    return any(estado.attrs[atributo].history.has_changes() for atributo in atributos)
+
+
+def _pacientes_afetados(session):
+    """Coleta IDs de pacientes cujas concessões de acesso mudaram no flush"""
+    afetados = set()
+    for objeto in session.new:
+        if isinstance(objeto, Paciente):
+            afetados.add(objeto.id)
+        elif isinstance(objeto, (Avaliacao, CompartilhamentoPaciente)):
+            afetados.add(objeto.paciente_id)
+
+    for objeto in session.deleted:
+        if isinstance(objeto, Paciente):
+            afetados.add(objeto.id)
+        elif isinstance(objeto, (Avaliacao, CompartilhamentoPaciente)):
+            afetados.add(objeto.paciente_id)
+
+    for objeto in session.dirty:
+        if isinstance(objeto, Paciente):
+            if _alterou(objeto, 'criador_id', 'responsaveis'):
+                afetados.add(objeto.id)
+        elif isinstance(objeto, Avaliacao):
+            if _alterou(objeto, 'avaliador_id', 'paciente_id'):
+                afetados.add(objeto.paciente_id)
+                afetados.update(inspect(objeto).attrs.paciente_id.history.deleted)
+        elif isinstance(objeto, CompartilhamentoPaciente):
+            if _alterou(objeto, 'ativo', 'tipo_acesso', 'recebeu_user_id', 'paciente_id'):
+                afetados.add(objeto.paciente_id)
+                afetados.update(inspect(objeto).attrs.paciente_id.history.deleted)
+
+    afetados.discard(None)
+    return afetados
+
+
+@event.listens_for(db.session, 'after_flush')
+def _recalcular_acessos(session, flush_context):
+    # Executa na mesma conexão/transação do flush: a tabela nunca fica defasada após o commit
+    afetados = _pacientes_afetados(session)
+    if afetados:
+        AcessoPacienteService.recalcular_pacientes(afetados, session.connection())
@@ -0,0 +1,417 @@
+"""
+Service de auditoria de acessos: gravação em segundo plano (write-behind),
+partições mensais, retenção com arquivamento e consulta
+"""
+import atexit
+import gzip
+import json
+import os
+import queue
+import threading
+import time
+from datetime import date, datetime, timedelta
+from flask import current_app, has_request_context, request
+from sqlalchemy import event, func, select, text
+from app import db
+from app.models import AuditoriaAcesso
+
+
+# Eventos aguardando gravação (compartilhada pelas threads do processo)
+_fila = queue.Queue()
+_estado = {'app': None, 'thread': None, 'pid': None, 'atexit': False}
+_lock = threading.Lock()
+
+# Partição que recebe eventos de meses sem partição própria (ver migração e5a4c0b9d731)
+_PARTICAO_PADRAO = 'auditoria_acessos_padrao'
+
+# Chave em session.info: a transação atual já enviou alterações ao banco (flush)
+_ESCRITAS_PENDENTES = 'auditoria_escritas_pendentes'
+
+
+class AuditoriaService:
+    """Registra eventos de auditoria sem commits extras no caminho da requisição"""
+
+    MODO_SINCRONO = 'sincrono'
+    MODO_ASSINCRONO = 'assincrono'
+
+    @staticmethod
+    def init_app(app):
+        """Associa a aplicação usada pela thread de gravação e descarrega a fila no encerramento"""
+        _estado['app'] = app
+        if not _estado['atexit']:
+            atexit.register(AuditoriaService.descarregar)
+            _estado['atexit'] = True
+
+    @staticmethod
+    def registrar(user, recurso_tipo, recurso_id, acao, paciente_id=None, detalhes=None):
+        """
+        Registra um evento de auditoria
+
+        Eventos de ações listadas em AUDITORIA_ACOES_SINCRONAS (ou todos, no modo
+        'sincrono') são gravados imediatamente; os demais entram na fila e são
+        inseridos em lote pela thread de gravação.
+
+        Args:
+            user: Usuário que acessou
+            recurso_tipo: Tipo do recurso ('paciente', 'avaliacao', 'prontuario'...)
+            recurso_id: ID do recurso
+            acao: Ação realizada
+            paciente_id: Paciente relacionado ao recurso (opcional)
+            detalhes: Descrição livre do evento (opcional)
+        """
+        evento = {
+            'user_id': user.id if user and user.is_authenticated else None,
+            'recurso_tipo': recurso_tipo,
+            'recurso_id': recurso_id,
+            'paciente_id': paciente_id,
+            'acao': acao,
+            'detalhes': detalhes,
+            'ip_address': None,
+            'user_agent': None,
+            'data_acesso': datetime.utcnow(),
+        }
+        if has_request_context():
+            evento['ip_address'] = request.remote_addr
+            evento['user_agent'] = request.user_agent.string if request.user_agent else None
+
+        if AuditoriaService._sincrono(acao):
+            AuditoriaService._gravar_sincrono(evento)
+        else:
+            AuditoriaService._enfileirar(evento)
+
+    @staticmethod
+    def _sincrono(acao):
+        config = current_app.config
+        if config.get('AUDITORIA_MODO', AuditoriaService.MODO_ASSINCRONO) == AuditoriaService.MODO_SINCRONO:
+            return True
+        return acao in config.get('AUDITORIA_ACOES_SINCRONAS', ())
+
+    @staticmethod
+    def _gravar_sincrono(evento):
+        """
+        Grava o evento em um savepoint da sessão atual
+
+        Nunca confirma nem desfaz o trabalho pendente do chamador: se a sessão já
+        tem alterações, o evento é confirmado (ou descartado) junto com elas; se
+        não tem, o commit grava apenas o evento. Uma falha desfaz só o savepoint.
+        """
+        sessao = db.session
+        trabalho_pendente = bool(
+            sessao.new or sessao.dirty or sessao.deleted or sessao.info.get(_ESCRITAS_PENDENTES)
+        )
+        try:
+            with sessao.begin_nested():
+                sessao.add(AuditoriaAcesso(**evento))
+        except Exception as e:
+            # Não deve quebrar a aplicação se auditoria falhar
+            print(f"Erro ao registrar auditoria: {e}")
+            return
+
+        if not trabalho_pendente:
+            sessao.commit()
+
+    @staticmethod
+    def _enfileirar(evento):
+        if _estado['app'] is None:
+            _estado['app'] = current_app._get_current_object()
+        _fila.put(evento)
+        AuditoriaService._garantir_thread()
+
+    @staticmethod
+    def _garantir_thread():
+        """Inicia a thread de gravação (também após fork do processo)"""
+        with _lock:
+            thread = _estado['thread']
+            if thread is not None and thread.is_alive() and _estado['pid'] == os.getpid():
+                return
+
+            thread = threading.Thread(target=AuditoriaService._processar, name='auditoria', daemon=True)
+            _estado['thread'] = thread
+            _estado['pid'] = os.getpid()
+            thread.start()
+
+    @staticmethod
+    def _processar():
+        """Laço da thread: agrupa eventos até AUDITORIA_LOTE ou AUDITORIA_INTERVALO segundos"""
+        app = _estado['app']
+        tamanho = app.config.get('AUDITORIA_LOTE', 200)
+        intervalo = app.config.get('AUDITORIA_INTERVALO', 2.0)
+
+        while True:
+            lote = [_fila.get()]
+            prazo = time.monotonic() + intervalo
+            while len(lote) < tamanho:
+                restante = prazo - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(_fila.get(timeout=restante))
+                except queue.Empty:
+                    break
+
+            AuditoriaService._gravar_lote(app, lote)
+
+    @staticmethod
+    def _gravar_lote(app, lote):
+        """Insere o lote com um único INSERT em conexão própria (independente da sessão da requisição)"""
+        try:
+            with app.app_context():
+                with db.engine.begin() as connection:
+                    connection.execute(AuditoriaAcesso.__table__.insert(), lote)
+        except Exception as e:
+            print(f"Erro ao gravar lote de auditoria ({len(lote)} eventos): {e}")
+        finally:
+            for _ in lote:
+                _fila.task_done()
+
+    @staticmethod
+    def descarregar(timeout=10.0):
+        """
+        Grava imediatamente os eventos pendentes (encerramento do processo, testes)
+
+        Args:
+            timeout: Tempo máximo, em segundos, aguardando lotes já em gravação
+
+        Returns:
+            int: Quantidade de eventos gravados por esta chamada
+        """
+        lote = []
+        while True:
+            try:
+                lote.append(_fila.get_nowait())
+            except queue.Empty:
+                break
+
+        if lote and _estado['app'] is not None:
+            AuditoriaService._gravar_lote(_estado['app'], lote)
+
+        # Aguarda a thread terminar o lote que já havia retirado da fila
+        prazo = time.monotonic() + timeout
+        while _fila.unfinished_tasks and time.monotonic() < prazo:
+            time.sleep(0.05)
+
+        return len(lote)
+
+    # ===== Armazenamento: partições mensais, retenção e consulta =====
+
+    @staticmethod
+    def _particionado():
+        return db.engine.dialect.name == 'postgresql'
+
+    @staticmethod
+    def _inicio_mes(data, deslocamento=0):
+        """Primeiro dia do mês de `data` deslocado em `deslocamento` meses"""
+        indice = data.year * 12 + (data.month - 1) + deslocamento
+        return date(indice // 12, indice % 12 + 1, 1)
+
+    @staticmethod
+    def _nome_particao(mes):
+        return f'auditoria_acessos_{mes.year}_{mes.month:02d}'
+
+    @staticmethod
+    def garantir_particoes(meses_futuros=None):
+        """
+        Cria as partições mensais do mês corrente e dos próximos meses (apenas Postgres)
+
+        Se o comando rodar com atraso, as linhas do mês já gravadas na partição
+        DEFAULT são movidas para a nova partição.
+
+        Args:
+            meses_futuros: Quantidade de meses à frente (default: AUDITORIA_PARTICOES_FUTURAS)
+
+        Returns:
+            list: Nomes das partições criadas
+        """
+        if not AuditoriaService._particionado():
+            return []
+
+        if meses_futuros is None:
+            meses_futuros = current_app.config.get('AUDITORIA_PARTICOES_FUTURAS', 3)
+
+        criadas = []
+        hoje = date.today()
+        for deslocamento in range(meses_futuros + 1):
+            mes = AuditoriaService._inicio_mes(hoje, deslocamento)
+            nome = AuditoriaService._nome_particao(mes)
+            existe = db.session.execute(text('SELECT to_regclass(:nome)'), {'nome': nome}).scalar()
+            if existe:
+                continue
+
+            seguinte = AuditoriaService._inicio_mes(mes, 1)
+            AuditoriaService._criar_particao(nome, mes, seguinte)
+            criadas.append(nome)
+
+        db.session.commit()
+        return criadas
+
+    @staticmethod
+    def _criar_particao(nome, mes, seguinte):
+        """
+        Cria a partição do mês movendo antes as linhas do período que estão na DEFAULT
+
+        O Postgres recusa criar a partição enquanto a DEFAULT tiver linhas do
+        intervalo. A DEFAULT fica bloqueada para escrita até o commit, para que
+        nenhum evento do mês entre nela durante a troca.
+        """
+        intervalo = {'inicio': mes, 'fim': seguinte}
+        db.session.execute(text(f'LOCK TABLE {_PARTICAO_PADRAO} IN SHARE ROW EXCLUSIVE MODE'))
+        pendentes = db.session.execute(text(
+            f'SELECT EXISTS (SELECT 1 FROM {_PARTICAO_PADRAO} '
+            'WHERE data_acesso >= :inicio AND data_acesso < :fim)'
+        ), intervalo).scalar()
+
+        if pendentes:
+            db.session.execute(text(
+                'CREATE TEMPORARY TABLE auditoria_acessos_mover '
+                '(LIKE auditoria_acessos) ON COMMIT DROP'
+            ))
+            db.session.execute(text(
+                f'WITH movidas AS (DELETE FROM {_PARTICAO_PADRAO} '
+                'WHERE data_acesso >= :inicio AND data_acesso < :fim RETURNING *) '
+                'INSERT INTO auditoria_acessos_mover SELECT * FROM movidas'
+            ), intervalo)
+
+        db.session.execute(text(
+            f"CREATE TABLE {nome} PARTITION OF auditoria_acessos "
+            f"FOR VALUES FROM ('{mes.isoformat()}') TO ('{seguinte.isoformat()}')"
+        ))
+
+        if pendentes:
+            db.session.execute(text('INSERT INTO auditoria_acessos SELECT * FROM auditoria_acessos_mover'))
+            db.session.execute(text('DROP TABLE auditoria_acessos_mover'))
+
+    @staticmethod
+    def get_arquivo_folder():
+        """Diretório dos arquivos de auditoria arquivados"""
+        pasta = current_app.config.get('AUDITORIA_ARQUIVO_FOLDER') or os.path.join(
+            current_app.config['UPLOAD_FOLDER'], 'auditoria'
+        )
+        os.makedirs(pasta, exist_ok=True)
+        return pasta
+
+    @staticmethod
+    def arquivar(meses_retencao=None):
+        """
+        Exporta para JSONL compactado os meses fora do período de retenção e os remove do banco
+
+        No Postgres a partição do mês é desanexada e descartada; nos demais bancos
+        as linhas do período são excluídas.
+
+        Args:
+            meses_retencao: Meses mantidos no banco (default: AUDITORIA_RETENCAO_MESES)
+
+        Returns:
+            list: Caminhos dos arquivos gerados (auditoria_AAAA_MM.jsonl.gz)
+        """
+        if meses_retencao is None:
+            meses_retencao = current_app.config.get('AUDITORIA_RETENCAO_MESES', 24)
+
+        tabela = AuditoriaAcesso.__table__
+        limite = AuditoriaService._inicio_mes(date.today(), -meses_retencao)
+        mais_antigo = db.session.execute(
+            select(func.min(tabela.c.data_acesso)).where(tabela.c.data_acesso < limite)
+        ).scalar()
+        if mais_antigo is None:
+            return []
+
+        arquivos = []
+        mes = AuditoriaService._inicio_mes(mais_antigo)
+        while mes < limite:
+            seguinte = AuditoriaService._inicio_mes(mes, 1)
+            caminho = AuditoriaService._exportar_mes(mes, seguinte)
+            if caminho:
+                arquivos.append(caminho)
+            AuditoriaService._remover_mes(mes, seguinte)
+            mes = seguinte
+
+        return arquivos
+
+    @staticmethod
+    def _exportar_mes(mes, seguinte):
+        """Grava as linhas do mês em auditoria_AAAA_MM.jsonl.gz (lendo em blocos)"""
+        tabela = AuditoriaAcesso.__table__
+        consulta = select(tabela).where(
+            tabela.c.data_acesso >= mes,
+            tabela.c.data_acesso < seguinte
+        ).order_by(tabela.c.data_acesso, tabela.c.id).execution_options(yield_per=1000)
+
+        caminho = os.path.join(
+            AuditoriaService.get_arquivo_folder(), f'auditoria_{mes.year}_{mes.month:02d}.jsonl.gz'
+        )
+        temporario = f'{caminho}.tmp'
+        total = 0
+        with gzip.open(temporario, 'wt', encoding='utf-8') as arquivo:
+            for linha in db.session.execute(consulta).mappings():
+                arquivo.write(json.dumps(dict(linha), default=str, ensure_ascii=False))
+                arquivo.write('\n')
+                total += 1
+
+        if not total:
+            os.remove(temporario)
+            return None
+
+        os.replace(temporario, caminho)
+        return caminho
+
+    @staticmethod
+    def _remover_mes(mes, seguinte):
+        nome = AuditoriaService._nome_particao(mes)
+        if AuditoriaService._particionado() and db.session.execute(
+                text('SELECT to_regclass(:nome)'), {'nome': nome}).scalar():
+            db.session.execute(text(f'ALTER TABLE auditoria_acessos DETACH PARTITION {nome}'))
+            db.session.execute(text(f'DROP TABLE {nome}'))
+        else:
+            tabela = AuditoriaAcesso.__table__
+            db.session.execute(tabela.delete().where(
+                tabela.c.data_acesso >= mes,
+                tabela.c.data_acesso < seguinte
+            ))
+        db.session.commit()
+
+    @staticmethod
+    def consultar(data_inicio=None, data_fim=None, user_id=None, paciente_id=None, acao=None):
+        """
+        Consulta de eventos para revisão de acessos
+
+        O período é sempre aplicado (default: últimos 30 dias) para que o Postgres
+        leia apenas as partições dos meses envolvidos.
+
+        Args:
+            data_inicio: Data inicial (inclusive)
+            data_fim: Data final (inclusive)
+            user_id: Filtra pelo usuário
+            paciente_id: Filtra pelo paciente
+            acao: Filtra pela ação
+
+        Returns:
+            Query ordenada do evento mais recente para o mais antigo
+        """
+        if data_fim is None:
+            data_fim = date.today()
+        if data_inicio is None:
+            data_inicio = data_fim - timedelta(days=30)
+
+        query = AuditoriaAcesso.query.filter(
+            AuditoriaAcesso.data_acesso >= data_inicio,
+            AuditoriaAcesso.data_acesso < data_fim + timedelta(days=1)
+        )
+        if user_id:
+            query = query.filter(AuditoriaAcesso.user_id == user_id)
+        if paciente_id:
+            query = query.filter(AuditoriaAcesso.paciente_id == paciente_id)
+        if acao:
+            query = query.filter(AuditoriaAcesso.acao == acao)
+
+        return query.order_by(AuditoriaAcesso.data_acesso.desc(), AuditoriaAcesso.id.desc())
+
+
+@event.listens_for(db.session, 'after_flush')
+def _marcar_escritas(session, flush_context):
+    session.info[_ESCRITAS_PENDENTES] = True
+
+
+@event.listens_for(db.session, 'after_transaction_end')
+def _limpar_escritas(session, transaction):
+    # Apenas o fim da transação externa (commit ou rollback) descarta o indicador
+    if transaction.parent is None:
+        session.info.pop(_ESCRITAS_PENDENTES, None)
@@ -0,0 +1,120 @@
+"""
+Service de busca incremental (autocomplete) de pacientes e avaliadores
+"""
+from datetime import date
+from flask import current_app
+from sqlalchemy import or_, select
+from app import db
+from app.models import Paciente
+from app.models.user import User
+from app.services.permission_service import PermissionService
+
+
+class AutocompleteService:
+    """Sugestões limitadas por prefixo, para formulários que não carregam listas completas"""
+
+    @staticmethod
+    def limite(solicitado=None):
+        """
+        Quantidade de sugestões, limitada por AUTOCOMPLETE_MAX_RESULTADOS
+
+        Args:
+            solicitado: Limite pedido pelo cliente (opcional)
+
+        Returns:
+            int: Limite efetivo
+        """
+        maximo = current_app.config.get('AUTOCOMPLETE_MAX_RESULTADOS', 20)
+        if not solicitado or solicitado < 1:
+            return maximo
+        return min(solicitado, maximo)
+
+    @staticmethod
+    def padroes(termo):
+        """
+        Padrões LIKE para início do texto e início de palavra
+
+        Curingas digitados pelo usuário são escapados com '\\'.
+
+        Args:
+            termo: Texto digitado
+
+        Returns:
+            tuple: (padrão do início, padrão de início de palavra)
+        """
+        termo = termo.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        return f'{termo}%', f'% {termo}%'
+
+    @staticmethod
+    def pacientes(user, termo, limite=20):
+        """
+        Pacientes ativos visíveis ao usuário cujo nome ou identificação começa com o termo
+
+        Args:
+            user: Usuário atual (filtro de permissão)
+            termo: Texto digitado (vazio = primeiros em ordem alfabética)
+            limite: Máximo de sugestões
+
+        Returns:
+            list: [{'id', 'nome', 'identificacao', 'idade', 'texto'}]
+        """
+        query = select(
+            Paciente.id, Paciente.nome, Paciente.identificacao, Paciente.data_nascimento
+        ).where(Paciente.ativo.is_(True))
+        query = PermissionService.filtrar_pacientes_por_permissao(query, user)
+
+        termo = (termo or '').strip()
+        if termo:
+            inicio, palavra = AutocompleteService.padroes(termo)
+            query = query.where(or_(
+                Paciente.nome.ilike(inicio, escape='\\'),
+                Paciente.nome.ilike(palavra, escape='\\'),
+                Paciente.identificacao.ilike(inicio, escape='\\')
+            ))
+
+        hoje = date.today()
+        sugestoes = []
+        for linha in db.session.execute(query.order_by(Paciente.nome, Paciente.id).limit(limite)):
+            idade = Paciente(data_nascimento=linha.data_nascimento).calcular_idade(hoje)[0]
+            sugestoes.append({
+                'id': linha.id,
+                'nome': linha.nome,
+                'identificacao': linha.identificacao,
+                'idade': idade,
+                'texto': f'{linha.nome} - {idade} anos'
+            })
+        return sugestoes
+
+    @staticmethod
+    def avaliadores(termo, limite=20):
+        """
+        Usuários ativos cujo nome começa com o termo
+
+        Args:
+            termo: Texto digitado (vazio = primeiros em ordem alfabética)
+            limite: Máximo de sugestões
+
+        Returns:
+            list: [{'id', 'nome', 'tipo', 'texto'}]
+        """
+        query = select(User.id, User.nome_completo, User.tipo).where(User.ativo.is_(True))
+
+        termo = (termo or '').strip()
+        if termo:
+            inicio, palavra = AutocompleteService.padroes(termo)
+            query = query.where(or_(
+                User.nome_completo.ilike(inicio, escape='\\'),
+                User.nome_completo.ilike(palavra, escape='\\')
+            ))
+
+        return [
+            {
+                'id': linha.id,
+                'nome': linha.nome_completo,
+                'tipo': linha.tipo,
+                'texto': f'{linha.nome_completo} ({(linha.tipo or "").capitalize()})'
+            }
+            for linha in db.session.execute(
+                query.order_by(User.nome_completo, User.id).limit(limite)
+            )
+        ]
@@ -84,12 +84,13 @@ class CalculoService:
         return escores
 
     @staticmethod
-    def atualizar_escores_avaliacao(avaliacao):
+    def atualizar_escores_avaliacao(avaliacao, commit=True):
         """
         Atualiza os escores da avaliação no banco de dados
 
         Args:
             avaliacao: Instância de Avaliacao
+            commit: Se True, confirma a transação
 
         Returns:
             dict: Escores calculados
@@ -109,7 +110,8 @@ class CalculoService:
         avaliacao.escore_olf = escores.get('OLF', 0)  # Apenas SPM-P
         avaliacao.escore_total = escores.get('TOTAL', 0)
 
-        db.session.commit()
+        if commit:
+            db.session.commit()
 
         return escores
 
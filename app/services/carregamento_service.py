@@ -0,0 +1,81 @@
+"""
+Service de perfis de carregamento (eager loading) das telas de avaliação
+"""
+from flask import abort
+from sqlalchemy.orm import contains_eager, joinedload
+from app.models import Avaliacao, Dominio, PlanoItem, PlanoTemplateItem, Questao, Resposta
+
+
+# Cabeçalho comum: paciente, instrumento e avaliador no mesmo SELECT da avaliação
+_CABECALHO = (
+    joinedload(Avaliacao.paciente),
+    joinedload(Avaliacao.instrumento),
+    joinedload(Avaliacao.avaliador),
+)
+
+# Perfis nomeados por tela (opções aplicadas à consulta da avaliação)
+PERFIS = {
+    'detalhe': _CABECALHO,
+    'relatorio': _CABECALHO,
+    'pei': _CABECALHO,
+}
+
+
+class CarregamentoService:
+    """Carrega o grafo de cada tela em um número fixo de consultas"""
+
+    @staticmethod
+    def avaliacao(avaliacao_id, perfil='detalhe'):
+        """
+        Avaliação com os relacionamentos do perfil já carregados
+
+        Usa uma consulta (não o mapa de identidade) para que as opções sejam
+        aplicadas mesmo que a avaliação já tenha sido carregada na requisição.
+
+        Args:
+            avaliacao_id: ID da avaliação
+            perfil: Nome do perfil em PERFIS
+
+        Returns:
+            Avaliacao (404 se não existir)
+        """
+        avaliacao = Avaliacao.query.options(*PERFIS[perfil]).filter(Avaliacao.id == avaliacao_id).first()
+        if avaliacao is None:
+            abort(404)
+        return avaliacao
+
+    @staticmethod
+    def respostas(avaliacao_id):
+        """
+        Respostas com questão e domínio, em ordem de domínio e número
+
+        Questão e domínio vêm do mesmo JOIN usado na ordenação (contains_eager).
+
+        Returns:
+            list: Respostas da avaliação
+        """
+        return (
+            Resposta.query
+            .join(Resposta.questao)
+            .join(Questao.dominio)
+            .options(contains_eager(Resposta.questao).contains_eager(Questao.dominio))
+            .filter(Resposta.avaliacao_id == avaliacao_id)
+            .order_by(Dominio.ordem, Questao.numero)
+            .all()
+        )
+
+    @staticmethod
+    def plano_itens(avaliacao):
+        """
+        Itens de plano da avaliação com o item de template, em ordem do template
+
+        Returns:
+            list: PlanoItem
+        """
+        return (
+            avaliacao.plano_itens
+            .join(PlanoItem.template_item)
+            .options(contains_eager(PlanoItem.template_item))
+            .order_by(PlanoTemplateItem.ordem)
+            .all()
+        )
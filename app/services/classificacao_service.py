@@ -56,12 +56,13 @@ class ClassificacaoService:
         }
 
     @staticmethod
-    def classificar_avaliacao(avaliacao):
+    def classificar_avaliacao(avaliacao, commit=True):
         """
         Classifica todos os domínios de uma avaliação
 
         Args:
             avaliacao: Instância de Avaliacao
+            commit: Se True, confirma a transação
 
         Returns:
             dict: Classificações por domínio
@@ -95,7 +96,8 @@ class ClassificacaoService:
                 setattr(avaliacao, f'classificacao_{dominio_codigo.lower()}',
                        classificacao['classificacao'])
 
-        db.session.commit()
+        if commit:
+            db.session.commit()
 
         return classificacoes
 
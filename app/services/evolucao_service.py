@@ -0,0 +1,379 @@
+"""
+Service para evolução longitudinal dos escores de qualquer instrumento
+"""
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+
+from flask import current_app
+from sqlalchemy import func
+
+from app import db
+from app.models.avaliacao import Avaliacao
+from app.models.instrumento import Instrumento
+from app.models.resultado import ResultadoDominio
+from app.services.modulos_service import ModulosService
+
+
+class EvolucaoService:
+    """Armazena escores por domínio e monta a série temporal do paciente"""
+
+    DOMINIOS_SPM = [
+        ('SOC', 'Participação Social'),
+        ('VIS', 'Visão'),
+        ('HEA', 'Audição'),
+        ('TOU', 'Tato'),
+        ('BOD', 'Consciência Corporal'),
+        ('BAL', 'Equilíbrio e Movimento'),
+        ('PLA', 'Planejamento e Ideação'),
+        ('OLF', 'Olfato e Paladar')
+    ]
+
+    NOMES_SECOES_PERFIL = {
+        'AUDITIVO': 'Processamento Auditivo',
+        'VISUAL': 'Processamento Visual',
+        'TATO': 'Processamento Tátil',
+        'MOVIMENTOS': 'Processamento de Movimentos',
+        'POSICAO_CORPO': 'Posição do Corpo',
+        'ORAL': 'Sensibilidade Oral',
+        'CONDUTA': 'Conduta',
+        'SOCIOEMOCIONAL': 'Socioemocional',
+        'ATENCAO': 'Atenção',
+        'EXPLORACAO': 'Quadrante Exploração',
+        'ESQUIVA': 'Quadrante Esquiva',
+        'SENSIBILIDADE': 'Quadrante Sensibilidade',
+        'OBSERVACAO': 'Quadrante Observação'
+    }
+
+    # Prefixo do código do instrumento -> (cálculo do ModulosService, campo de classificação)
+    INSTRUMENTOS_POR_DOMINIO = [
+        ('PEDI', ModulosService.calcular_escores_pedi, 'classificacao'),
+        ('COG', ModulosService.calcular_escores_cognitiva, 'classificacao'),
+        ('AVD', ModulosService.calcular_escores_avd, 'nivel_independencia'),
+    ]
+
+    PREFIXOS_SUPORTADOS = ('SPM', 'PERFIL_SENS', 'PEDI', 'COG', 'AVD', 'FIM', 'WEEFIM', 'GMFM', 'ABC', 'COPM')
+
+    @staticmethod
+    def instrumento_suportado(codigo):
+        """Indica se os escores do instrumento podem ser extraídos"""
+        return bool(codigo) and codigo.upper().startswith(EvolucaoService.PREFIXOS_SUPORTADOS)
+
+    @staticmethod
+    def _classificacao(valor):
+        if isinstance(valor, dict):
+            valor = valor.get('nivel')
+        if isinstance(valor, str) and len(valor) <= 100:
+            return valor
+        return None
+
+    @staticmethod
+    def _item(codigo, nome, escore, escore_maximo=None, t_score=None, classificacao=None):
+        return {
+            'codigo': codigo,
+            'nome': nome,
+            'escore': escore,
+            'escore_maximo': escore_maximo,
+            't_score': t_score,
+            'classificacao': EvolucaoService._classificacao(classificacao)
+        }
+
+    @staticmethod
+    def extrair_resultados(avaliacao):
+        """
+        Converte os escores de uma avaliação para o formato uniforme por domínio
+
+        Args:
+            avaliacao: Instância de Avaliacao concluída
+
+        Returns:
+            list: Dicionários com codigo, nome, escore, escore_maximo, t_score e classificacao
+        """
+        codigo = (avaliacao.instrumento.codigo or '').upper()
+        item = EvolucaoService._item
+        resultados = []
+
+        if codigo.startswith('SPM'):
+            for sigla, nome in EvolucaoService.DOMINIOS_SPM:
+                campo = sigla.lower()
+                escore = getattr(avaliacao, f'escore_{campo}')
+                if escore is not None:
+                    resultados.append(item(sigla, nome, escore,
+                                           t_score=getattr(avaliacao, f't_score_{campo}'),
+                                           classificacao=getattr(avaliacao, f'classificacao_{campo}')))
+            if avaliacao.escore_total is not None:
+                resultados.append(item(ResultadoDominio.CODIGO_TOTAL, 'Total', avaliacao.escore_total,
+                                       t_score=avaliacao.t_score_tot,
+                                       classificacao=avaliacao.classificacao_tot))
+
+        elif codigo.startswith('PERFIL_SENS'):
+            perfil = ModulosService.calcular_perfil_sensorial(avaliacao.id) or {}
+            for secao, dados in perfil.get('secoes', {}).items():
+                maximo = ModulosService.SECOES_PERFIL_SENSORIAL[secao]['max_pontos']
+                resultados.append(item(secao, EvolucaoService.NOMES_SECOES_PERFIL.get(secao, secao),
+                                       dados['escore_bruto'], maximo, classificacao=dados['classificacao']))
+            for quadrante, dados in perfil.get('quadrantes', {}).items():
+                resultados.append(item(quadrante, EvolucaoService.NOMES_SECOES_PERFIL.get(quadrante, quadrante),
+                                       dados['escore_bruto'], dados['escore_maximo'],
+                                       classificacao=dados['classificacao']))
+
+        elif codigo.startswith('FIM') or codigo.startswith('WEEFIM'):
+            calcular = ModulosService.calcular_escores_weefim if codigo.startswith('WEEFIM') \
+                else ModulosService.calcular_escores_fim
+            escores = calcular(avaliacao.id) or {}
+            for chave, nome in (('motor', 'Motor'), ('cognitivo', 'Cognitivo')):
+                if chave in escores:
+                    dados = escores[chave]
+                    resultados.append(item(chave.upper(), nome, dados['escore'], dados['maximo'],
+                                           classificacao=dados['nivel']))
+            if 'total' in escores:
+                dados = escores['total']
+                resultados.append(item(ResultadoDominio.CODIGO_TOTAL, 'Total', dados['escore'], dados['maximo'],
+                                       classificacao=dados['nivel']))
+
+        elif codigo.startswith('GMFM'):
+            escores = ModulosService.calcular_escores_gmfm(avaliacao.id) or {}
+            total = escores.pop('TOTAL', None)
+            for dominio_codigo, dados in escores.items():
+                resultados.append(item(dominio_codigo, dados['nome'], dados['escore_bruto'], dados['escore_maximo']))
+            if total:
+                resultados.append(item(ResultadoDominio.CODIGO_TOTAL, 'GMFM Total', total['escore_gmfm'], 100))
+
+        elif codigo.startswith('ABC'):
+            escores = ModulosService.calcular_escores_abc(avaliacao.id)
+            if escores:
+                resultados.append(item(ResultadoDominio.CODIGO_TOTAL, 'Confiança no Equilíbrio',
+                                       escores['escore_total'], 100, classificacao=escores['risco_queda']))
+
+        elif codigo.startswith('COPM'):
+            escores = ModulosService.calcular_escores_copm(avaliacao.id)
+            if escores and escores['problemas']:
+                resultados.append(item('DESEMPENHO', 'Desempenho', round(escores['desempenho_medio'], 1), 10))
+                resultados.append(item('SATISFACAO', 'Satisfação', round(escores['satisfacao_media'], 1), 10))
+
+        else:
+            for prefixo, calcular, campo_classificacao in EvolucaoService.INSTRUMENTOS_POR_DOMINIO:
+                if not codigo.startswith(prefixo):
+                    continue
+
+                escores = calcular(avaliacao.id) or {}
+                nomes = {dominio.codigo: dominio.nome for dominio in avaliacao.instrumento.dominios}
+                for dominio_codigo, dados in escores.items():
+                    nome = 'Total' if dominio_codigo == ResultadoDominio.CODIGO_TOTAL \
+                        else nomes.get(dominio_codigo, dominio_codigo)
+                    resultados.append(item(dominio_codigo, nome, dados['escore_bruto'], dados['escore_maximo'],
+                                           classificacao=dados.get(campo_classificacao)))
+                break
+
+        return resultados
+
+    @staticmethod
+    def salvar_resultados(avaliacao, commit=True):
+        """
+        Grava (substituindo) os escores por domínio de uma avaliação
+
+        Args:
+            avaliacao: Instância de Avaliacao concluída
+            commit: Se True, confirma a transação
+
+        Returns:
+            int: Quantidade de resultados gravados
+        """
+        ResultadoDominio.query.filter_by(avaliacao_id=avaliacao.id).delete(synchronize_session=False)
+
+        agora = datetime.utcnow()
+        resultados = EvolucaoService.extrair_resultados(avaliacao)
+        for ordem, resultado in enumerate(resultados):
+            db.session.add(ResultadoDominio(
+                avaliacao_id=avaliacao.id,
+                paciente_id=avaliacao.paciente_id,
+                instrumento_id=avaliacao.instrumento_id,
+                data_avaliacao=avaliacao.data_avaliacao,
+                dominio_codigo=resultado['codigo'],
+                dominio_nome=resultado['nome'],
+                ordem=ordem,
+                escore=resultado['escore'],
+                escore_maximo=resultado['escore_maximo'],
+                t_score=resultado['t_score'],
+                classificacao=resultado['classificacao'],
+                data_atualizacao=agora
+            ))
+
+        # Marca a extração mesmo sem resultados, para a avaliação não ficar pendente
+        avaliacao.data_resultados = agora
+
+        if commit:
+            db.session.commit()
+        return len(resultados)
+
+    @staticmethod
+    def atualizar_pendentes(paciente_id=None, instrumento_id=None, lote=500):
+        """
+        Grava os resultados de avaliações concluídas que nunca tiveram os escores
+        extraídos (concluídas antes do armazenamento dos resultados)
+
+        Carga única (flask atualizar-resultados): avaliações finalizadas já têm
+        os resultados gravados pelo FinalizacaoService.
+
+        Args:
+            paciente_id: Restringe a um paciente (opcional)
+            instrumento_id: Restringe a um instrumento (opcional)
+            lote: Avaliações por commit
+
+        Returns:
+            int: Quantidade de avaliações atualizadas
+        """
+        query = Avaliacao.query.filter(
+            Avaliacao.status == 'concluida',
+            Avaliacao.data_resultados.is_(None)
+        )
+        if paciente_id is not None:
+            query = query.filter(Avaliacao.paciente_id == paciente_id)
+        if instrumento_id is not None:
+            query = query.filter(Avaliacao.instrumento_id == instrumento_id)
+
+        total = 0
+        while True:
+            # Cada lote gravado sai do filtro (data_resultados preenchida)
+            pendentes = query.order_by(Avaliacao.id).limit(lote).all()
+            if not pendentes:
+                return total
+
+            for avaliacao in pendentes:
+                EvolucaoService.salvar_resultados(avaliacao, commit=False)
+            db.session.commit()
+            total += len(pendentes)
+
+    @staticmethod
+    def instrumentos_do_paciente(paciente_id):
+        """
+        Instrumentos com avaliações concluídas do paciente
+
+        Returns:
+            list: [(Instrumento, total de avaliações, data da última)] da mais recente para a mais antiga
+        """
+        linhas = db.session.query(
+            Instrumento,
+            func.count(Avaliacao.id),
+            func.max(Avaliacao.data_avaliacao)
+        ).join(Avaliacao, Avaliacao.instrumento_id == Instrumento.id).filter(
+            Avaliacao.paciente_id == paciente_id,
+            Avaliacao.status == 'concluida'
+        ).group_by(Instrumento.id).order_by(func.max(Avaliacao.data_avaliacao).desc()).all()
+
+        return [linha for linha in linhas if EvolucaoService.instrumento_suportado(linha[0].codigo)]
+
+    @staticmethod
+    def reduzir_pontos(total, limite):
+        """
+        Índices a manter ao reduzir uma série longa (amostragem uniforme,
+        preservando a primeira e a última avaliação)
+
+        Args:
+            total: Quantidade de pontos da série
+            limite: Quantidade máxima de pontos desejada
+
+        Returns:
+            list: Índices ordenados
+        """
+        if limite < 2 or total <= limite:
+            return list(range(total))
+        return sorted({round(i * (total - 1) / (limite - 1)) for i in range(limite)})
+
+    @staticmethod
+    def obter_serie(paciente_id, instrumento_id, limite_pontos=None):
+        """
+        Série temporal dos escores armazenados (uma única consulta)
+
+        Args:
+            paciente_id: ID do paciente
+            instrumento_id: ID do instrumento
+            limite_pontos: Máximo de avaliações na série (default: EVOLUCAO_MAX_PONTOS)
+
+        Returns:
+            dict: {'datas', 'avaliacao_ids', 'dominios': [(codigo, nome, valores)],
+                   'total': valores ou None, 'percentual': bool, 'total_avaliacoes': int}
+        """
+        linhas = db.session.query(
+            ResultadoDominio.avaliacao_id,
+            ResultadoDominio.data_avaliacao,
+            ResultadoDominio.dominio_codigo,
+            ResultadoDominio.dominio_nome,
+            ResultadoDominio.escore,
+            ResultadoDominio.escore_maximo
+        ).filter(
+            ResultadoDominio.paciente_id == paciente_id,
+            ResultadoDominio.instrumento_id == instrumento_id
+        ).order_by(
+            ResultadoDominio.data_avaliacao,
+            ResultadoDominio.avaliacao_id,
+            ResultadoDominio.ordem
+        ).all()
+
+        avaliacoes = OrderedDict()
+        dominios = OrderedDict()
+        percentual = bool(linhas)
+        for avaliacao_id, data_avaliacao, codigo, nome, escore, escore_maximo in linhas:
+            avaliacoes.setdefault(avaliacao_id, (data_avaliacao, {}))[1][codigo] = (escore, escore_maximo)
+            dominios.setdefault(codigo, nome)
+            if escore_maximo is None:
+                percentual = False
+
+        if limite_pontos is None:
+            limite_pontos = current_app.config.get('EVOLUCAO_MAX_PONTOS', 60)
+        itens = list(avaliacoes.items())
+        itens = [itens[i] for i in EvolucaoService.reduzir_pontos(len(itens), limite_pontos)]
+
+        def valores(codigo):
+            serie = []
+            for _, (_, escores) in itens:
+                escore, escore_maximo = escores.get(codigo, (None, None))
+                if escore is not None and percentual:
+                    escore = round(escore * 100 / escore_maximo, 1)
+                serie.append(escore)
+            return serie
+
+        return {
+            'datas': [data for _, (data, _) in itens],
+            'avaliacao_ids': [avaliacao_id for avaliacao_id, _ in itens],
+            'dominios': [(codigo, nome, valores(codigo)) for codigo, nome in dominios.items()
+                         if codigo != ResultadoDominio.CODIGO_TOTAL],
+            'total': valores(ResultadoDominio.CODIGO_TOTAL) if ResultadoDominio.CODIGO_TOTAL in dominios else None,
+            'percentual': percentual,
+            'total_avaliacoes': len(avaliacoes)
+        }
+
+    @staticmethod
+    def obter_grafico(paciente_id, instrumento):
+        """
+        Gráfico de evolução do paciente em um instrumento, reaproveitando a figura
+        enquanto os resultados armazenados não mudarem
+
+        Args:
+            paciente_id: ID do paciente
+            instrumento: Instância de Instrumento
+
+        Returns:
+            str: HTML do gráfico Plotly (ou None sem dados)
+        """
+        quantidade, ultima_atualizacao = db.session.query(
+            func.count(ResultadoDominio.id),
+            func.max(ResultadoDominio.data_atualizacao)
+        ).filter(
+            ResultadoDominio.paciente_id == paciente_id,
+            ResultadoDominio.instrumento_id == instrumento.id
+        ).one()
+
+        if not quantidade:
+            return None
+
+        return _grafico_em_cache(paciente_id, instrumento.id, instrumento.nome, ultima_atualizacao, quantidade)
+
+
+@lru_cache(maxsize=256)
+def _grafico_em_cache(paciente_id, instrumento_id, instrumento_nome, ultima_atualizacao, quantidade):
+    # A chave inclui a última atualização e o total de resultados: qualquer gravação gera nova figura
+    from app.services.grafico_service import GraficoService
+
+    serie = EvolucaoService.obter_serie(paciente_id, instrumento_id)
+    return GraficoService.criar_grafico_evolucao(serie, titulo=f'Evolução - {instrumento_nome}')
@@ -0,0 +1,386 @@
+"""
+Service para exportação em lote de relatórios em PDF (arquivo ZIP)
+"""
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func
+from werkzeug.utils import secure_filename
+
+from app import db
+from app.models.avaliacao import Avaliacao
+from app.models.exportacao import ExportacaoRelatorio
+from app.models.paciente import Paciente
+from app.models.prontuario import Prontuario
+from app.services.pdf_cache_service import PDFCacheService
+from app.services.permission_service import PermissionService
+
+
+class _SaidaZip(io.RawIOBase):
+    """
+    Destino não posicionável para o zipfile
+
+    Acumula os bytes escritos até serem drenados, permitindo enviar o ZIP
+    em blocos sem manter o arquivo completo em memória.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._partes = []
+        self._posicao = 0
+
+    def writable(self):
+        return True
+
+    def write(self, dados):
+        dados = bytes(dados)
+        self._partes.append(dados)
+        self._posicao += len(dados)
+        return len(dados)
+
+    def tell(self):
+        return self._posicao
+
+    def drenar(self):
+        dados = b''.join(self._partes)
+        self._partes.clear()
+        return dados
+
+
+# Aplicação criada em cada processo auxiliar do pool de geração de PDFs
+_app_worker = None
+
+
+def _inicializar_worker(config_name, config_overrides):
+    global _app_worker
+    from app import create_app
+    _app_worker = create_app(config_name, config_overrides)
+
+
+def _gerar_pdf_worker(avaliacao_id):
+    with _app_worker.app_context():
+        avaliacao = db.session.get(Avaliacao, avaliacao_id)
+        if avaliacao is None:
+            return avaliacao_id, None
+        caminho, _, _ = PDFCacheService.obter_pdf(avaliacao)
+        return avaliacao_id, caminho
+
+
+class ExportacaoService:
+    """Seleciona avaliações concluídas e as empacota em um ZIP de PDFs"""
+
+    TAMANHO_BLOCO = 64 * 1024
+    INTERVALO_PROGRESSO = 10
+
+    @staticmethod
+    def get_export_folder():
+        """Retorna o diretório onde os ZIPs gerados em segundo plano são armazenados"""
+        pasta = current_app.config.get('EXPORTACAO_FOLDER')
+        if not pasta:
+            from app.services.upload_service import UploadService
+            pasta = os.path.join(UploadService.get_upload_folder(), 'exportacoes')
+
+        os.makedirs(pasta, exist_ok=True)
+        return pasta
+
+    @staticmethod
+    def selecionar_avaliacoes(user, escola=None, data_inicio=None, data_fim=None, avaliador_id=None):
+        """
+        Seleciona as avaliações concluídas visíveis ao usuário
+
+        Args:
+            user: Usuário que solicitou a exportação
+            escola: Trecho do nome da escola (prontuário do paciente)
+            data_inicio: Data inicial (date) da avaliação
+            data_fim: Data final (date) da avaliação
+            avaliador_id: ID do terapeuta avaliador
+
+        Returns:
+            list: [(avaliacao_id, nome_no_zip)] ordenada por paciente e data
+        """
+        query = db.session.query(
+            Avaliacao.id,
+            Avaliacao.data_avaliacao,
+            Paciente.nome
+        ).join(Paciente, Avaliacao.paciente_id == Paciente.id).filter(
+            Avaliacao.status == 'concluida'
+        )
+        query = PermissionService.filtrar_pacientes_por_permissao(query, user)
+
+        if escola:
+            query = query.join(Prontuario, Prontuario.paciente_id == Paciente.id).filter(
+                func.lower(Prontuario.escola).like(f'%{escola.lower()}%')
+            )
+        if data_inicio:
+            query = query.filter(Avaliacao.data_avaliacao >= data_inicio)
+        if data_fim:
+            query = query.filter(Avaliacao.data_avaliacao <= data_fim)
+        if avaliador_id:
+            query = query.filter(Avaliacao.avaliador_id == avaliador_id)
+
+        selecao = []
+        for avaliacao_id, data_avaliacao, nome_paciente in query.order_by(Paciente.nome, Avaliacao.data_avaliacao).all():
+            pasta = secure_filename(nome_paciente) or 'paciente'
+            selecao.append((avaliacao_id, f'{pasta}/avaliacao_{avaliacao_id}_{data_avaliacao.strftime("%Y-%m-%d")}.pdf'))
+        return selecao
+
+    @staticmethod
+    def criar_exportacao(user, filtros, total, em_segundo_plano=False):
+        """Registra a exportação (histórico e trilha de auditoria)"""
+        exportacao = ExportacaoRelatorio(
+            user_id=user.id,
+            filtros=filtros,
+            total_avaliacoes=total,
+            em_segundo_plano=em_segundo_plano
+        )
+        db.session.add(exportacao)
+        db.session.commit()
+
+        PermissionService.registrar_acesso(user, 'exportacao', exportacao.id, 'exportar')
+        return exportacao
+
+    @staticmethod
+    def gerar_pdfs(avaliacao_ids):
+        """
+        Gera (ou reaproveita do cache) os PDFs das avaliações
+
+        PDFs já presentes no cache são entregues imediatamente; os demais são
+        gerados em paralelo em um pool de processos quando EXPORTACAO_PROCESSOS > 0.
+        Os arquivos são entregues já abertos: uma versão removida do cache entre
+        a verificação e a leitura é tratada como ausência no cache e gerada de novo.
+
+        Args:
+            avaliacao_ids: Lista de IDs de avaliações concluídas
+
+        Yields:
+            tuple: (avaliacao_id, arquivo binário aberto com o PDF)
+        """
+        pendentes = []
+        for avaliacao_id in avaliacao_ids:
+            avaliacao = db.session.get(Avaliacao, avaliacao_id)
+            if avaliacao is None:
+                continue
+
+            versao, _ = PDFCacheService.obter_versao(avaliacao)
+            caminho = PDFCacheService.caminho_arquivo(avaliacao_id, versao)
+            try:
+                arquivo = open(caminho, 'rb')
+            except FileNotFoundError:
+                pendentes.append(avaliacao_id)
+                continue
+            yield avaliacao_id, arquivo
+
+        processos = current_app.config.get('EXPORTACAO_PROCESSOS', 0)
+        if processos < 1 or len(pendentes) < 2:
+            for avaliacao_id in pendentes:
+                arquivo, _, _ = PDFCacheService.abrir_pdf(db.session.get(Avaliacao, avaliacao_id))
+                yield avaliacao_id, arquivo
+            return
+
+        config_overrides = {
+            'SQLALCHEMY_DATABASE_URI': db.engine.url.render_as_string(hide_password=False),
+            'UPLOAD_FOLDER': current_app.config['UPLOAD_FOLDER'],
+            'PDF_CACHE_FOLDER': PDFCacheService.get_cache_folder()
+        }
+        # 'spawn' evita herdar conexões de banco e threads do processo web
+        with ProcessPoolExecutor(
+            max_workers=min(processos, len(pendentes)),
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_inicializar_worker,
+            initargs=(current_app.config['CONFIG_NAME'], config_overrides)
+        ) as executor:
+            for avaliacao_id, caminho in executor.map(_gerar_pdf_worker, pendentes):
+                if not caminho:
+                    continue
+                try:
+                    arquivo = open(caminho, 'rb')
+                except FileNotFoundError:
+                    arquivo, _, _ = PDFCacheService.abrir_pdf(db.session.get(Avaliacao, avaliacao_id))
+                yield avaliacao_id, arquivo
+
+    @staticmethod
+    def gerar_zip(arquivos):
+        """
+        Monta o ZIP em streaming
+
+        Args:
+            arquivos: Iterável de (nome no ZIP, caminho ou arquivo binário aberto);
+                arquivos abertos são fechados após a leitura
+
+        Yields:
+            bytes: Blocos do arquivo ZIP
+        """
+        saida = _SaidaZip()
+        # PDFs já são comprimidos; compressão mínima reduz o custo de CPU
+        with zipfile.ZipFile(saida, mode='w', compression=zipfile.ZIP_DEFLATED, compresslevel=1) as arquivo_zip:
+            for nome, arquivo in arquivos:
+                origem = open(arquivo, 'rb') if isinstance(arquivo, (str, os.PathLike)) else arquivo
+                with origem, arquivo_zip.open(nome, mode='w', force_zip64=True) as destino:
+                    while True:
+                        bloco = origem.read(ExportacaoService.TAMANHO_BLOCO)
+                        if not bloco:
+                            break
+                        destino.write(bloco)
+                        dados = saida.drenar()
+                        if dados:
+                            yield dados
+
+                dados = saida.drenar()
+                if dados:
+                    yield dados
+
+        dados = saida.drenar()
+        if dados:
+            yield dados
+
+    @staticmethod
+    def gerar_conteudo(exportacao_id, selecao, concluir=True):
+        """
+        Gera o ZIP de uma exportação atualizando o progresso no registro
+
+        Se a geração não chegar ao fim (erro, cliente desconectado ou gerador
+        descartado), a exportação é marcada com erro.
+
+        Args:
+            exportacao_id: ID da ExportacaoRelatorio
+            selecao: Lista [(avaliacao_id, nome_no_zip)] de selecionar_avaliacoes
+            concluir: Marca a exportação como concluída ao final (False quando
+                o chamador ainda precisa registrar o arquivo gerado)
+
+        Yields:
+            bytes: Blocos do arquivo ZIP
+        """
+        exportacao = db.session.get(ExportacaoRelatorio, exportacao_id)
+        exportacao.status = ExportacaoRelatorio.STATUS_PROCESSANDO
+        db.session.commit()
+
+        nomes = dict(selecao)
+
+        def arquivos():
+            for avaliacao_id, arquivo in ExportacaoService.gerar_pdfs(list(nomes)):
+                yield nomes[avaliacao_id], arquivo
+
+                exportacao.avaliacoes_processadas += 1
+                if exportacao.avaliacoes_processadas % ExportacaoService.INTERVALO_PROGRESSO == 0:
+                    db.session.commit()
+
+        # GeneratorExit (download interrompido) não é Exception: tratado no finally
+        erro = 'Geração interrompida antes do término'
+        try:
+            yield from ExportacaoService.gerar_zip(arquivos())
+            erro = None
+        except Exception as e:
+            erro = str(e)
+            raise
+        finally:
+            if erro is not None:
+                ExportacaoService.registrar_erro(exportacao_id, erro)
+
+        if concluir:
+            exportacao.status = ExportacaoRelatorio.STATUS_CONCLUIDA
+            exportacao.data_conclusao = datetime.utcnow()
+            db.session.commit()
+
+    @staticmethod
+    def registrar_erro(exportacao_id, mensagem):
+        """Marca a exportação como encerrada com erro"""
+        db.session.rollback()
+        exportacao = db.session.get(ExportacaoRelatorio, exportacao_id)
+        if exportacao is None:
+            return
+        exportacao.status = ExportacaoRelatorio.STATUS_ERRO
+        exportacao.mensagem_erro = mensagem
+        exportacao.data_conclusao = datetime.utcnow()
+        db.session.commit()
+
+    @staticmethod
+    def interromper_pendentes(minutos=None):
+        """
+        Marca com erro as exportações pendentes ou em processamento sem progresso há mais tempo que o limite
+
+        Cobre gerações que não puderam registrar o próprio erro (processo ou
+        thread encerrados durante a exportação). Usa data_atualizacao, gravada a
+        cada commit de progresso, e não a idade da exportação: gerações longas
+        que continuam avançando não são interrompidas. Executada apenas pelo
+        comando periódico `flask expirar-exportacoes`.
+
+        Args:
+            minutos: Tempo máximo sem progresso (default: EXPORTACAO_TEMPO_MAXIMO)
+
+        Returns:
+            int: Número de exportações marcadas com erro
+        """
+        if minutos is None:
+            minutos = current_app.config['EXPORTACAO_TEMPO_MAXIMO']
+        agora = datetime.utcnow()
+
+        total = ExportacaoRelatorio.query.filter(
+            ExportacaoRelatorio.status.in_((ExportacaoRelatorio.STATUS_PENDENTE, ExportacaoRelatorio.STATUS_PROCESSANDO)),
+            ExportacaoRelatorio.data_atualizacao < agora - timedelta(minutes=minutos)
+        ).update({
+            'status': ExportacaoRelatorio.STATUS_ERRO,
+            'mensagem_erro': 'Exportação interrompida',
+            'data_conclusao': agora
+        }, synchronize_session=False)
+        db.session.commit()
+        return total
+
+    @staticmethod
+    def executar_em_segundo_plano(app, exportacao_id, selecao):
+        """
+        Gera o ZIP em disco (usado pela thread de exportações grandes)
+
+        A exportação só é marcada como concluída depois que o arquivo está no
+        lugar definitivo e registrado (nome e tamanho) no mesmo commit.
+
+        Args:
+            app: Instância da aplicação Flask
+            exportacao_id: ID da ExportacaoRelatorio
+            selecao: Lista [(avaliacao_id, nome_no_zip)]
+        """
+        with app.app_context():
+            try:
+                pasta = ExportacaoService.get_export_folder()
+                nome_arquivo = f'exportacao_{exportacao_id}.zip'
+                fd, temporario = tempfile.mkstemp(dir=pasta, suffix='.tmp')
+                try:
+                    with os.fdopen(fd, 'wb') as destino:
+                        for bloco in ExportacaoService.gerar_conteudo(exportacao_id, selecao, concluir=False):
+                            destino.write(bloco)
+                    os.replace(temporario, os.path.join(pasta, nome_arquivo))
+                finally:
+                    if os.path.exists(temporario):
+                        os.unlink(temporario)
+
+                exportacao = db.session.get(ExportacaoRelatorio, exportacao_id)
+                exportacao.nome_arquivo = nome_arquivo
+                exportacao.tamanho_bytes = os.path.getsize(os.path.join(pasta, nome_arquivo))
+                exportacao.status = ExportacaoRelatorio.STATUS_CONCLUIDA
+                exportacao.data_conclusao = datetime.utcnow()
+                db.session.commit()
+            except Exception as e:
+                print(f"Erro na exportação {exportacao_id}: {e}")
+                ExportacaoService.registrar_erro(exportacao_id, str(e))
+
+    @staticmethod
+    def iniciar_em_segundo_plano(exportacao, selecao):
+        """Dispara a geração do ZIP em uma thread separada"""
+        thread = threading.Thread(
+            target=ExportacaoService.executar_em_segundo_plano,
+            args=(current_app._get_current_object(), exportacao.id, selecao),
+            daemon=True
+        )
+        thread.start()
+        return thread
+
+    @staticmethod
+    def caminho_arquivo(exportacao):
+        """Caminho do ZIP gerado em segundo plano"""
+        return os.path.join(ExportacaoService.get_export_folder(), exportacao.nome_arquivo)
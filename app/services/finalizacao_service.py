@@ -0,0 +1,74 @@
+"""
+Service de finalização de avaliações (escores, classificação e resultados em uma transação)
+"""
+from datetime import datetime
+from blinker import Namespace
+from app import db
+from app.services.calculo_service import CalculoService
+from app.services.classificacao_service import ClassificacaoService
+from app.services.evolucao_service import EvolucaoService
+
+
+_sinais = Namespace()
+
+# Enviado após o commit da finalização ou do recálculo (caches e consolidações).
+# Argumentos: sender=FinalizacaoService, avaliacao, recalculo (False na finalização)
+avaliacao_finalizada = _sinais.signal('avaliacao-finalizada')
+
+
+class FinalizacaoService:
+    """Pipeline de finalização: um único commit para escores, classificações, resultados e status"""
+
+    @staticmethod
+    def finalizar(avaliacao):
+        """
+        Calcula, classifica, grava os resultados por domínio e conclui a avaliação
+
+        Args:
+            avaliacao: Instância de Avaliacao com todas as questões respondidas
+
+        Returns:
+            dict: Classificações por domínio
+
+        Raises:
+            ValueError: Se ainda houver questões sem resposta
+        """
+        if not avaliacao.esta_completa():
+            faltam = avaliacao.total_questoes - avaliacao.questoes_respondidas
+            raise ValueError(f'Ainda faltam {faltam} questão(ões) para responder')
+        return FinalizacaoService._executar(avaliacao, concluir=True)
+
+    @staticmethod
+    def recalcular(avaliacao):
+        """
+        Refaz escores, classificações e resultados de uma avaliação concluída
+
+        Alterações pendentes na sessão (ex: a resposta editada) são gravadas na
+        mesma transação.
+
+        Args:
+            avaliacao: Instância de Avaliacao
+
+        Returns:
+            dict: Classificações por domínio
+        """
+        return FinalizacaoService._executar(avaliacao, concluir=False)
+
+    @staticmethod
+    def _executar(avaliacao, concluir):
+        try:
+            CalculoService.atualizar_escores_avaliacao(avaliacao, commit=False)
+            classificacoes = ClassificacaoService.classificar_avaliacao(avaliacao, commit=False)
+
+            if concluir:
+                avaliacao.status = 'concluida'
+                avaliacao.data_conclusao = datetime.utcnow()
+
+            EvolucaoService.salvar_resultados(avaliacao, commit=False)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        avaliacao_finalizada.send(FinalizacaoService, avaliacao=avaliacao, recalculo=not concluir)
+        return classificacoes
@@ -20,91 +20,82 @@ class GraficoService:
     }
 
     @staticmethod
-    def criar_grafico_evolucao(avaliacoes):
+    def criar_grafico_evolucao(serie, titulo='Evolução dos Escores'):
         """
-        Cria gráfico de evolução temporal dos escores
+        Cria gráfico de evolução temporal dos escores de qualquer instrumento
 
         Args:
-            avaliacoes: Lista de avaliações do paciente (ordenadas por data)
+            serie: Série temporal de EvolucaoService.obter_serie
+                   ({'datas', 'dominios': [(codigo, nome, valores)], 'total', 'percentual'})
+            titulo: Título do gráfico
 
         Returns:
             str: HTML do gráfico Plotly
         """
-        if not avaliacoes:
+        if not serie or not serie['datas']:
             return None
 
-        # Preparar dados
-        datas = [av.data_avaliacao for av in avaliacoes]
-        data_labels = [av.data_avaliacao.strftime('%d/%m/%Y') for av in avaliacoes]
+        data_labels = [data.strftime('%d/%m/%Y') for data in serie['datas']]
+        unidade = 'Escore (%)' if serie.get('percentual') else 'Escore'
+        tem_total = serie.get('total') and any(valor is not None for valor in serie['total'])
 
-        # Criar figura com subplots
-        fig = make_subplots(
-            rows=2, cols=1,
-            subplot_titles=('Escores por Domínio', 'Escore Total'),
-            vertical_spacing=0.15,
-            row_heights=[0.7, 0.3]
-        )
+        if tem_total:
+            fig = make_subplots(
+                rows=2, cols=1,
+                subplot_titles=('Escores por Domínio', 'Escore Total'),
+                vertical_spacing=0.15,
+                row_heights=[0.7, 0.3]
+            )
+        else:
+            fig = make_subplots(rows=1, cols=1, subplot_titles=('Escores por Domínio',))
 
         # Adicionar traços para cada domínio
-        dominios = [
-            ('SOC', 'Participação Social'),
-            ('VIS', 'Visão'),
-            ('HEA', 'Audição'),
-            ('TOU', 'Tato'),
-            ('BOD', 'Consciência Corporal'),
-            ('BAL', 'Equilíbrio e Movimento'),
-            ('PLA', 'Planejamento e Ideação'),
-            ('OLF', 'Olfato e Paladar')
-        ]
+        for codigo, nome, valores in serie['dominios']:
+            if not any(valor is not None for valor in valores):
+                continue
 
-        for codigo, nome in dominios:
-            # Obter escores
-            escores = []
-            for av in avaliacoes:
-                escore = getattr(av, f'escore_{codigo.lower()}', None)
-                if escore is not None:
-                    escores.append(escore)
-                else:
-                    escores.append(None)
-
-            # Se tem dados, adicionar ao gráfico
-            if any(e is not None for e in escores):
-                fig.add_trace(
-                    go.Scatter(
-                        x=data_labels,
-                        y=escores,
-                        name=nome,
-                        mode='lines+markers',
-                        line=dict(color=GraficoService.CORES_DOMINIOS.get(codigo, '#000000'), width=2),
-                        marker=dict(size=8)
-                    ),
-                    row=1, col=1
-                )
+            linha = dict(width=2)
+            if codigo in GraficoService.CORES_DOMINIOS:
+                linha['color'] = GraficoService.CORES_DOMINIOS[codigo]
+
+            fig.add_trace(
+                go.Scatter(
+                    x=data_labels,
+                    y=valores,
+                    name=nome,
+                    mode='lines+markers',
+                    line=linha,
+                    marker=dict(size=8),
+                    connectgaps=True
+                ),
+                row=1, col=1
+            )
 
         # Adicionar escore total
-        escores_totais = [av.escore_total for av in avaliacoes if av.escore_total]
-        if escores_totais:
+        if tem_total:
             fig.add_trace(
                 go.Scatter(
                     x=data_labels,
-                    y=escores_totais,
+                    y=serie['total'],
                     name='Total',
                     mode='lines+markers',
                     line=dict(color='#e74c3c', width=3),
                     marker=dict(size=10),
-                    fill='tozeroy'
+                    fill='tozeroy',
+                    connectgaps=True
                 ),
                 row=2, col=1
             )
+            fig.update_xaxes(title_text="Data da Avaliação", row=2, col=1)
+            fig.update_yaxes(title_text=f"{unidade} Total", row=2, col=1)
+        else:
+            fig.update_xaxes(title_text="Data da Avaliação", row=1, col=1)
 
-        # Atualizar layout
-        fig.update_xaxes(title_text="Data da Avaliação", row=2, col=1)
-        fig.update_yaxes(title_text="Escore", row=1, col=1)
-        fig.update_yaxes(title_text="Escore Total", row=2, col=1)
+        fig.update_yaxes(title_text=unidade, row=1, col=1)
 
         fig.update_layout(
-            height=700,
-            title_text="Evolução dos Escores SPM",
+            height=700 if tem_total else 500,
+            title_text=titulo,
             hovermode='x unified',
             showlegend=True,
             legend=dict(
@@ -0,0 +1,245 @@
+"""
+Service para cache versionado dos PDFs de avaliações concluídas
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+
+from flask import current_app
+from sqlalchemy import event, func
+
+from app import db
+from app.models.avaliacao import Avaliacao, Resposta
+from app.models.plano import PlanoItem
+
+
+class PDFCacheService:
+    """Armazena os PDFs gerados com uma chave de versão derivada do estado da avaliação"""
+
+    PREFIXO_DIRETORIO = 'avaliacao_'
+    # Gerações seguidas em que o arquivo sumiu antes de ser aberto (corrida com nova versão)
+    TENTATIVAS = 3
+
+    @staticmethod
+    def get_cache_folder():
+        """Retorna o diretório onde os PDFs são armazenados"""
+        pasta = current_app.config.get('PDF_CACHE_FOLDER')
+        if not pasta:
+            from app.services.upload_service import UploadService
+            pasta = os.path.join(UploadService.get_upload_folder(), 'cache_pdf')
+
+        os.makedirs(pasta, exist_ok=True)
+        return pasta
+
+    @staticmethod
+    def pode_usar_cache(avaliacao):
+        """Somente avaliações concluídas produzem PDFs estáveis"""
+        return avaliacao is not None and avaliacao.status == 'concluida'
+
+    @staticmethod
+    def obter_versao(avaliacao):
+        """
+        Calcula a chave de versão do PDF de uma avaliação
+
+        A chave combina a data de atualização da avaliação e do paciente,
+        o carimbo das respostas e o estado de seleção dos itens do PEI.
+
+        Args:
+            avaliacao: Instância de Avaliacao
+
+        Returns:
+            tuple: (chave: str, ultima_modificacao: datetime)
+        """
+        total_respostas, ultima_resposta = db.session.query(
+            func.count(Resposta.id),
+            func.max(Resposta.data_atualizacao)
+        ).filter(Resposta.avaliacao_id == avaliacao.id).one()
+
+        itens_plano = db.session.query(
+            PlanoItem.template_item_id,
+            PlanoItem.data_atualizacao
+        ).filter(
+            PlanoItem.avaliacao_id == avaliacao.id,
+            PlanoItem.selecionado.is_(True)
+        ).order_by(PlanoItem.template_item_id).all()
+
+        datas = [avaliacao.data_atualizacao, avaliacao.paciente.data_atualizacao, ultima_resposta]
+        datas.extend(item.data_atualizacao for item in itens_plano)
+        ultima_modificacao = max(data for data in datas if data is not None)
+
+        partes = [
+            str(avaliacao.id),
+            avaliacao.data_atualizacao.isoformat() if avaliacao.data_atualizacao else '',
+            avaliacao.paciente.data_atualizacao.isoformat() if avaliacao.paciente.data_atualizacao else '',
+            str(total_respostas),
+            ultima_resposta.isoformat() if ultima_resposta else '',
+            ','.join(str(item.template_item_id) for item in itens_plano),
+        ]
+        chave = hashlib.sha256('|'.join(partes).encode('utf-8')).hexdigest()[:32]
+
+        return chave, ultima_modificacao
+
+    @staticmethod
+    def _diretorio_avaliacao(avaliacao_id):
+        return os.path.join(
+            PDFCacheService.get_cache_folder(),
+            f'{PDFCacheService.PREFIXO_DIRETORIO}{avaliacao_id}'
+        )
+
+    @staticmethod
+    def caminho_arquivo(avaliacao_id, versao):
+        """Caminho do PDF para uma versão específica"""
+        return os.path.join(PDFCacheService._diretorio_avaliacao(avaliacao_id), f'{versao}.pdf')
+
+    @staticmethod
+    def obter_pdf(avaliacao, gerador=None):
+        """
+        Retorna o caminho do PDF em cache, gerando-o se necessário
+
+        O PDF é gerado em um arquivo temporário exclusivo na pasta do cache e
+        movido (os.replace) para o lugar; só então as demais versões da avaliação
+        são removidas. O diretório da avaliação nunca é apagado, de modo que
+        gerações simultâneas não removem o arquivo umas das outras.
+
+        O arquivo ainda pode ser removido por uma versão mais nova antes de ser
+        aberto: para servi-lo, use abrir_pdf.
+
+        Args:
+            avaliacao: Instância de Avaliacao concluída
+            gerador: Função que recebe a avaliação e retorna um buffer com o PDF
+                     (default: PDFService.gerar_relatorio_avaliacao)
+
+        Returns:
+            tuple: (caminho: str, versao: str, ultima_modificacao: datetime)
+        """
+        versao, ultima_modificacao = PDFCacheService.obter_versao(avaliacao)
+        caminho = PDFCacheService.caminho_arquivo(avaliacao.id, versao)
+
+        if not os.path.exists(caminho):
+            PDFCacheService._gerar(avaliacao, caminho, gerador)
+
+        return caminho, versao, ultima_modificacao
+
+    @staticmethod
+    def abrir_pdf(avaliacao, gerador=None):
+        """
+        Abre o PDF em cache para leitura
+
+        Se o arquivo for removido entre a geração e a abertura (nova versão ou
+        invalidação simultâneas), trata como ausência no cache e gera de novo;
+        depois de TENTATIVAS, gera em um arquivo temporário fora do cache.
+        Depois de aberto, o arquivo pode ser lido mesmo que seja removido.
+
+        Returns:
+            tuple: (arquivo binário aberto, versao: str, ultima_modificacao: datetime)
+        """
+        for _ in range(PDFCacheService.TENTATIVAS):
+            caminho, versao, ultima_modificacao = PDFCacheService.obter_pdf(avaliacao, gerador)
+            try:
+                return open(caminho, 'rb'), versao, ultima_modificacao
+            except FileNotFoundError:
+                continue
+
+        arquivo = tempfile.TemporaryFile()
+        try:
+            PDFCacheService._escrever(avaliacao, arquivo, gerador)
+        except Exception:
+            arquivo.close()
+            raise
+        arquivo.seek(0)
+        return arquivo, versao, ultima_modificacao
+
+    @staticmethod
+    def _escrever(avaliacao, destino, gerador=None):
+        if gerador is None:
+            # Grava direto no arquivo, sem buffer intermediário em memória
+            from app.services.pdf_service import PDFService
+            PDFService.gerar_relatorio_avaliacao(avaliacao, destino)
+        else:
+            shutil.copyfileobj(gerador(avaliacao), destino)
+
+    @staticmethod
+    def _gerar(avaliacao, caminho, gerador=None):
+        """Gera o PDF em um temporário exclusivo e o move para `caminho`"""
+        # Temporários ficam na raiz do cache, fora dos diretórios que têm versões removidas
+        fd, temporario = tempfile.mkstemp(dir=PDFCacheService.get_cache_folder(), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as destino:
+                PDFCacheService._escrever(avaliacao, destino, gerador)
+
+            diretorio = os.path.dirname(caminho)
+            os.makedirs(diretorio, exist_ok=True)
+            try:
+                os.replace(temporario, caminho)
+            except FileNotFoundError:
+                # Diretório removido externamente (limpeza manual do cache): recria
+                os.makedirs(diretorio, exist_ok=True)
+                os.replace(temporario, caminho)
+        finally:
+            if os.path.exists(temporario):
+                os.unlink(temporario)
+
+        # Versões anteriores não serão mais servidas
+        PDFCacheService._remover_versoes(diretorio, manter=os.path.basename(caminho))
+
+    @staticmethod
+    def _remover_versoes(diretorio, manter=None):
+        """Remove os PDFs do diretório da avaliação (exceto `manter`), ignorando os já removidos"""
+        try:
+            nomes = os.listdir(diretorio)
+        except FileNotFoundError:
+            return
+
+        for nome in nomes:
+            if nome.endswith('.pdf') and nome != manter:
+                try:
+                    os.remove(os.path.join(diretorio, nome))
+                except FileNotFoundError:
+                    pass
+
+    @staticmethod
+    def invalidar(avaliacao_id):
+        """Remove todas as versões armazenadas de uma avaliação"""
+        try:
+            PDFCacheService._remover_versoes(PDFCacheService._diretorio_avaliacao(avaliacao_id))
+        except Exception as e:
+            # Falha na limpeza não deve quebrar a requisição; a chave de versão já protege
+            print(f"Erro ao invalidar cache de PDF: {e}")
+
+
+def _avaliacoes_afetadas(session):
+    """Coleta IDs de avaliações cujas respostas, classificações ou itens do PEI mudaram"""
+    afetadas = set()
+    for objeto in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(objeto, Avaliacao):
+            avaliacao_id = objeto.id
+        elif isinstance(objeto, (Resposta, PlanoItem)):
+            avaliacao_id = objeto.avaliacao_id
+        else:
+            continue
+
+        if avaliacao_id is not None:
+            afetadas.add(avaliacao_id)
+    return afetadas
+
+
+@event.listens_for(db.session, 'after_flush')
+def _registrar_avaliacoes_alteradas(session, flush_context):
+    # Após o flush os objetos novos já possuem ID, mas as coleções ainda não foram limpas
+    session.info.setdefault('pdf_cache_invalidar', set()).update(_avaliacoes_afetadas(session))
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidar_apos_commit(session):
+    avaliacoes = session.info.pop('pdf_cache_invalidar', None)
+    if not avaliacoes:
+        return
+
+    for avaliacao_id in avaliacoes:
+        PDFCacheService.invalidar(avaliacao_id)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _descartar_apos_rollback(session):
+    session.info.pop('pdf_cache_invalidar', None)
@@ -2,85 +2,38 @@
 Serviço de Geração de PDFs
 Cria relatórios em PDF usando ReportLab
 """
-from io import BytesIO
-from reportlab.lib.pagesizes import A4, letter
-from reportlab.lib import colors
-from reportlab.lib.units import inch, cm
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT, TA_JUSTIFY
-from datetime import datetime
+from reportlab.lib.units import cm
+from reportlab.platypus import PageBreak
 from app.services.grafico_service import GraficoService
 from app.services.modulos_service import ModulosService
+from app.services.pdf_template_service import PDFTemplateService
 
 
 class PDFService:
     """Serviço para geração de relatórios PDF"""
 
     @staticmethod
-    def gerar_relatorio_avaliacao(avaliacao):
+    def gerar_relatorio_avaliacao(avaliacao, destino=None):
         """
         Gera relatório completo de avaliação em PDF
 
         Args:
             avaliacao: Instância de Avaliacao
+            destino: Arquivo binário onde o PDF será gravado (default: BytesIO)
 
         Returns:
-            BytesIO: Buffer com o PDF gerado
+            Arquivo com o PDF gerado, posicionado no início
         """
-        buffer = BytesIO()
-
-        # Criar documento
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=A4,
-            rightMargin=2*cm,
-            leftMargin=2*cm,
-            topMargin=2*cm,
-            bottomMargin=2*cm
-        )
-
-        # Container para elementos
+        layout = PDFTemplateService
         story = []
 
-        # Estilos
-        styles = getSampleStyleSheet()
-
-        # Estilo customizado para título
-        titulo_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            textColor=colors.HexColor('#2c3e50'),
-            spaceAfter=30,
-            alignment=TA_CENTER
-        )
-
-        subtitulo_style = ParagraphStyle(
-            'CustomSubtitle',
-            parent=styles['Heading2'],
-            fontSize=14,
-            textColor=colors.HexColor('#34495e'),
-            spaceAfter=12,
-            spaceBefore=20
-        )
-
-        grafico_titulo_style = ParagraphStyle(
-            'GraphTitle',
-            parent=styles['Heading3'],
-            fontSize=12,
-            textColor=colors.HexColor('#2c3e50'),
-            spaceBefore=12,
-            spaceAfter=6
-        )
-
         # Cabeçalho
-        story.append(Paragraph("RELATÓRIO DE AVALIAÇÃO SPM", titulo_style))
-        story.append(Paragraph("Sensory Processing Measure", styles['Normal']))
-        story.append(Spacer(1, 0.5*cm))
+        story.append(layout.paragrafo("RELATÓRIO DE AVALIAÇÃO SPM", 'TituloRelatorio'))
+        story.append(layout.paragrafo("Sensory Processing Measure"))
+        story.append(layout.espaco(0.5))
 
         # Informações do Paciente
-        story.append(Paragraph("DADOS DO PACIENTE", subtitulo_style))
+        story.append(layout.paragrafo("DADOS DO PACIENTE", 'SubtituloRelatorio'))
 
         anos, meses = avaliacao.paciente.calcular_idade(avaliacao.data_avaliacao)
 
@@ -94,23 +47,11 @@ class PDFService:
         if avaliacao.paciente.identificacao:
             dados_paciente.insert(1, ['Identificação:', avaliacao.paciente.identificacao])
 
-        tabela_paciente = Table(dados_paciente, colWidths=[4*cm, 12*cm])
-        tabela_paciente.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#ecf0f1')),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#2c3e50')),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
-        ]))
-
-        story.append(tabela_paciente)
-        story.append(Spacer(1, 0.5*cm))
+        story.append(layout.tabela_chave_valor(dados_paciente))
+        story.append(layout.espaco(0.5))
 
         # Informações da Avaliação
-        story.append(Paragraph("DADOS DA AVALIAÇÃO", subtitulo_style))
+        story.append(layout.paragrafo("DADOS DA AVALIAÇÃO", 'SubtituloRelatorio'))
 
         dados_avaliacao = [
             ['Data da Avaliação:', avaliacao.data_avaliacao.strftime('%d/%m/%Y')],
@@ -120,30 +61,18 @@ class PDFService:
             ['Status:', 'Concluída' if avaliacao.status == 'concluida' else 'Em Andamento']
         ]
 
-        tabela_avaliacao = Table(dados_avaliacao, colWidths=[4*cm, 12*cm])
-        tabela_avaliacao.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#ecf0f1')),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#2c3e50')),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
-        ]))
-
-        story.append(tabela_avaliacao)
-        story.append(Spacer(1, 0.5*cm))
+        story.append(layout.tabela_chave_valor(dados_avaliacao))
+        story.append(layout.espaco(0.5))
 
         if avaliacao.comentarios:
-            story.append(Paragraph("<b>Comentários:</b>", styles['Normal']))
-            story.append(Paragraph(avaliacao.comentarios, styles['Normal']))
-            story.append(Spacer(1, 0.5*cm))
+            story.append(layout.paragrafo("<b>Comentários:</b>"))
+            story.append(layout.paragrafo(avaliacao.comentarios))
+            story.append(layout.espaco(0.5))
 
         # Resultados (se concluída)
         if avaliacao.status == 'concluida':
             story.append(PageBreak())
-            story.append(Paragraph("RESULTADOS", subtitulo_style))
+            story.append(layout.paragrafo("RESULTADOS", 'SubtituloRelatorio'))
 
             grafico_radar_dados = GraficoService.obter_grafico_radar(
                 avaliacao,
@@ -157,21 +86,19 @@ class PDFService:
             )
 
             if grafico_radar_dados.get('png_bytes'):
-                story.append(Paragraph("Perfil Sensorial", grafico_titulo_style))
-                story.append(Image(BytesIO(grafico_radar_dados['png_bytes']), width=14*cm, height=9*cm))
-                story.append(Spacer(1, 0.3*cm))
+                story.extend(layout.grafico(grafico_radar_dados['png_bytes'], "Perfil Sensorial"))
+                story.append(layout.espaco(0.3))
 
             if grafico_barras_dados.get('png_bytes'):
-                story.append(Paragraph("Escores por Domínio", grafico_titulo_style))
-                story.append(Image(BytesIO(grafico_barras_dados['png_bytes']), width=14*cm, height=9*cm))
-                story.append(Spacer(1, 0.5*cm))
+                story.extend(layout.grafico(grafico_barras_dados['png_bytes'], "Escores por Domínio"))
+                story.append(layout.espaco(0.5))
 
             perfil_relatorio = None
             if avaliacao.instrumento and avaliacao.instrumento.codigo.startswith('PERFIL_SENS'):
                 perfil_relatorio = ModulosService.gerar_relatorio_perfil_sensorial(avaliacao.id)
 
             if perfil_relatorio:
-                story.append(Paragraph("PERFIL SENSORIAL 2 - Seções Sensoriais", subtitulo_style))
+                story.append(layout.paragrafo("PERFIL SENSORIAL 2 - Seções Sensoriais", 'SubtituloRelatorio'))
                 tabela_secoes = [["Seção", "Escore", "Classificação"]]
                 for secao in perfil_relatorio['secoes']:
                     tabela_secoes.append([
@@ -180,18 +107,10 @@ class PDFService:
                         secao['classificacao']['descricao']
                     ])
 
-                tabela_ps = Table(tabela_secoes, colWidths=[7*cm, 3*cm, 6*cm])
-                tabela_ps.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#9b59b6')),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                ]))
-                story.append(tabela_ps)
-                story.append(Spacer(1, 0.4*cm))
-
-                story.append(Paragraph("PERFIL SENSORIAL 2 - Quadrantes", subtitulo_style))
+                story.append(layout.tabela(tabela_secoes, [7*cm, 3*cm, 6*cm], 'cabecalho', '#9b59b6'))
+                story.append(layout.espaco(0.4))
+
+                story.append(layout.paragrafo("PERFIL SENSORIAL 2 - Quadrantes", 'SubtituloRelatorio'))
                 for quad in perfil_relatorio['quadrantes']:
                     info = quad['dados']['classificacao'].get('quadrante_info', {})
                     titulo = info.get('titulo', quad['quadrante'].title())
@@ -200,13 +119,11 @@ class PDFService:
                     escore = quad['dados'].get('escore_bruto', 0)
                     escore_max = quad['dados'].get('escore_maximo', 0)
 
-                    story.append(Paragraph(
-                        f"<b>{titulo}</b> - {nivel}", styles['Normal']
-                    ))
-                    story.append(Paragraph(f"Escore: {escore} / {escore_max}", styles['Normal']))
+                    story.append(layout.paragrafo(f"<b>{titulo}</b> - {nivel}"))
+                    story.append(layout.paragrafo(f"Escore: {escore} / {escore_max}"))
                     if descricao:
-                        story.append(Paragraph(descricao, styles['Italic']))
-                    story.append(Spacer(1, 0.2*cm))
+                        story.append(layout.paragrafo(descricao, 'Italic'))
+                    story.append(layout.espaco(0.2))
 
             # Tabela de escores
             dados_escores = [
@@ -240,27 +157,11 @@ class PDFService:
             # Linha total
             dados_escores.append(['TOTAL', str(avaliacao.escore_total), '', ''])
 
-            tabela_escores = Table(dados_escores, colWidths=[6*cm, 3*cm, 3*cm, 4*cm])
-            tabela_escores.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498db')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 11),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#ecf0f1')),
-                ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-                ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-                ('FONTSIZE', (0, 1), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-                ('TOPPADDING', (0, 1), (-1, -1), 8),
-            ]))
-
-            story.append(tabela_escores)
-            story.append(Spacer(1, 1*cm))
+            story.append(layout.tabela(dados_escores, [6*cm, 3*cm, 3*cm, 4*cm], 'escores'))
+            story.append(layout.espaco(1))
 
             # Interpretação
-            story.append(Paragraph("INTERPRETAÇÃO DOS RESULTADOS", subtitulo_style))
+            story.append(layout.paragrafo("INTERPRETAÇÃO DOS RESULTADOS", 'SubtituloRelatorio'))
 
             interpretacao = """
             Os escores obtidos na avaliação SPM refletem o padrão de processamento sensorial
@@ -268,12 +169,12 @@ class PDFService:
             dificuldades de processamento sensorial.
             """
 
-            story.append(Paragraph(interpretacao, styles['Normal']))
-            story.append(Spacer(1, 0.3*cm))
+            story.append(layout.paragrafo(interpretacao))
+            story.append(layout.espaco(0.3))
 
             # Legenda das classificações
-            story.append(Paragraph("<b>Classificações:</b>", styles['Normal']))
-            story.append(Spacer(1, 0.2*cm))
+            story.append(layout.paragrafo("<b>Classificações:</b>"))
+            story.append(layout.espaco(0.2))
 
             legenda = [
                 ['Típico', 'Processamento sensorial dentro da normalidade'],
@@ -281,29 +182,12 @@ class PDFService:
                 ['Disfunção Definitiva', 'Indica disfunção clara, requer intervenção']
             ]
 
-            tabela_legenda = Table(legenda, colWidths=[4*cm, 12*cm])
-            tabela_legenda.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#ecf0f1')),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTSIZE', (0, 0), (-1, -1), 9),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-                ('TOPPADDING', (0, 0), (-1, -1), 6),
-            ]))
-
-            story.append(tabela_legenda)
+            story.append(layout.tabela_chave_valor(legenda, 'legenda'))
 
         # Rodapé
-        story.append(Spacer(1, 1*cm))
-        rodape = f"Relatório gerado em {datetime.now().strftime('%d/%m/%Y às %H:%M')}"
-        story.append(Paragraph(rodape, ParagraphStyle('Footer', parent=styles['Normal'],
-                                                       fontSize=8, textColor=colors.grey,
-                                                       alignment=TA_CENTER)))
-
-        # Build PDF
-        doc.build(story)
+        story.extend(layout.rodape())
 
-        buffer.seek(0)
-        return buffer
+        return layout.construir(story, destino)
 
     @staticmethod
     def _classificacao_texto(classificacao):
@@ -0,0 +1,315 @@
+"""
+Camada de templates compartilhada pelos relatórios PDF
+Estilos, presets de tabela e construtores de flowables criados uma única vez por processo
+"""
+import os
+import tempfile
+from functools import lru_cache
+from io import BytesIO
+from datetime import datetime
+from flask import current_app, send_file
+from reportlab.lib.pagesizes import A4
+from reportlab.lib import colors
+from reportlab.lib.units import cm
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY
+
+
+COR_TEXTO = colors.HexColor('#2c3e50')
+COR_FUNDO_ROTULO = colors.HexColor('#ecf0f1')
+
+
+class PDFTemplateService:
+    """Recursos de layout reutilizáveis pelos serviços de PDF"""
+
+    MARGEM = 2*cm
+    LARGURAS_CHAVE_VALOR = (4*cm, 12*cm)
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def estilos():
+        """
+        Folha de estilos dos relatórios (construída uma vez por processo)
+
+        Returns:
+            StyleSheet1: Estilos padrão do ReportLab acrescidos dos estilos dos relatórios
+        """
+        styles = getSampleStyleSheet()
+
+        styles.add(ParagraphStyle(
+            'TituloRelatorio',
+            parent=styles['Heading1'],
+            fontSize=18,
+            textColor=COR_TEXTO,
+            spaceAfter=30,
+            alignment=TA_CENTER
+        ))
+        styles.add(ParagraphStyle(
+            'SubtituloRelatorio',
+            parent=styles['Heading2'],
+            fontSize=14,
+            textColor=colors.HexColor('#34495e'),
+            spaceAfter=12,
+            spaceBefore=20
+        ))
+        styles.add(ParagraphStyle(
+            'TituloGrafico',
+            parent=styles['Heading3'],
+            fontSize=12,
+            textColor=COR_TEXTO,
+            spaceBefore=12,
+            spaceAfter=6
+        ))
+
+        # Variante do PEI
+        styles.add(ParagraphStyle(
+            'TituloPEI',
+            parent=styles['Heading1'],
+            fontSize=16,
+            textColor=colors.HexColor('#0d6efd'),
+            spaceAfter=20,
+            alignment=TA_CENTER,
+            fontName='Helvetica-Bold'
+        ))
+        styles.add(ParagraphStyle(
+            'SubtituloPEI',
+            parent=styles['Heading2'],
+            fontSize=12,
+            textColor=colors.HexColor('#495057'),
+            spaceAfter=10,
+            fontName='Helvetica-Bold'
+        ))
+        styles.add(ParagraphStyle(
+            'DominioPEI',
+            parent=styles['SubtituloPEI'],
+            fontSize=11,
+            textColor=colors.HexColor('#0d6efd')
+        ))
+
+        styles.add(ParagraphStyle(
+            'TextoJustificado',
+            parent=styles['Normal'],
+            fontSize=10,
+            alignment=TA_JUSTIFY,
+            spaceBefore=6,
+            spaceAfter=6
+        ))
+        styles.add(ParagraphStyle(
+            'ItemLista',
+            parent=styles['Normal'],
+            fontSize=10,
+            leftIndent=0.5*cm,
+            spaceBefore=8,
+            spaceAfter=8,
+            bulletIndent=0.25*cm
+        ))
+        styles.add(ParagraphStyle(
+            'Observacao',
+            parent=styles['TextoJustificado'],
+            fontSize=9,
+            leftIndent=1*cm,
+            textColor=colors.HexColor('#6c757d')
+        ))
+        styles.add(ParagraphStyle(
+            'Rodape',
+            parent=styles['Normal'],
+            fontSize=8,
+            textColor=colors.grey,
+            alignment=TA_CENTER
+        ))
+
+        return styles
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def estilo_tabela(preset, cor_cabecalho=None):
+        """
+        Presets de TableStyle (imutáveis e compartilhados entre documentos)
+
+        Args:
+            preset: 'chave_valor', 'chave_valor_simples', 'cabecalho', 'escores',
+                    'resultados' ou 'legenda'
+            cor_cabecalho: Cor hexadecimal da linha de cabeçalho (presets com cabeçalho)
+
+        Returns:
+            TableStyle
+        """
+        if preset == 'chave_valor':
+            comandos = [
+                ('BACKGROUND', (0, 0), (0, -1), COR_FUNDO_ROTULO),
+                ('TEXTCOLOR', (0, 0), (-1, -1), COR_TEXTO),
+                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, -1), 10),
+                ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+                ('TOPPADDING', (0, 0), (-1, -1), 8),
+                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
+            ]
+        elif preset == 'chave_valor_simples':
+            comandos = [
+                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+                ('TOPPADDING', (0, 0), (-1, -1), 6),
+                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+                ('LEFTPADDING', (0, 0), (0, -1), 0),
+            ]
+        elif preset == 'cabecalho':
+            comandos = [
+                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(cor_cabecalho or '#9b59b6')),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ]
+        elif preset == 'escores':
+            comandos = [
+                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(cor_cabecalho or '#3498db')),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, 0), 11),
+                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+                ('BACKGROUND', (0, -1), (-1, -1), COR_FUNDO_ROTULO),
+                ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+                ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+                ('FONTSIZE', (0, 1), (-1, -1), 10),
+                ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
+                ('TOPPADDING', (0, 1), (-1, -1), 8),
+            ]
+        elif preset == 'resultados':
+            comandos = [
+                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(cor_cabecalho or '#e9ecef')),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, 0), 10),
+                ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+                ('TOPPADDING', (0, 1), (-1, -1), 8),
+                ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
+                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ]
+        elif preset == 'legenda':
+            comandos = [
+                ('BACKGROUND', (0, 0), (0, -1), COR_FUNDO_ROTULO),
+                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+                ('FONTSIZE', (0, 0), (-1, -1), 9),
+                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+                ('TOPPADDING', (0, 0), (-1, -1), 6),
+            ]
+        else:
+            raise ValueError(f'Preset de tabela desconhecido: {preset}')
+
+        return TableStyle(comandos)
+
+    @staticmethod
+    def criar_documento(destino):
+        """Documento A4 com as margens padrão dos relatórios"""
+        return SimpleDocTemplate(
+            destino,
+            pagesize=A4,
+            rightMargin=PDFTemplateService.MARGEM,
+            leftMargin=PDFTemplateService.MARGEM,
+            topMargin=PDFTemplateService.MARGEM,
+            bottomMargin=PDFTemplateService.MARGEM
+        )
+
+    @staticmethod
+    def construir(story, destino=None):
+        """
+        Renderiza os flowables em um PDF
+
+        O ReportLab monta o documento inteiro em memória e só o escreve no
+        destino ao final; o pico de memória cresce com o tamanho do relatório,
+        qualquer que seja o destino.
+
+        Args:
+            story: Lista de flowables
+            destino: Arquivo binário gravável (default: novo BytesIO)
+
+        Returns:
+            O arquivo de destino, posicionado no início
+        """
+        if destino is None:
+            destino = BytesIO()
+        PDFTemplateService.criar_documento(destino).build(story)
+        destino.seek(0)
+        return destino
+
+    @staticmethod
+    def arquivo_temporario():
+        """
+        Destino para PDFs servidos por requisição
+
+        Mantém em memória apenas documentos pequenos; acima de PDF_SPOOL_MAX_BYTES
+        o conteúdo passa para um arquivo temporário em disco. Isso evita manter
+        uma segunda cópia do PDF durante o envio, mas não limita a memória da
+        renderização (ver construir).
+        """
+        return tempfile.SpooledTemporaryFile(
+            max_size=current_app.config.get('PDF_SPOOL_MAX_BYTES', 1024 * 1024),
+            mode='w+b'
+        )
+
+    @staticmethod
+    def resposta_pdf(arquivo, nome_arquivo):
+        """
+        Resposta em streaming para um PDF gerado em arquivo
+
+        Args:
+            arquivo: Arquivo binário com o PDF (ex: arquivo_temporario())
+            nome_arquivo: Nome sugerido para download
+
+        Returns:
+            Response com Content-Length; o arquivo é fechado ao final do envio
+        """
+        arquivo.seek(0, os.SEEK_END)
+        tamanho = arquivo.tell()
+        arquivo.seek(0)
+
+        response = send_file(
+            arquivo,
+            mimetype='application/pdf',
+            as_attachment=True,
+            download_name=nome_arquivo
+        )
+        response.content_length = tamanho
+        return response
+
+    # ===== Construtores de flowables =====
+
+    @staticmethod
+    def paragrafo(texto, estilo='Normal'):
+        return Paragraph(texto, PDFTemplateService.estilos()[estilo])
+
+    @staticmethod
+    def espaco(altura_cm):
+        return Spacer(1, altura_cm*cm)
+
+    @staticmethod
+    def tabela(linhas, larguras, preset, cor_cabecalho=None):
+        """Tabela com um dos presets de estilo"""
+        tabela = Table(linhas, colWidths=list(larguras))
+        tabela.setStyle(PDFTemplateService.estilo_tabela(preset, cor_cabecalho))
+        return tabela
+
+    @staticmethod
+    def tabela_chave_valor(linhas, preset='chave_valor'):
+        """Tabela de rótulo/valor (dados do paciente, da avaliação etc.)"""
+        return PDFTemplateService.tabela(linhas, PDFTemplateService.LARGURAS_CHAVE_VALOR, preset)
+
+    @staticmethod
+    def grafico(png_bytes, titulo, largura_cm=14, altura_cm=9):
+        """Título e imagem PNG de um gráfico"""
+        return [
+            PDFTemplateService.paragrafo(titulo, 'TituloGrafico'),
+            Image(BytesIO(png_bytes), width=largura_cm*cm, height=altura_cm*cm),
+        ]
+
+    @staticmethod
+    def rodape(italico=False):
+        """Linha com a data de geração do relatório"""
+        texto = f"Relatório gerado em {datetime.now().strftime('%d/%m/%Y às %H:%M')}"
+        if italico:
+            texto = f'<i>{texto}</i>'
+        return [PDFTemplateService.espaco(1), PDFTemplateService.paragrafo(texto, 'Rodape')]
@@ -1,92 +1,33 @@
 """
 Serviço para geração de relatórios PDF do PEI
 """
-from io import BytesIO
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import cm
-from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
-from reportlab.lib import colors
-from datetime import datetime
+from reportlab.platypus import PageBreak
+from app.services.pdf_template_service import PDFTemplateService
 
 
 class PeiPDFService:
     """Serviço para geração de relatórios PDF do PEI"""
 
     @staticmethod
-    def gerar_relatorio_pei(avaliacao, itens_pei):
+    def gerar_relatorio_pei(avaliacao, itens_pei, destino=None):
         """
         Gera relatório PDF do Plano Educacional Individualizado
 
         Args:
             avaliacao: Instância de Avaliacao
             itens_pei: Lista de PlanoItem selecionados
+            destino: Arquivo binário onde o PDF será gravado (default: BytesIO)
 
         Returns:
-            BytesIO: Buffer com o PDF gerado
+            Arquivo com o PDF gerado, posicionado no início
         """
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=A4,
-            rightMargin=2*cm,
-            leftMargin=2*cm,
-            topMargin=2*cm,
-            bottomMargin=2*cm
-        )
-
-        # Estilos
-        styles = getSampleStyleSheet()
-
-        # Estilo customizado para título
-        titulo_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=16,
-            textColor=colors.HexColor('#0d6efd'),
-            spaceAfter=20,
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold'
-        )
-
-        # Estilo para subtítulo
-        subtitulo_style = ParagraphStyle(
-            'CustomSubtitle',
-            parent=styles['Heading2'],
-            fontSize=12,
-            textColor=colors.HexColor('#495057'),
-            spaceAfter=10,
-            fontName='Helvetica-Bold'
-        )
-
-        # Estilo para texto normal
-        normal_style = ParagraphStyle(
-            'CustomNormal',
-            parent=styles['Normal'],
-            fontSize=10,
-            alignment=TA_JUSTIFY,
-            spaceBefore=6,
-            spaceAfter=6
-        )
-
-        # Estilo para itens do PEI
-        item_style = ParagraphStyle(
-            'ItemPEI',
-            parent=styles['Normal'],
-            fontSize=10,
-            leftIndent=0.5*cm,
-            spaceBefore=8,
-            spaceAfter=8,
-            bulletIndent=0.25*cm
-        )
-
-        # Container dos elementos
+        layout = PDFTemplateService
         elements = []
 
         # ===== CABEÇALHO =====
-        elements.append(Paragraph('PLANO EDUCACIONAL INDIVIDUALIZADO (PEI)', titulo_style))
-        elements.append(Spacer(1, 0.5*cm))
+        elements.append(layout.paragrafo('PLANO EDUCACIONAL INDIVIDUALIZADO (PEI)', 'TituloPEI'))
+        elements.append(layout.espaco(0.5))
 
         # ===== DADOS DO PACIENTE =====
         paciente = avaliacao.paciente
@@ -97,22 +38,14 @@ class PeiPDFService:
             ['<b>Identificação:</b>', paciente.identificacao],
             ['<b>Data de Nascimento:</b>', paciente.data_nascimento.strftime('%d/%m/%Y')],
             ['<b>Idade:</b>', f'{idade_anos} anos e {idade_meses} meses'],
-            ['<b>Sexo:</b>', paciente.get_sexo_display()],
+            ['<b>Sexo:</b>', 'Masculino' if paciente.sexo == 'M' else 'Feminino'],
         ]
 
-        tabela_paciente = Table(dados_paciente, colWidths=[4*cm, 12*cm])
-        tabela_paciente.setStyle(TableStyle([
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('LEFTPADDING', (0, 0), (0, -1), 0),
-        ]))
-
-        elements.append(tabela_paciente)
-        elements.append(Spacer(1, 0.5*cm))
+        elements.append(layout.tabela_chave_valor(dados_paciente, 'chave_valor_simples'))
+        elements.append(layout.espaco(0.5))
 
         # ===== DADOS DA AVALIAÇÃO =====
-        elements.append(Paragraph('INFORMAÇÕES DA AVALIAÇÃO', subtitulo_style))
+        elements.append(layout.paragrafo('INFORMAÇÕES DA AVALIAÇÃO', 'SubtituloPEI'))
 
         dados_avaliacao = [
             ['<b>Instrumento:</b>', avaliacao.instrumento.nome],
@@ -121,20 +54,12 @@ class PeiPDFService:
             ['<b>Respondente:</b>', avaliacao.relacionamento_respondente or 'Não informado'],
         ]
 
-        tabela_avaliacao = Table(dados_avaliacao, colWidths=[4*cm, 12*cm])
-        tabela_avaliacao.setStyle(TableStyle([
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('LEFTPADDING', (0, 0), (0, -1), 0),
-        ]))
-
-        elements.append(tabela_avaliacao)
-        elements.append(Spacer(1, 0.8*cm))
+        elements.append(layout.tabela_chave_valor(dados_avaliacao, 'chave_valor_simples'))
+        elements.append(layout.espaco(0.8))
 
         # ===== RESULTADOS DA AVALIAÇÃO =====
-        elements.append(Paragraph('RESULTADOS DA AVALIAÇÃO SPM', subtitulo_style))
-        elements.append(Spacer(1, 0.3*cm))
+        elements.append(layout.paragrafo('RESULTADOS DA AVALIAÇÃO SPM', 'SubtituloPEI'))
+        elements.append(layout.espaco(0.3))
 
         # Classificações por domínio
         dominios_info = [
@@ -160,34 +85,20 @@ class PeiPDFService:
                 dados_resultados.append([nome, str(t_score) if t_score else '-', class_texto])
 
         if len(dados_resultados) > 1:  # Se houver dados
-            tabela_resultados = Table(dados_resultados, colWidths=[8*cm, 3*cm, 5*cm])
-            tabela_resultados.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#e9ecef')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-                ('TOPPADDING', (0, 1), (-1, -1), 8),
-                ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ]))
-
-            elements.append(tabela_resultados)
-            elements.append(Spacer(1, 0.8*cm))
+            elements.append(layout.tabela(dados_resultados, [8*cm, 3*cm, 5*cm], 'resultados'))
+            elements.append(layout.espaco(0.8))
 
         # ===== ITENS DO PEI =====
         elements.append(PageBreak())
-        elements.append(Paragraph('OBJETIVOS E ESTRATÉGIAS DO PEI', subtitulo_style))
-        elements.append(Spacer(1, 0.3*cm))
+        elements.append(layout.paragrafo('OBJETIVOS E ESTRATÉGIAS DO PEI', 'SubtituloPEI'))
+        elements.append(layout.espaco(0.3))
 
-        elements.append(Paragraph(
+        elements.append(layout.paragrafo(
             'Com base nos resultados da avaliação SPM, os seguintes objetivos e estratégias '
             'são recomendados para o desenvolvimento do aluno:',
-            normal_style
+            'TextoJustificado'
         ))
-        elements.append(Spacer(1, 0.5*cm))
+        elements.append(layout.espaco(0.5))
 
         # Agrupar itens por domínio
         itens_por_dominio = {}
@@ -201,45 +112,26 @@ class PeiPDFService:
         contador = 1
         for dominio_nome in sorted(itens_por_dominio.keys()):
             # Título do domínio
-            elements.append(Paragraph(
-                f'<b>{dominio_nome}</b>',
-                ParagraphStyle('DominioTitle', parent=subtitulo_style, fontSize=11, textColor=colors.HexColor('#0d6efd'))
-            ))
-            elements.append(Spacer(1, 0.2*cm))
+            elements.append(layout.paragrafo(f'<b>{dominio_nome}</b>', 'DominioPEI'))
+            elements.append(layout.espaco(0.2))
 
             # Itens do domínio
             for item in itens_por_dominio[dominio_nome]:
                 texto_item = f'<b>{contador}.</b> {item.template_item.texto}'
-                elements.append(Paragraph(texto_item, item_style))
+                elements.append(layout.paragrafo(texto_item, 'ItemLista'))
 
                 # Se houver observações
                 if item.observacoes:
-                    obs_style = ParagraphStyle(
-                        'Observacoes',
-                        parent=normal_style,
-                        fontSize=9,
-                        leftIndent=1*cm,
-                        textColor=colors.HexColor('#6c757d'),
-                        italic=True
-                    )
-                    elements.append(Paragraph(f'<i>Observações: {item.observacoes}</i>', obs_style))
+                    elements.append(layout.paragrafo(f'<i>Observações: {item.observacoes}</i>', 'Observacao'))
 
                 contador += 1
 
-            elements.append(Spacer(1, 0.4*cm))
+            elements.append(layout.espaco(0.4))
 
         # ===== RODAPÉ =====
-        elements.append(Spacer(1, 1*cm))
-        elements.append(Paragraph(
-            f'<i>Relatório gerado em {datetime.now().strftime("%d/%m/%Y às %H:%M")}</i>',
-            ParagraphStyle('Footer', parent=normal_style, fontSize=8, textColor=colors.grey, alignment=TA_CENTER)
-        ))
-
-        # Construir PDF
-        doc.build(elements)
+        elements.extend(layout.rodape(italico=True))
 
-        buffer.seek(0)
-        return buffer
+        return layout.construir(elements, destino)
 
     @staticmethod
     def _formatar_classificacao(classificacao):
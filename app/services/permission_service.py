@@ -1,75 +1,328 @@
 """
 Service para controle de permissões e acesso a recursos
 """
-from flask import request
-from sqlalchemy import or_
+from flask import g, has_request_context
+from datetime import datetime
+from sqlalchemy import and_, case, exists, func, literal, select, union_all, update
 from app import db
-from app.models import Paciente, Avaliacao, AuditoriaAcesso, CompartilhamentoPaciente, User
+from app.models import Paciente, Avaliacao, CompartilhamentoPaciente, User, AcessoPaciente
 from app.models.paciente import paciente_responsavel
+from app.services.acesso_paciente_service import AcessoPacienteService
+from app.services.auditoria_service import AuditoriaService
 
 
 class PermissionService:
     """Service para gerenciar permissões de acesso"""
 
+    # Níveis de acesso, do mais fraco para o mais forte
+    NIVEL_NENHUM = 'nenhum'
+    NIVEL_LEITURA = 'leitura'
+    NIVEL_EDICAO = 'edicao'
+    NIVEL_COMPLETO = 'completo'
+    NIVEIS = (NIVEL_NENHUM, NIVEL_LEITURA, NIVEL_EDICAO, NIVEL_COMPLETO)
+
     @staticmethod
-    def pode_acessar_paciente(user, paciente_id):
+    def _cache_niveis():
         """
-        Verifica se o usuário pode acessar um paciente
+        Cache dos níveis já resolvidos na requisição atual
 
-        Regras:
-        - Admin: acessa tudo
-        - Criador do paciente: acessa sempre
-        - Responsável vinculado: acessa se estiver na tabela paciente_responsavel
-        - Avaliador: acessa se tiver feito alguma avaliação do paciente
+        Returns:
+            dict indexado por (user_id, recurso_tipo, recurso_id) ou None fora de requisição
+        """
+        if not has_request_context():
+            return None
+        if '_niveis_acesso' not in g:
+            g._niveis_acesso = {}
+        return g._niveis_acesso
+
+    @staticmethod
+    def limpar_cache(exc=None):
+        """Descarta os níveis memorizados (concessões alteradas ou fim da requisição)"""
+        if has_request_context():
+            g.pop('_niveis_acesso', None)
+
+    @staticmethod
+    def _nivel_memorizado(user, recurso_tipo, recurso_id, resolver):
+        """Resolve o nível uma única vez por requisição para cada (usuário, recurso)"""
+        cache = PermissionService._cache_niveis()
+        if cache is None:
+            return resolver()
+
+        chave = (user.id, recurso_tipo, recurso_id)
+        if chave not in cache:
+            cache[chave] = resolver()
+        return cache[chave]
+
+    @staticmethod
+    def _consulta_graus(user_id, paciente_id):
+        """
+        Monta as concessões de acesso de um usuário a um paciente
+
+        Cada SELECT devolve no máximo uma linha com o grau concedido:
+        - Criador: completo (edição se houver avaliações de outros usuários)
+        - Responsável vinculado: edição
+        - Avaliador de alguma avaliação: leitura
+        - Compartilhamento ativo e não expirado: conforme tipo_acesso
+        """
+        avaliacoes_de_outros = exists().where(
+            Avaliacao.paciente_id == paciente_id,
+            Avaliacao.avaliador_id != user_id
+        )
+
+        return [
+            select(case((avaliacoes_de_outros, 2), else_=3).label('grau')).where(
+                Paciente.id == paciente_id,
+                Paciente.criador_id == user_id
+            ),
+            select(literal(2).label('grau')).where(exists().where(
+                paciente_responsavel.c.paciente_id == paciente_id,
+                paciente_responsavel.c.user_id == user_id
+            )),
+            select(literal(1).label('grau')).where(exists().where(
+                Avaliacao.paciente_id == paciente_id,
+                Avaliacao.avaliador_id == user_id
+            )),
+            select(case(
+                {'leitura': 1, 'edicao': 2, 'completo': 3},
+                value=CompartilhamentoPaciente.tipo_acesso,
+                else_=0
+            ).label('grau')).where(
+                CompartilhamentoPaciente.paciente_id == paciente_id,
+                CompartilhamentoPaciente.recebeu_user_id == user_id,
+                AcessoPacienteService.compartilhamento_vigente()
+            )
+        ]
+
+    @staticmethod
+    def _resolver_nivel(consultas, recurso_existe):
+        """Une as concessões (UNION ALL) e devolve o nível mais forte em uma única consulta"""
+        graus = union_all(*consultas).subquery()
+        grau = db.session.execute(
+            select(func.max(graus.c.grau)).select_from(graus).where(recurso_existe)
+        ).scalar()
+        return PermissionService.NIVEIS[grau or 0]
+
+    @staticmethod
+    def nivel_acesso_paciente(user, paciente_id):
+        """
+        Resolve o nível de acesso de um usuário a um paciente com uma única consulta
 
         Args:
             user: Usuário atual
             paciente_id: ID do paciente
 
         Returns:
-            bool: True se pode acessar, False caso contrário
+            str: 'nenhum', 'leitura', 'edicao' ou 'completo'
         """
         if not user or not user.is_authenticated:
-            return False
+            return PermissionService.NIVEL_NENHUM
 
         # Admin acessa tudo
         if user.is_admin():
-            return True
+            return PermissionService.NIVEL_COMPLETO
 
-        paciente = Paciente.query.get(paciente_id)
-        if not paciente:
-            return False
+        return PermissionService._nivel_memorizado(
+            user, 'paciente', paciente_id,
+            lambda: PermissionService._resolver_nivel(
+                PermissionService._consulta_graus(user.id, paciente_id),
+                exists().where(Paciente.id == paciente_id)
+            )
+        )
 
-        # Criador do paciente
-        if paciente.criador_id == user.id:
-            return True
+    @staticmethod
+    def nivel_acesso_avaliacao(user, avaliacao_id):
+        """
+        Resolve o nível de acesso de um usuário a uma avaliação com uma única consulta
 
-        # Verifica se é responsável vinculado
-        vinculo = db.session.query(paciente_responsavel).filter_by(
-            paciente_id=paciente_id,
-            user_id=user.id
-        ).first()
+        O avaliador da própria avaliação tem ao menos nível de edição; os demais
+        herdam o nível de acesso ao paciente.
 
-        if vinculo:
-            return True
+        Args:
+            user: Usuário atual
+            avaliacao_id: ID da avaliação
 
-        # Verifica se já fez alguma avaliação deste paciente
-        avaliacao = Avaliacao.query.filter_by(
-            paciente_id=paciente_id,
-            avaliador_id=user.id
-        ).first()
+        Returns:
+            str: 'nenhum', 'leitura', 'edicao' ou 'completo'
+        """
+        if not user or not user.is_authenticated:
+            return PermissionService.NIVEL_NENHUM
 
-        if avaliacao:
-            return True
+        if user.is_admin():
+            return PermissionService.NIVEL_COMPLETO
 
-        # Verifica compartilhamentos ativos
-        compartilhamento = CompartilhamentoPaciente.query.filter_by(
-            paciente_id=paciente_id,
-            recebeu_user_id=user.id,
-            ativo=True
-        ).first()
+        def resolver():
+            paciente_id = select(Avaliacao.paciente_id).where(Avaliacao.id == avaliacao_id).scalar_subquery()
+            consultas = PermissionService._consulta_graus(user.id, paciente_id)
+            consultas.append(select(literal(2).label('grau')).where(exists().where(
+                Avaliacao.id == avaliacao_id,
+                Avaliacao.avaliador_id == user.id
+            )))
+            return PermissionService._resolver_nivel(consultas, exists().where(Avaliacao.id == avaliacao_id))
 
-        return compartilhamento is not None
+        return PermissionService._nivel_memorizado(user, 'avaliacao', avaliacao_id, resolver)
+
+    @staticmethod
+    def niveis_acesso_pacientes(user, paciente_ids):
+        """
+        Resolve em uma única consulta o nível de acesso a vários pacientes
+
+        Os níveis também ficam memorizados na requisição, de modo que verificações
+        individuais posteriores (pode_*) não voltam ao banco. Pacientes cuja linha
+        em acesso_paciente ainda inclui um compartilhamento vencido são
+        recalculados a partir das concessões vigentes.
+
+        Args:
+            user: Usuário atual
+            paciente_ids: IDs dos pacientes (ex: linhas de uma listagem)
+
+        Returns:
+            dict: {paciente_id: 'nenhum' | 'leitura' | 'edicao' | 'completo'}
+        """
+        paciente_ids = set(paciente_ids)
+        if not paciente_ids or not user or not user.is_authenticated:
+            return {paciente_id: PermissionService.NIVEL_NENHUM for paciente_id in paciente_ids}
+
+        if user.is_admin():
+            return {paciente_id: PermissionService.NIVEL_COMPLETO for paciente_id in paciente_ids}
+
+        niveis, pendentes = PermissionService._memorizados(user, 'paciente', paciente_ids)
+        if not pendentes:
+            return niveis
+
+        linhas = db.session.execute(
+            select(
+                AcessoPaciente.paciente_id,
+                AcessoPaciente.nivel,
+                AcessoPacienteService.compartilhamento_vencido(user.id, AcessoPaciente.paciente_id)
+            ).where(
+                AcessoPaciente.user_id == user.id,
+                AcessoPaciente.paciente_id.in_(pendentes)
+            )
+        ).all()
+
+        graus = {paciente_id: nivel for paciente_id, nivel, _ in linhas}
+        graus.update(AcessoPacienteService.graus_vigentes(
+            user.id, [paciente_id for paciente_id, _, vencido in linhas if vencido]
+        ))
+
+        resolvidos = {
+            paciente_id: PermissionService.NIVEIS[graus.get(paciente_id, 0)]
+            for paciente_id in pendentes
+        }
+        PermissionService._memorizar(user, 'paciente', resolvidos)
+        niveis.update(resolvidos)
+        return niveis
+
+    @staticmethod
+    def niveis_acesso_avaliacoes(user, avaliacao_ids):
+        """
+        Resolve em uma única consulta o nível de acesso a várias avaliações
+
+        Como em niveis_acesso_pacientes, acessos que ainda incluem um
+        compartilhamento vencido são recalculados a partir das concessões vigentes.
+
+        Args:
+            user: Usuário atual
+            avaliacao_ids: IDs das avaliações
+
+        Returns:
+            dict: {avaliacao_id: 'nenhum' | 'leitura' | 'edicao' | 'completo'}
+        """
+        avaliacao_ids = set(avaliacao_ids)
+        if not avaliacao_ids or not user or not user.is_authenticated:
+            return {avaliacao_id: PermissionService.NIVEL_NENHUM for avaliacao_id in avaliacao_ids}
+
+        if user.is_admin():
+            return {avaliacao_id: PermissionService.NIVEL_COMPLETO for avaliacao_id in avaliacao_ids}
+
+        niveis, pendentes = PermissionService._memorizados(user, 'avaliacao', avaliacao_ids)
+        if not pendentes:
+            return niveis
+
+        linhas = db.session.execute(
+            select(
+                Avaliacao.id,
+                Avaliacao.avaliador_id,
+                Avaliacao.paciente_id,
+                AcessoPaciente.nivel,
+                and_(
+                    AcessoPaciente.nivel.isnot(None),
+                    AcessoPacienteService.compartilhamento_vencido(user.id, Avaliacao.paciente_id)
+                )
+            ).outerjoin(
+                AcessoPaciente, and_(
+                    AcessoPaciente.paciente_id == Avaliacao.paciente_id,
+                    AcessoPaciente.user_id == user.id
+                )
+            ).where(Avaliacao.id.in_(pendentes))
+        ).all()
+
+        vigentes = AcessoPacienteService.graus_vigentes(
+            user.id, {paciente_id for _, _, paciente_id, _, vencido in linhas if vencido}
+        )
+
+        # O avaliador da própria avaliação tem ao menos nível de edição
+        graus = {
+            avaliacao_id: max(vigentes.get(paciente_id, nivel) or 0, 2 if avaliador_id == user.id else 0)
+            for avaliacao_id, avaliador_id, paciente_id, nivel, _ in linhas
+        }
+        resolvidos = {
+            avaliacao_id: PermissionService.NIVEIS[graus.get(avaliacao_id, 0)]
+            for avaliacao_id in pendentes
+        }
+        PermissionService._memorizar(user, 'avaliacao', resolvidos)
+        niveis.update(resolvidos)
+        return niveis
+
+    @staticmethod
+    def _memorizados(user, recurso_tipo, recurso_ids):
+        """Separa os níveis já resolvidos na requisição dos que ainda precisam de consulta"""
+        cache = PermissionService._cache_niveis() or {}
+        niveis = {}
+        pendentes = []
+        for recurso_id in recurso_ids:
+            chave = (user.id, recurso_tipo, recurso_id)
+            if chave in cache:
+                niveis[recurso_id] = cache[chave]
+            else:
+                pendentes.append(recurso_id)
+        return niveis, pendentes
+
+    @staticmethod
+    def _memorizar(user, recurso_tipo, niveis):
+        cache = PermissionService._cache_niveis()
+        if cache is not None:
+            for recurso_id, nivel in niveis.items():
+                cache[(user.id, recurso_tipo, recurso_id)] = nivel
+
+    @staticmethod
+    def nivel_atende(nivel, minimo):
+        """Indica se o nível concedido é pelo menos o nível mínimo exigido"""
+        return PermissionService.NIVEIS.index(nivel) >= PermissionService.NIVEIS.index(minimo)
+
+    @staticmethod
+    def pode_acessar_paciente(user, paciente_id):
+        """
+        Verifica se o usuário pode acessar um paciente
+
+        Regras:
+        - Admin: acessa tudo
+        - Criador do paciente: acessa sempre
+        - Responsável vinculado: acessa se estiver na tabela paciente_responsavel
+        - Avaliador: acessa se tiver feito alguma avaliação do paciente
+        - Compartilhamento ativo: acessa conforme o tipo de acesso
+
+        Args:
+            user: Usuário atual
+            paciente_id: ID do paciente
+
+        Returns:
+            bool: True se pode acessar, False caso contrário
+        """
+        return PermissionService.nivel_atende(
+            PermissionService.nivel_acesso_paciente(user, paciente_id),
+            PermissionService.NIVEL_LEITURA
+        )
 
     @staticmethod
     def pode_visualizar_paciente(user, paciente_id):
@@ -96,38 +349,10 @@ class PermissionService:
         Returns:
             bool: True se pode editar, False caso contrário
         """
-        if not user or not user.is_authenticated:
-            return False
-
-        # Admin edita tudo
-        if user.is_admin():
-            return True
-
-        paciente = Paciente.query.get(paciente_id)
-        if not paciente:
-            return False
-
-        # Criador pode editar
-        if paciente.criador_id == user.id:
-            return True
-
-        # Verifica se é responsável vinculado
-        vinculo = db.session.query(paciente_responsavel).filter_by(
-            paciente_id=paciente_id,
-            user_id=user.id
-        ).first()
-
-        if vinculo:
-            return True
-
-        # Verifica compartilhamento com permissão de edição
-        compartilhamento = CompartilhamentoPaciente.query.filter_by(
-            paciente_id=paciente_id,
-            recebeu_user_id=user.id,
-            ativo=True
-        ).filter(CompartilhamentoPaciente.tipo_acesso.in_(['edicao', 'completo'])).first()
-
-        return compartilhamento is not None
+        return PermissionService.nivel_atende(
+            PermissionService.nivel_acesso_paciente(user, paciente_id),
+            PermissionService.NIVEL_EDICAO
+        )
 
     @staticmethod
     def pode_excluir_paciente(user, paciente_id):
@@ -146,34 +371,10 @@ class PermissionService:
         Returns:
             bool: True se pode excluir, False caso contrário
         """
-        if not user or not user.is_authenticated:
-            return False
-
-        # Admin exclui tudo
-        if user.is_admin():
-            return True
-
-        paciente = Paciente.query.get(paciente_id)
-        if not paciente:
-            return False
-
-        # Criador pode excluir se não houver avaliações de outros
-        if paciente.criador_id == user.id:
-            outras_avaliacoes = Avaliacao.query.filter(
-                Avaliacao.paciente_id == paciente_id,
-                Avaliacao.avaliador_id != user.id
-            ).first()
-            return outras_avaliacoes is None
-
-        # Compartilhamento completo pode excluir
-        compartilhamento = CompartilhamentoPaciente.query.filter_by(
-            paciente_id=paciente_id,
-            recebeu_user_id=user.id,
-            ativo=True,
-            tipo_acesso='completo'
-        ).first()
-
-        return compartilhamento is not None
+        return PermissionService.nivel_atende(
+            PermissionService.nivel_acesso_paciente(user, paciente_id),
+            PermissionService.NIVEL_COMPLETO
+        )
 
     @staticmethod
     def filtrar_pacientes_por_permissao(query, user):
@@ -194,42 +395,11 @@ class PermissionService:
         if user.is_admin():
             return query
 
-        # Construir filtro composto
-        # 1. Pacientes criados pelo usuário
-        filtro = (Paciente.criador_id == user.id)
-
-        # 2. Pacientes vinculados
-        pacientes_vinculados = db.session.query(paciente_responsavel.c.paciente_id).filter(
-            paciente_responsavel.c.user_id == user.id
-        ).subquery()
-
-        filtro = or_(
-            filtro,
-            Paciente.id.in_(pacientes_vinculados)
-        )
-
-        # 3. Pacientes com avaliações feitas pelo usuário
-        pacientes_avaliados = db.session.query(Avaliacao.paciente_id.distinct()).filter(
-            Avaliacao.avaliador_id == user.id
-        ).subquery()
-
-        filtro = or_(
-            filtro,
-            Paciente.id.in_(pacientes_avaliados)
-        )
-
-        # 4. Pacientes compartilhados ativos
-        pacientes_compartilhados = db.session.query(CompartilhamentoPaciente.paciente_id).filter(
-            CompartilhamentoPaciente.recebeu_user_id == user.id,
-            CompartilhamentoPaciente.ativo == True
-        ).subquery()
-
-        filtro = or_(
-            filtro,
-            Paciente.id.in_(pacientes_compartilhados)
-        )
-
-        return query.filter(filtro)
+        # Concessões materializadas em acesso_paciente (chave primária user_id, paciente_id)
+        return query.join(AcessoPaciente, and_(
+            AcessoPaciente.paciente_id == Paciente.id,
+            AcessoPaciente.user_id == user.id
+        ))
 
     @staticmethod
     def pode_acessar_avaliacao(user, avaliacao_id):
@@ -246,14 +416,10 @@ class PermissionService:
         Returns:
             bool: True se pode acessar, False caso contrário
         """
-        if not user or not user.is_authenticated:
-            return False
-
-        avaliacao = Avaliacao.query.get(avaliacao_id)
-        if not avaliacao:
-            return False
-
-        return PermissionService.pode_acessar_paciente(user, avaliacao.paciente_id)
+        return PermissionService.nivel_atende(
+            PermissionService.nivel_acesso_avaliacao(user, avaliacao_id),
+            PermissionService.NIVEL_LEITURA
+        )
 
     @staticmethod
     def pode_editar_avaliacao(user, avaliacao_id):
@@ -272,50 +438,26 @@ class PermissionService:
         Returns:
             bool: True se pode editar, False caso contrário
         """
-        if not user or not user.is_authenticated:
-            return False
-
-        # Admin edita tudo
-        if user.is_admin():
-            return True
-
-        avaliacao = Avaliacao.query.get(avaliacao_id)
-        if not avaliacao:
-            return False
-
-        # Avaliador que criou pode editar sempre
-        if avaliacao.avaliador_id == user.id:
-            return True
-
-        # Outros usuários precisam ter permissão de edição do paciente
-        return PermissionService.pode_editar_paciente(user, avaliacao.paciente_id)
+        return PermissionService.nivel_atende(
+            PermissionService.nivel_acesso_avaliacao(user, avaliacao_id),
+            PermissionService.NIVEL_EDICAO
+        )
 
     @staticmethod
     def registrar_acesso(user, recurso_tipo, recurso_id, acao):
         """
         Registra um acesso na tabela de auditoria
 
+        A gravação é delegada ao AuditoriaService (em lote, salvo ações síncronas).
+
         Args:
             user: Usuário que acessou
             recurso_tipo: Tipo do recurso ('paciente', 'avaliacao', 'relatorio')
             recurso_id: ID do recurso
             acao: Ação realizada ('visualizar', 'editar', 'excluir', 'criar', 'exportar')
         """
-        try:
-            auditoria = AuditoriaAcesso(
-                user_id=user.id if user and user.is_authenticated else None,
-                recurso_tipo=recurso_tipo,
-                recurso_id=recurso_id,
-                acao=acao,
-                ip_address=request.remote_addr if request else None,
-                user_agent=request.user_agent.string if request and request.user_agent else None
-            )
-            db.session.add(auditoria)
-            db.session.commit()
-        except Exception as e:
-            # Não deve quebrar a aplicação se auditoria falhar
-            db.session.rollback()
-            print(f"Erro ao registrar auditoria: {e}")
+        paciente_id = recurso_id if recurso_tipo == 'paciente' else None
+        AuditoriaService.registrar(user, recurso_tipo, recurso_id, acao, paciente_id=paciente_id)
 
     @staticmethod
     def vincular_responsavel(paciente_id, user_id, tipo_vinculo='terapeuta'):
@@ -347,7 +489,9 @@ class PermissionService:
                 tipo_vinculo=tipo_vinculo
             )
             db.session.execute(stmt)
+            AcessoPacienteService.recalcular_pacientes([paciente_id])
             db.session.commit()
+            PermissionService.limpar_cache()
             return True
         except Exception as e:
             db.session.rollback()
@@ -372,7 +516,9 @@ class PermissionService:
                 paciente_responsavel.c.user_id == user_id
             )
             db.session.execute(stmt)
+            AcessoPacienteService.recalcular_pacientes([paciente_id])
             db.session.commit()
+            PermissionService.limpar_cache()
             return True
         except Exception as e:
             db.session.rollback()
@@ -381,7 +527,7 @@ class PermissionService:
 
     @staticmethod
     def compartilhar_paciente(paciente_id, compartilhou_user_id, recebeu_user_id,
-                              tipo_acesso='leitura', motivo=None):
+                              tipo_acesso='leitura', motivo=None, data_expiracao=None):
         """
         Compartilha um paciente com outro usuário
 
@@ -391,6 +537,7 @@ class PermissionService:
             recebeu_user_id: ID de quem vai receber o acesso
             tipo_acesso: Tipo de acesso ('leitura', 'edicao', 'completo')
             motivo: Motivo do compartilhamento
+            data_expiracao: Data/hora em que o acesso expira (opcional)
 
         Returns:
             CompartilhamentoPaciente ou None se falhar
@@ -402,10 +549,12 @@ class PermissionService:
                 recebeu_user_id=recebeu_user_id,
                 tipo_acesso=tipo_acesso,
                 motivo=motivo,
+                data_expiracao=data_expiracao,
                 ativo=True
             )
             db.session.add(compartilhamento)
             db.session.commit()
+            PermissionService.limpar_cache()
             return compartilhamento
         except Exception as e:
             db.session.rollback()
@@ -424,15 +573,60 @@ class PermissionService:
             bool: True se revogado com sucesso
         """
         try:
-            from datetime import datetime
             compartilhamento = CompartilhamentoPaciente.query.get(compartilhamento_id)
             if compartilhamento:
                 compartilhamento.ativo = False
                 compartilhamento.data_revogacao = datetime.utcnow()
                 db.session.commit()
+                PermissionService.limpar_cache()
                 return True
             return False
         except Exception as e:
             db.session.rollback()
             print(f"Erro ao revogar compartilhamento: {e}")
             return False
+
+    @staticmethod
+    def expirar_compartilhamentos(agora=None):
+        """
+        Revoga em lote os compartilhamentos ativos cuja data de expiração passou
+
+        Executada periodicamente (flask expirar-compartilhamentos). As verificações
+        de acesso a um paciente ou avaliação já ignoram compartilhamentos expirados;
+        a varredura marca-os como revogados e recalcula acesso_paciente (usada nas
+        listagens) dos pacientes afetados na mesma transação.
+
+        Args:
+            agora: Instante de referência (default: agora, UTC)
+
+        Returns:
+            int: Quantidade de compartilhamentos revogados
+        """
+        if agora is None:
+            agora = datetime.utcnow()
+
+        try:
+            expirados = db.session.execute(
+                select(CompartilhamentoPaciente.id, CompartilhamentoPaciente.paciente_id).where(
+                    CompartilhamentoPaciente.ativo.is_(True),
+                    CompartilhamentoPaciente.data_expiracao.isnot(None),
+                    CompartilhamentoPaciente.data_expiracao <= agora
+                )
+            ).all()
+            if not expirados:
+                return 0
+
+            db.session.execute(
+                update(CompartilhamentoPaciente).where(
+                    CompartilhamentoPaciente.id.in_([linha.id for linha in expirados])
+                ).values(ativo=False, data_revogacao=agora)
+            )
+            # UPDATE em lote não passa pelo after_flush: recalcula explicitamente
+            AcessoPacienteService.recalcular_pacientes(linha.paciente_id for linha in expirados)
+            db.session.commit()
+            PermissionService.limpar_cache()
+            return len(expirados)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Erro ao expirar compartilhamentos: {e}")
+            return 0
@@ -0,0 +1,188 @@
+"""
+Service de pacotes de questões por instrumento (cache do catálogo usado ao responder)
+"""
+import threading
+from collections import namedtuple
+from sqlalchemy import event, inspect, select, update
+from app import db
+from app.models import Dominio, Instrumento, Questao
+from app.forms.avaliacao_form import RespostaForm
+from app.utils.schema_utils import questao_has_column
+
+
+DominioPacote = namedtuple('DominioPacote', 'id codigo nome ordem escala_invertida')
+QuestaoPacote = namedtuple(
+    'QuestaoPacote', 'id dominio_id dominio numero numero_global texto choices descricoes'
+)
+PacoteQuestoes = namedtuple('PacoteQuestoes', 'instrumento_id versao criado_em dominios questoes por_id')
+
+# {instrumento_id: PacoteQuestoes} (compartilhado pelas threads do processo)
+_pacotes = {}
+_lock = threading.Lock()
+
+
+class QuestionarioService:
+    """Questões ativas do instrumento, com opções já interpretadas, em cache por versão"""
+
+    @staticmethod
+    def interpretar_opcoes(opcoes_resposta):
+        """
+        Interpreta as opções 'valor|Rótulo (descrição)' de uma questão
+
+        Args:
+            opcoes_resposta: Lista de opções da questão (None = escala padrão)
+
+        Returns:
+            tuple: (choices [(valor, rótulo)], descrições {valor: descrição})
+        """
+        if not isinstance(opcoes_resposta, (list, tuple)) or not opcoes_resposta:
+            return tuple(RespostaForm.DEFAULT_CHOICES), dict(RespostaForm.DEFAULT_DESCRIPTIONS)
+
+        choices = []
+        descricoes = {}
+        for raw in opcoes_resposta:
+            if '|' in raw:
+                valor_opcao, label_text = raw.split('|', 1)
+            else:
+                valor_opcao, label_text = raw, raw
+
+            valor_opcao = valor_opcao.strip()
+            label_principal, _, complemento = label_text.partition('(')
+            choices.append((valor_opcao, label_principal.strip()))
+
+            complemento = complemento.strip().rstrip(')')
+            if complemento:
+                descricoes[valor_opcao] = complemento
+
+        return tuple(choices), descricoes or dict(RespostaForm.DEFAULT_DESCRIPTIONS)
+
+    @staticmethod
+    def obter(instrumento):
+        """
+        Pacote de questões do instrumento
+
+        Reutiliza o pacote em memória enquanto `instrumento.versao` não mudar;
+        as alterações no catálogo incrementam a versão (ver _versionar_instrumentos).
+        Os objetos do pacote são compartilhados entre requisições: somente leitura.
+
+        Args:
+            instrumento: Instância de Instrumento (ou ID)
+
+        Returns:
+            PacoteQuestoes: domínios e questões ativas em ordem de aplicação
+        """
+        if not isinstance(instrumento, Instrumento):
+            instrumento = db.session.get(Instrumento, instrumento)
+
+        pacote = _pacotes.get(instrumento.id)
+        # data_criacao protege contra IDs reaproveitados após exclusão do instrumento
+        if pacote is not None and (pacote.versao, pacote.criado_em) == (instrumento.versao, instrumento.data_criacao):
+            return pacote
+
+        pacote = QuestionarioService._montar(instrumento.id, instrumento.versao, instrumento.data_criacao)
+        with _lock:
+            _pacotes[instrumento.id] = pacote
+        return pacote
+
+    @staticmethod
+    def _montar(instrumento_id, versao, criado_em):
+        dominios = {
+            linha.id: DominioPacote(linha.id, linha.codigo, linha.nome, linha.ordem, linha.escala_invertida)
+            for linha in db.session.execute(
+                select(Dominio.id, Dominio.codigo, Dominio.nome, Dominio.ordem, Dominio.escala_invertida)
+                .where(Dominio.instrumento_id == instrumento_id, Dominio.ativo.is_(True))
+                .order_by(Dominio.ordem)
+            )
+        }
+
+        tem_opcoes = questao_has_column('opcoes_resposta')
+        colunas = [Questao.id, Questao.dominio_id, Questao.numero, Questao.numero_global, Questao.texto]
+        if tem_opcoes:
+            colunas.append(Questao.opcoes_resposta)
+
+        questoes = []
+        for linha in db.session.execute(
+                select(*colunas).join(Dominio, Questao.dominio_id == Dominio.id).where(
+                    Dominio.instrumento_id == instrumento_id,
+                    Dominio.ativo.is_(True),
+                    Questao.ativo.is_(True)
+                ).order_by(Dominio.ordem, Questao.numero)):
+            choices, descricoes = QuestionarioService.interpretar_opcoes(linha[5] if tem_opcoes else None)
+            questoes.append(QuestaoPacote(
+                linha[0], linha[1], dominios[linha[1]], linha[2], linha[3], linha[4], choices, descricoes
+            ))
+
+        return PacoteQuestoes(
+            instrumento_id=instrumento_id,
+            versao=versao,
+            criado_em=criado_em,
+            dominios=tuple(dominios.values()),
+            questoes=tuple(questoes),
+            por_id={questao.id: questao for questao in questoes}
+        )
+
+    @staticmethod
+    def limpar_cache():
+        """Descarta todos os pacotes em memória"""
+        with _lock:
+            _pacotes.clear()
+
+
+def _instrumentos_alterados(session):
+    """IDs de instrumentos e de domínios cujo catálogo mudou no flush"""
+    instrumentos = set()
+    dominios = set()
+
+    for objeto in list(session.new) + list(session.deleted):
+        if isinstance(objeto, Instrumento):
+            instrumentos.add(objeto.id)
+        elif isinstance(objeto, Dominio):
+            instrumentos.add(objeto.instrumento_id)
+        elif isinstance(objeto, Questao):
+            dominios.add(objeto.dominio_id)
+
+    for objeto in session.dirty:
+        if not session.is_modified(objeto, include_collections=False):
+            continue
+        if isinstance(objeto, Instrumento):
+            instrumentos.add(objeto.id)
+        elif isinstance(objeto, Dominio):
+            instrumentos.add(objeto.instrumento_id)
+            instrumentos.update(inspect(objeto).attrs.instrumento_id.history.deleted)
+        elif isinstance(objeto, Questao):
+            dominios.add(objeto.dominio_id)
+            dominios.update(inspect(objeto).attrs.dominio_id.history.deleted)
+
+    instrumentos.discard(None)
+    dominios.discard(None)
+    return instrumentos, dominios
+
+
+@event.listens_for(db.session, 'after_flush')
+def _versionar_instrumentos(session, flush_context):
+    # Mesma transação do flush: a nova versão fica visível junto com a alteração
+    instrumentos, dominios = _instrumentos_alterados(session)
+    if not instrumentos and not dominios:
+        return
+
+    connection = session.connection()
+    if dominios:
+        instrumentos.update(connection.execute(
+            select(Dominio.instrumento_id).where(Dominio.id.in_(dominios))
+        ).scalars())
+    if not instrumentos:
+        return
+
+    tabela = Instrumento.__table__
+    connection.execute(
+        update(tabela).where(tabela.c.id.in_(instrumentos)).values(versao=tabela.c.versao + 1)
+    )
+    # O valor em memória ficou defasado
+    for objeto in list(session.identity_map.values()):
+        if isinstance(objeto, Instrumento) and objeto.id in instrumentos:
+            session.expire(objeto, ['versao'])
+
+    # Questões ativadas/desativadas mudam o progresso das avaliações do instrumento
+    from app.services.resposta_service import RespostaService, expirar_progresso
+    RespostaService.recalcular_progresso(instrumento_ids=instrumentos, connection=connection)
+    expirar_progresso(session, instrumento_ids=instrumentos)
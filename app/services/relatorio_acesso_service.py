@@ -0,0 +1,169 @@
+"""
+Service de revisão de acessos (relatórios de conformidade sobre a auditoria)
+"""
+import csv
+import io
+from datetime import date, timedelta
+from sqlalchemy import case, distinct, func, select
+from app import db
+from app.models import AuditoriaAcesso, Paciente, ResumoAcessoDiario, User
+
+
+class RelatorioAcessoService:
+    """Resumos diários incrementais e consultas de revisão de acesso"""
+
+    # Chave do advisory lock que serializa as atualizações dos resumos
+    CHAVE_LOCK = 39001
+
+    @staticmethod
+    def atualizar(desde=None):
+        """
+        Atualiza os resumos diários a partir da auditoria
+
+        Sem `desde`, reprocessa apenas a partir do último dia já resumido (que pode
+        ter recebido eventos depois do último processamento); os dias anteriores
+        não mudam mais.
+
+        Os resumos sobrevivem ao arquivamento da auditoria; reprocessar dias já
+        arquivados descartaria seus resumos.
+
+        Executado pelo comando `flask resumir-acessos`. No Postgres, execuções
+        simultâneas são serializadas por um advisory lock da transação.
+
+        Args:
+            desde: Primeiro dia a reprocessar (date)
+
+        Returns:
+            int: Quantidade de linhas de resumo geradas
+        """
+        auditoria = AuditoriaAcesso.__table__
+        resumos = ResumoAcessoDiario.__table__
+
+        if db.session.get_bind().dialect.name == 'postgresql':
+            db.session.execute(select(func.pg_advisory_xact_lock(RelatorioAcessoService.CHAVE_LOCK)))
+
+        if desde is None:
+            desde = db.session.execute(select(func.max(resumos.c.data))).scalar()
+        if desde is None:
+            primeiro = db.session.execute(select(func.min(auditoria.c.data_acesso))).scalar()
+            if primeiro is None:
+                return 0
+            desde = primeiro.date()
+        if isinstance(desde, str):
+            desde = date.fromisoformat(desde)
+
+        # Eventos antigos de 'paciente' registravam o paciente apenas em recurso_id
+        paciente_id = func.coalesce(
+            auditoria.c.paciente_id,
+            case((auditoria.c.recurso_tipo == 'paciente', auditoria.c.recurso_id))
+        )
+        dia = func.date(auditoria.c.data_acesso)
+        agregados = select(
+            dia,
+            auditoria.c.user_id,
+            paciente_id,
+            auditoria.c.acao,
+            func.count(),
+            func.min(auditoria.c.data_acesso),
+            func.max(auditoria.c.data_acesso)
+        ).join(
+            Paciente.__table__, Paciente.id == paciente_id
+        ).where(
+            auditoria.c.data_acesso >= desde,
+            auditoria.c.user_id.isnot(None)
+        ).group_by(dia, auditoria.c.user_id, paciente_id, auditoria.c.acao)
+
+        db.session.execute(resumos.delete().where(resumos.c.data >= desde))
+        resultado = db.session.execute(resumos.insert().from_select(
+            ['data', 'user_id', 'paciente_id', 'acao', 'total', 'primeiro_acesso', 'ultimo_acesso'],
+            agregados
+        ))
+        db.session.commit()
+        return resultado.rowcount
+
+    @staticmethod
+    def ultimo_dia_resumido():
+        """Último dia presente nos resumos (None se ainda não houver resumos)"""
+        return db.session.execute(select(func.max(ResumoAcessoDiario.data))).scalar()
+
+    @staticmethod
+    def acessos_ao_paciente(paciente_id, dias=90):
+        """
+        Quem acessou o paciente nos últimos `dias` dias
+
+        Returns:
+            list: Linhas (user_id, nome_completo, acessos, dias_com_acesso, primeiro_acesso, ultimo_acesso)
+        """
+        inicio = date.today() - timedelta(days=dias)
+        return db.session.execute(
+            select(
+                ResumoAcessoDiario.user_id,
+                User.nome_completo,
+                func.sum(ResumoAcessoDiario.total).label('acessos'),
+                func.count(distinct(ResumoAcessoDiario.data)).label('dias_com_acesso'),
+                func.min(ResumoAcessoDiario.primeiro_acesso).label('primeiro_acesso'),
+                func.max(ResumoAcessoDiario.ultimo_acesso).label('ultimo_acesso')
+            ).join(
+                User, User.id == ResumoAcessoDiario.user_id
+            ).where(
+                ResumoAcessoDiario.paciente_id == paciente_id,
+                ResumoAcessoDiario.data >= inicio
+            ).group_by(
+                ResumoAcessoDiario.user_id, User.nome_completo
+            ).order_by(func.max(ResumoAcessoDiario.ultimo_acesso).desc())
+        ).all()
+
+    @staticmethod
+    def usuarios_com_muitos_pacientes(minimo_pacientes, data_inicio=None, data_fim=None):
+        """
+        Usuários que acessaram pelo menos `minimo_pacientes` pacientes distintos no período
+
+        Args:
+            minimo_pacientes: Quantidade mínima de pacientes distintos
+            data_inicio: Início do período (default: 7 dias atrás)
+            data_fim: Fim do período, inclusive (default: hoje)
+
+        Returns:
+            list: Linhas (user_id, nome_completo, pacientes, acessos)
+        """
+        if data_fim is None:
+            data_fim = date.today()
+        if data_inicio is None:
+            data_inicio = data_fim - timedelta(days=7)
+
+        pacientes = func.count(distinct(ResumoAcessoDiario.paciente_id))
+        return db.session.execute(
+            select(
+                ResumoAcessoDiario.user_id,
+                User.nome_completo,
+                pacientes.label('pacientes'),
+                func.sum(ResumoAcessoDiario.total).label('acessos')
+            ).join(
+                User, User.id == ResumoAcessoDiario.user_id
+            ).where(
+                ResumoAcessoDiario.data >= data_inicio,
+                ResumoAcessoDiario.data <= data_fim
+            ).group_by(
+                ResumoAcessoDiario.user_id, User.nome_completo
+            ).having(
+                pacientes >= minimo_pacientes
+            ).order_by(pacientes.desc())
+        ).all()
+
+    @staticmethod
+    def gerar_csv(cabecalho, linhas):
+        """
+        Gera o CSV linha a linha (para resposta em streaming)
+
+        Args:
+            cabecalho: Nomes das colunas
+            linhas: Sequência de tuplas com os valores
+        """
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer, delimiter=';')
+
+        for linha in [cabecalho, *linhas]:
+            escritor.writerow(linha)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
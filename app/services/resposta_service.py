@@ -0,0 +1,499 @@
+"""
+Service para gravação de respostas de avaliações em lote e sincronização offline
+"""
+from datetime import datetime, timezone
+from sqlalchemy import event, func, insert, inspect, select, update
+from app import db
+from app.models import Avaliacao, Dominio, Instrumento, Questao, Resposta, SincronizacaoResposta
+from app.services.calculo_service import CalculoService
+from app.services.questionario_service import QuestionarioService
+
+
+class RespostaService:
+    """Valida, pontua e grava (upsert) várias respostas de uma vez"""
+
+    @staticmethod
+    def progresso(avaliacao):
+        """
+        Questões ativas respondidas e total do instrumento (contadores da avaliação)
+
+        Returns:
+            tuple: (respondidas, total)
+        """
+        return avaliacao.questoes_respondidas, avaliacao.total_questoes
+
+    @staticmethod
+    def recalcular_progresso(avaliacao_ids=None, instrumento_ids=None, connection=None):
+        """
+        Recalcula questoes_respondidas/total_questoes com um único UPDATE
+
+        Args:
+            avaliacao_ids: Restringe às avaliações informadas
+            instrumento_ids: Restringe às avaliações dos instrumentos informados
+            connection: Conexão a usar (default: a da sessão atual)
+
+        Returns:
+            int: Quantidade de avaliações atualizadas
+        """
+        tabela = Avaliacao.__table__
+        total = select(func.count()).select_from(Questao).join(
+            Dominio, Questao.dominio_id == Dominio.id
+        ).where(
+            Dominio.instrumento_id == tabela.c.instrumento_id,
+            Dominio.ativo.is_(True),
+            Questao.ativo.is_(True)
+        ).scalar_subquery()
+        respondidas = select(func.count()).select_from(Resposta).join(
+            Questao, Resposta.questao_id == Questao.id
+        ).join(
+            Dominio, Questao.dominio_id == Dominio.id
+        ).where(
+            Resposta.avaliacao_id == tabela.c.id,
+            Dominio.ativo.is_(True),
+            Questao.ativo.is_(True)
+        ).scalar_subquery()
+
+        # data_atualizacao explícita: contadores não contam como edição da avaliação
+        comando = update(tabela).values(
+            total_questoes=total,
+            questoes_respondidas=respondidas,
+            data_atualizacao=tabela.c.data_atualizacao
+        )
+        if avaliacao_ids is not None:
+            comando = comando.where(tabela.c.id.in_(avaliacao_ids))
+        if instrumento_ids is not None:
+            comando = comando.where(tabela.c.instrumento_id.in_(instrumento_ids))
+
+        if connection is None:
+            connection = db.session.connection()
+        return connection.execute(comando).rowcount
+
+    @staticmethod
+    def bloquear_avaliacoes(avaliacao_ids, connection=None):
+        """
+        Bloqueia as linhas das avaliações (SELECT ... FOR UPDATE) antes de gravar respostas
+
+        Os contadores são recalculados com COUNT a partir do snapshot de cada
+        escritor; o bloqueio faz gravações simultâneas na mesma avaliação
+        (duas abas, salvamento automático e sincronização) esperarem o commit
+        uma da outra, de modo que a última contagem inclui as respostas de ambas.
+
+        Args:
+            avaliacao_ids: IDs das avaliações que receberão respostas
+            connection: Conexão a usar (default: a da sessão atual)
+        """
+        avaliacao_ids = sorted(set(avaliacao_ids))
+        if not avaliacao_ids:
+            return
+
+        if connection is None:
+            connection = db.session.connection()
+        connection.execute(
+            select(Avaliacao.id).where(Avaliacao.id.in_(avaliacao_ids)).order_by(Avaliacao.id).with_for_update()
+        )
+
+    @staticmethod
+    def reconciliar_progresso():
+        """
+        Recalcula os contadores de todas as avaliações (flask reconciliar-progresso)
+
+        Returns:
+            int: Quantidade de avaliações atualizadas
+        """
+        total = RespostaService.recalcular_progresso()
+        db.session.commit()
+        return total
+
+    @staticmethod
+    def plano_instrumento(instrumento_id):
+        """
+        Questões ativas do instrumento com a escala e os valores aceitos
+
+        Args:
+            instrumento_id: ID do instrumento
+
+        Returns:
+            dict: {questao_id: (escala_invertida, valores_permitidos)}
+        """
+        return {
+            questao.id: (questao.dominio.escala_invertida, {valor for valor, _ in questao.choices})
+            for questao in QuestionarioService.obter(instrumento_id).questoes
+        }
+
+    @staticmethod
+    def validar(avaliacao, respostas):
+        """
+        Valida e pontua as respostas contra o plano do instrumento
+
+        Args:
+            avaliacao: Instância de Avaliacao
+            respostas: dict {questao_id: valor}
+
+        Returns:
+            tuple: (linhas para gravação, dict de erros {questao_id: mensagem})
+        """
+        plano = RespostaService.plano_instrumento(avaliacao.instrumento_id)
+        agora = datetime.utcnow()
+        linhas = []
+        erros = {}
+
+        for questao_id, valor in respostas.items():
+            try:
+                questao_id = int(questao_id)
+            except (TypeError, ValueError):
+                erros[str(questao_id)] = 'Questão inválida'
+                continue
+
+            if questao_id not in plano:
+                erros[str(questao_id)] = 'Questão não pertence ao instrumento'
+                continue
+
+            escala_invertida, permitidos = plano[questao_id]
+            if not isinstance(valor, str) or valor not in permitidos:
+                erros[str(questao_id)] = 'Valor de resposta inválido'
+                continue
+
+            linhas.append({
+                'avaliacao_id': avaliacao.id,
+                'questao_id': questao_id,
+                'valor': valor,
+                'pontuacao': CalculoService.calcular_pontuacao_resposta(valor, escala_invertida),
+                'data_criacao': agora,
+                'data_atualizacao': agora,
+                'registrado_em': agora,
+            })
+
+        return linhas, erros
+
+    @staticmethod
+    def upsert(linhas):
+        """
+        Grava as respostas com um único INSERT ... ON CONFLICT (uq_avaliacao_questao)
+
+        Em bancos sem upsert nativo, grava resposta a resposta pelo ORM.
+        Não faz commit.
+
+        Args:
+            linhas: Dicionários gerados por validar()
+        """
+        if not linhas:
+            return
+
+        RespostaService.bloquear_avaliacoes({linha['avaliacao_id'] for linha in linhas})
+
+        dialeto = db.engine.dialect.name
+        if dialeto == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialeto_insert
+            conflito = {'constraint': 'uq_avaliacao_questao'}
+        elif dialeto == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialeto_insert
+            conflito = {'index_elements': ['avaliacao_id', 'questao_id']}
+        else:
+            for linha in linhas:
+                resposta = Resposta.query.filter_by(
+                    avaliacao_id=linha['avaliacao_id'], questao_id=linha['questao_id']
+                ).first() or Resposta(avaliacao_id=linha['avaliacao_id'], questao_id=linha['questao_id'])
+                resposta.valor = linha['valor']
+                resposta.pontuacao = linha['pontuacao']
+                resposta.registrado_em = linha['registrado_em']
+                db.session.add(resposta)
+            db.session.flush()
+            return
+
+        comando = dialeto_insert(Resposta.__table__)
+        comando = comando.on_conflict_do_update(
+            set_={
+                'valor': comando.excluded.valor,
+                'pontuacao': comando.excluded.pontuacao,
+                'data_atualizacao': comando.excluded.data_atualizacao,
+                'registrado_em': comando.excluded.registrado_em,
+            },
+            **conflito
+        )
+        db.session.execute(comando, linhas)
+        RespostaService.recalcular_progresso({linha['avaliacao_id'] for linha in linhas})
+
+    @staticmethod
+    def salvar_lote(avaliacao, respostas, commit=True):
+        """
+        Valida e grava um lote de respostas em uma única transação
+
+        O lote é rejeitado inteiro se alguma resposta for inválida.
+
+        Args:
+            avaliacao: Instância de Avaliacao
+            respostas: dict {questao_id: valor}
+            commit: Se True, faz commit; se False, o chamador confirma a transação
+                (ex: junto com o recálculo de uma avaliação concluída)
+
+        Returns:
+            tuple: (quantidade gravada, dict de erros)
+        """
+        linhas, erros = RespostaService.validar(avaliacao, respostas)
+        if erros:
+            return 0, erros
+
+        RespostaService.upsert(linhas)
+        RespostaService._encerrar_gravacao(commit)
+        return len(linhas), {}
+
+    @staticmethod
+    def _encerrar_gravacao(commit):
+        if commit:
+            db.session.commit()
+        else:
+            db.session.flush()
+        # Respostas já carregadas na sessão refletem o estado anterior ao upsert
+        db.session.expire_all()
+
+    # ===== Captura offline: pacote do instrumento e sincronização =====
+
+    @staticmethod
+    def pacote(avaliacao):
+        """
+        Pacote compacto para responder a avaliação sem conexão
+
+        As opções de resposta são enviadas uma única vez em `escalas`; cada
+        questão referencia a sua pelo índice.
+
+        Args:
+            avaliacao: Instância de Avaliacao
+
+        Returns:
+            dict: Instrumento, domínios, questões, escalas e respostas já gravadas
+        """
+        instrumento = db.session.get(Instrumento, avaliacao.instrumento_id)
+        pacote = QuestionarioService.obter(instrumento)
+
+        escalas = []
+        questoes = []
+        for questao in pacote.questoes:
+            escala = [list(opcao) for opcao in questao.choices]
+            if escala not in escalas:
+                escalas.append(escala)
+            questoes.append([
+                questao.id, questao.dominio_id, questao.numero_global, questao.texto, escalas.index(escala)
+            ])
+
+        respostas = db.session.execute(
+            select(
+                Resposta.questao_id, Resposta.valor,
+                func.coalesce(Resposta.registrado_em, Resposta.data_atualizacao)
+            ).where(Resposta.avaliacao_id == avaliacao.id)
+        ).all()
+
+        return {
+            'avaliacao': {'id': avaliacao.id, 'status': avaliacao.status},
+            'instrumento': {
+                'id': instrumento.id, 'codigo': instrumento.codigo, 'nome': instrumento.nome,
+                'versao': pacote.versao
+            },
+            'dominios': [
+                {'id': d.id, 'codigo': d.codigo, 'nome': d.nome, 'escala_invertida': d.escala_invertida}
+                for d in pacote.dominios
+            ],
+            'escalas': escalas,
+            'questoes': questoes,
+            'respostas': {
+                str(questao_id): [valor, momento.isoformat()]
+                for questao_id, valor, momento in respostas
+            },
+            'gerado_em': datetime.utcnow().isoformat(),
+        }
+
+    @staticmethod
+    def _instante(valor):
+        """Converte o horário ISO 8601 do dispositivo para UTC sem fuso (como no banco)"""
+        if not isinstance(valor, str):
+            return None
+        try:
+            instante = datetime.fromisoformat(valor.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+        if instante.tzinfo is not None:
+            instante = instante.astimezone(timezone.utc).replace(tzinfo=None)
+        return instante
+
+    @staticmethod
+    def sincronizar(avaliacao, itens, commit=True):
+        """
+        Aplica um lote de respostas capturadas offline em uma única transação
+
+        Cada item traz `chave` (idempotência), `questao_id`, `valor` e
+        `registrado_em` (horário do dispositivo). Por questão vence a resposta
+        registrada por último: itens mais antigos que a resposta do servidor
+        voltam como 'conflito', com o valor vigente. Itens já recebidos nesta
+        avaliação (mesma chave) devolvem o resultado original sem nova gravação.
+
+        Args:
+            avaliacao: Instância de Avaliacao
+            itens: Lista de dicts do dispositivo
+            commit: Se True, faz commit; se False, o chamador confirma a transação
+
+        Returns:
+            list: Resultado por item (chave, questao_id, resultado, valor[, erro, duplicado])
+        """
+        plano = RespostaService.plano_instrumento(avaliacao.instrumento_id)
+        agora = datetime.utcnow()
+
+        chaves = [str(item.get('chave')) for item in itens if isinstance(item, dict) and item.get('chave')]
+        recebidos = {
+            registro.chave: registro
+            for registro in SincronizacaoResposta.query.filter(
+                SincronizacaoResposta.avaliacao_id == avaliacao.id,
+                SincronizacaoResposta.chave.in_(chaves)
+            )
+        } if chaves else {}
+
+        resultados = []
+        validos = []
+        vistos = {}
+        repetidos = []
+        for item in itens:
+            if not isinstance(item, dict):
+                resultados.append({'chave': None, 'resultado': 'rejeitada', 'erro': 'Item inválido'})
+                continue
+
+            chave = str(item.get('chave') or '')
+            resultado = {'chave': chave, 'questao_id': item.get('questao_id')}
+            resultados.append(resultado)
+
+            if not chave or len(chave) > 64:
+                resultado.update(resultado='rejeitada', erro='Chave de idempotência inválida')
+                continue
+            if chave in recebidos:
+                resultado.update(resultado=recebidos[chave].resultado, duplicado=True)
+                continue
+            if chave in vistos:
+                # Repetido no próprio lote: recebe o resultado do primeiro envio
+                resultado['duplicado'] = True
+                repetidos.append((resultado, vistos[chave]))
+                continue
+            vistos[chave] = resultado
+
+            try:
+                questao_id = int(item.get('questao_id'))
+            except (TypeError, ValueError):
+                questao_id = None
+            valor = item.get('valor')
+            instante = RespostaService._instante(item.get('registrado_em'))
+            resultado['questao_id'] = questao_id
+
+            if questao_id not in plano:
+                erro = 'Questão não pertence ao instrumento'
+            elif not isinstance(valor, str) or valor not in plano[questao_id][1]:
+                erro = 'Valor de resposta inválido'
+            elif instante is None:
+                erro = 'Horário de registro inválido'
+            else:
+                erro = None
+
+            if erro:
+                resultado.update(resultado='rejeitada', erro=erro)
+            validos.append((instante, chave, questao_id, valor, resultado, erro))
+
+        # Estado atual das questões envolvidas (uma consulta)
+        questoes = {questao_id for _, _, questao_id, _, _, erro in validos if not erro}
+        vigentes = {
+            questao_id: (valor, momento)
+            for questao_id, valor, momento in db.session.execute(
+                select(
+                    Resposta.questao_id, Resposta.valor,
+                    func.coalesce(Resposta.registrado_em, Resposta.data_atualizacao)
+                ).where(
+                    Resposta.avaliacao_id == avaliacao.id,
+                    Resposta.questao_id.in_(questoes)
+                )
+            )
+        } if questoes else {}
+
+        aplicar = {}
+        registros = []
+        for instante, chave, questao_id, valor, resultado, erro in sorted(
+                validos, key=lambda v: (v[0] is None, v[0] or agora)):
+            if not erro:
+                vigente = vigentes.get(questao_id)
+                if vigente and vigente[1] > instante:
+                    resultado['resultado'] = 'conflito'
+                else:
+                    vigentes[questao_id] = (valor, instante)
+                    resultado['resultado'] = 'aplicada'
+                    aplicar[questao_id] = {
+                        'avaliacao_id': avaliacao.id,
+                        'questao_id': questao_id,
+                        'valor': valor,
+                        'pontuacao': CalculoService.calcular_pontuacao_resposta(valor, plano[questao_id][0]),
+                        'data_criacao': agora,
+                        'data_atualizacao': agora,
+                        'registrado_em': instante,
+                    }
+
+            # Itens rejeitados não gravam os dados do cliente (podem exceder as colunas)
+            registros.append({
+                'chave': chave,
+                'avaliacao_id': avaliacao.id,
+                'questao_id': questao_id if questao_id in plano else 0,
+                'valor': None if erro else valor,
+                'resultado': resultado['resultado'],
+                'registrado_em': instante,
+                'recebido_em': agora,
+            })
+
+        for resultado, original in repetidos:
+            resultado['resultado'] = original['resultado']
+
+        for resultado in resultados:
+            vigente = vigentes.get(resultado.get('questao_id'))
+            if vigente and resultado.get('resultado') in ('aplicada', 'conflito'):
+                resultado['valor'] = vigente[0]
+
+        RespostaService.upsert(list(aplicar.values()))
+        if registros:
+            db.session.execute(insert(SincronizacaoResposta), registros)
+        RespostaService._encerrar_gravacao(commit)
+        return resultados
+
+
+def _avaliacoes_afetadas(session):
+    """IDs de avaliações cujo conjunto de respostas (ou instrumento) muda no flush"""
+    afetadas = set()
+    for objeto in list(session.new) + list(session.deleted):
+        if isinstance(objeto, Resposta):
+            afetadas.add(objeto.avaliacao_id)
+        elif isinstance(objeto, Avaliacao) and objeto in session.new:
+            afetadas.add(objeto.id)
+
+    for objeto in session.dirty:
+        if isinstance(objeto, Resposta):
+            if inspect(objeto).attrs.questao_id.history.has_changes():
+                afetadas.add(objeto.avaliacao_id)
+        elif isinstance(objeto, Avaliacao):
+            if inspect(objeto).attrs.instrumento_id.history.has_changes():
+                afetadas.add(objeto.id)
+
+    afetadas.discard(None)
+    return afetadas
+
+
+def expirar_progresso(session, avaliacao_ids=(), instrumento_ids=()):
+    """Descarta os contadores em memória das avaliações recalculadas"""
+    for objeto in list(session.identity_map.values()):
+        if isinstance(objeto, Avaliacao) and (objeto.id in avaliacao_ids or objeto.instrumento_id in instrumento_ids):
+            session.expire(objeto, ['questoes_respondidas', 'total_questoes'])
+
+
+@event.listens_for(db.session, 'before_flush')
+def _bloquear_avaliacoes(session, flush_context, instances):
+    # Respostas gravadas pelo ORM: bloqueia as avaliações antes do INSERT (ver bloquear_avaliacoes)
+    afetadas = _avaliacoes_afetadas(session)
+    if afetadas:
+        RespostaService.bloquear_avaliacoes(afetadas, connection=session.connection())
+
+
+@event.listens_for(db.session, 'after_flush')
+def _atualizar_progresso(session, flush_context):
+    # Respostas gravadas pelo ORM (ex: avaliacoes.responder); o upsert em lote recalcula diretamente
+    afetadas = _avaliacoes_afetadas(session)
+    if afetadas:
+        RespostaService.recalcular_progresso(afetadas, connection=session.connection())
+        expirar_progresso(session, afetadas)
@@ -0,0 +1,95 @@
+"""
+Service de carregamento do usuário autenticado com cache na sessão
+"""
+import time
+from flask import current_app, has_request_context, session
+from sqlalchemy.orm import make_transient_to_detached
+from app import db
+from app.models.user import User
+
+
+# Instante da última alteração administrativa de cada usuário (neste processo)
+_invalidacoes = {}
+
+CHAVE_SESSAO = '_usuario_cache'
+CAMPOS = ('id', 'username', 'email', 'nome_completo', 'tipo', 'ativo')
+
+
+class UsuarioSessaoService:
+    """Evita a consulta à tabela users em cada requisição autenticada"""
+
+    @staticmethod
+    def carregar(user_id):
+        """
+        Carrega o usuário para o Flask-Login
+
+        Identidade, perfil e status ficam na sessão (cookie assinado) por
+        USUARIO_CACHE_TTL segundos. Dentro desse prazo o usuário é reconstruído
+        sem consulta; alterações feitas pelo admin neste processo descartam o
+        cache imediatamente, e nos demais processos ao fim do prazo.
+
+        Args:
+            user_id: ID armazenado pelo Flask-Login
+
+        Returns:
+            User ou None se não existir ou estiver inativo
+        """
+        user_id = int(user_id)
+        dados = UsuarioSessaoService._dados_validos(user_id)
+
+        if dados is None:
+            user = db.session.get(User, user_id)
+            if user is None or not user.ativo:
+                UsuarioSessaoService._descartar()
+                return None
+            UsuarioSessaoService._guardar(user)
+            return user
+
+        if not dados['ativo']:
+            return None
+        return UsuarioSessaoService._reconstruir(dados)
+
+    @staticmethod
+    def invalidar(user_id):
+        """Descarta o cache do usuário após edição, desativação ou reativação"""
+        _invalidacoes[int(user_id)] = time.time()
+
+    @staticmethod
+    def _dados_validos(user_id):
+        if not has_request_context():
+            return None
+
+        dados = session.get(CHAVE_SESSAO)
+        if not dados or dados.get('id') != user_id:
+            return None
+
+        criado = dados.get('criado', 0)
+        ttl = current_app.config.get('USUARIO_CACHE_TTL', 60)
+        if time.time() - criado > ttl or criado <= _invalidacoes.get(user_id, 0):
+            return None
+        return dados
+
+    @staticmethod
+    def _guardar(user):
+        if not has_request_context():
+            return
+        dados = {campo: getattr(user, campo) for campo in CAMPOS}
+        dados['criado'] = time.time()
+        session[CHAVE_SESSAO] = dados
+
+    @staticmethod
+    def _descartar():
+        if has_request_context():
+            session.pop(CHAVE_SESSAO, None)
+
+    @staticmethod
+    def _reconstruir(dados):
+        """
+        Instância persistente do usuário montada a partir da sessão
+
+        Os demais atributos (ex: ultimo_acesso) e relacionamentos são carregados
+        sob demanda, como em qualquer objeto da sessão do SQLAlchemy.
+        """
+        user = User(**{campo: dados[campo] for campo in CAMPOS})
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
@@ -0,0 +1,168 @@
+"""
+Paginação por chave (keyset) e contagens aproximadas para listagens grandes
+"""
+import base64
+import json
+from datetime import date, datetime
+from sqlalchemy import Row, tuple_
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from app import db
+
+
+class PaginaCursor:
+    """
+    Página de uma listagem paginada por chave
+
+    Em vez de OFFSET, cada página começa depois (ou antes) da chave da última
+    (ou primeira) linha da página vizinha: o custo não cresce com a profundidade.
+    """
+
+    def __init__(self, items, proximo=None, anterior=None, total=None, total_aproximado=False):
+        self.items = items
+        self.next_cursor = proximo
+        self.prev_cursor = anterior
+        self.total = total
+        self.total_aproximado = total_aproximado
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def codificar_cursor(valores):
+    """Token opaco (base64 de JSON) com os valores da chave de uma linha"""
+    valores = [v.isoformat() if isinstance(v, (date, datetime)) else v for v in valores]
+    return base64.urlsafe_b64encode(json.dumps(valores).encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(token, colunas):
+    """
+    Valores da chave a partir do token, convertidos pelo tipo de cada coluna
+
+    Returns:
+        list ou None se o token for inválido
+    """
+    try:
+        dados = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        valores = json.loads(dados)
+        if not isinstance(valores, list) or len(valores) != len(colunas):
+            return None
+
+        convertidos = []
+        for coluna, valor in zip(colunas, valores):
+            tipo = coluna.type.python_type
+            if tipo is datetime:
+                valor = datetime.fromisoformat(valor)
+            elif tipo is date:
+                valor = date.fromisoformat(valor)
+            else:
+                valor = tipo(valor)
+            convertidos.append(valor)
+        return convertidos
+    except (ValueError, TypeError, NotImplementedError):
+        return None
+
+
+def paginar_por_chave(query, colunas, por_pagina=20, apos=None, antes=None, descendente=False):
+    """
+    Pagina a query pela chave `colunas` (a última deve ser única, ex: id)
+
+    Args:
+        query: Query do SQLAlchemy (sem ordenação); com add_columns, a entidade
+            principal deve ser a primeira
+        colunas: Colunas da chave de ordenação, ex: (Paciente.nome, Paciente.id)
+        por_pagina: Linhas por página
+        apos: Token da última linha da página anterior (avançar)
+        antes: Token da primeira linha da página seguinte (voltar)
+        descendente: Ordena da maior para a menor chave
+
+    Returns:
+        PaginaCursor (sem total; ver contar)
+    """
+    chave = tuple_(*colunas)
+    voltando = False
+    inicio = None
+    if antes:
+        inicio = decodificar_cursor(antes, colunas)
+        voltando = inicio is not None
+    if inicio is None and apos:
+        inicio = decodificar_cursor(apos, colunas)
+
+    # Voltar é avançar na ordem inversa e reverter o resultado
+    inverter = descendente != voltando
+    if inicio is not None:
+        limite = tuple_(*inicio)
+        query = query.filter(chave < limite if inverter else chave > limite)
+    ordem = [coluna.desc() if inverter else coluna.asc() for coluna in colunas]
+
+    linhas = query.order_by(None).order_by(*ordem).limit(por_pagina + 1).all()
+    tem_mais = len(linhas) > por_pagina
+    linhas = linhas[:por_pagina]
+    if voltando:
+        linhas.reverse()
+
+    def token(linha):
+        # Linhas com colunas extras (add_columns): a chave vem da entidade principal
+        if isinstance(linha, Row):
+            linha = linha[0]
+        return codificar_cursor([getattr(linha, coluna.key) for coluna in colunas])
+
+    proximo = anterior = None
+    if linhas:
+        if tem_mais or voltando:
+            proximo = token(linhas[-1])
+        if (tem_mais and voltando) or (inicio is not None and not voltando):
+            anterior = token(linhas[0])
+    return PaginaCursor(linhas, proximo=proximo, anterior=anterior)
+
+
+class _Explain(Executable, ClauseElement):
+    """EXPLAIN de uma consulta (estimativa de linhas do planejador)"""
+    inherit_cache = False
+
+    def __init__(self, consulta):
+        self.consulta = consulta
+
+
+@compiles(_Explain, 'postgresql')
+def _compilar_explain(elemento, compiler, **kw):
+    return 'EXPLAIN (FORMAT JSON) ' + compiler.process(elemento.consulta, **kw)
+
+
+def contar(query, aproximado=False, minimo_exato=1000):
+    """
+    Total de linhas da query
+
+    Com `aproximado`, no PostgreSQL usa a estimativa do planejador (sem varrer
+    as linhas); estimativas abaixo de `minimo_exato` são recontadas exatamente.
+    Nos demais bancos a contagem é sempre exata.
+
+    Args:
+        query: Query do SQLAlchemy
+        aproximado: Aceita uma estimativa
+        minimo_exato: Abaixo deste valor a contagem exata é barata
+
+    Returns:
+        tuple: (total, aproximado)
+    """
+    query = query.order_by(None)
+    if aproximado and db.session.get_bind().dialect.name == 'postgresql':
+        plano = db.session.execute(_Explain(query.statement)).scalar()
+        if isinstance(plano, str):
+            plano = json.loads(plano)
+        estimativa = int(plano[0]['Plan']['Plan Rows'])
+        if estimativa >= minimo_exato:
+            return estimativa, True
+    return query.count(), False
@@ -0,0 +1,40 @@
+"""Add data_expiracao and partial indexes to compartilhamentos_paciente
+
+Revision ID: a3d9e1c7f502
+Revises: f6b2d8e0a914
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3d9e1c7f502'
+down_revision = 'f6b2d8e0a914'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('compartilhamentos_paciente', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('data_expiracao', sa.DateTime(), nullable=True))
+
+    op.create_index(
+        'ix_compartilhamentos_ativos_recebeu', 'compartilhamentos_paciente',
+        ['recebeu_user_id', 'paciente_id'],
+        postgresql_where=sa.text('ativo'), sqlite_where=sa.text('ativo')
+    )
+    op.create_index(
+        'ix_compartilhamentos_ativos_expiracao', 'compartilhamentos_paciente', ['data_expiracao'],
+        postgresql_where=sa.text('ativo AND data_expiracao IS NOT NULL'),
+        sqlite_where=sa.text('ativo AND data_expiracao IS NOT NULL')
+    )
+
+
+def downgrade():
+    op.drop_index('ix_compartilhamentos_ativos_expiracao', table_name='compartilhamentos_paciente')
+    op.drop_index('ix_compartilhamentos_ativos_recebeu', table_name='compartilhamentos_paciente')
+
+    with op.batch_alter_table('compartilhamentos_paciente', schema=None) as batch_op:
+        batch_op.drop_column('data_expiracao')
@@ -0,0 +1,31 @@
+"""Add last progress timestamp to exportacoes_relatorio
+
+Revision ID: a9c3e5f7b102
+Revises: f4a1c7e9d258
+Create Date: 2026-10-20 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9c3e5f7b102'
+down_revision = 'f4a1c7e9d258'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('exportacoes_relatorio', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('data_atualizacao', sa.DateTime(), nullable=True))
+
+    op.execute("UPDATE exportacoes_relatorio SET data_atualizacao = COALESCE(data_conclusao, data_criacao)")
+
+    with op.batch_alter_table('exportacoes_relatorio', schema=None) as batch_op:
+        batch_op.alter_column('data_atualizacao', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('exportacoes_relatorio', schema=None) as batch_op:
+        batch_op.drop_column('data_atualizacao')
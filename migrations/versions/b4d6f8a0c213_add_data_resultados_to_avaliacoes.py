@@ -0,0 +1,34 @@
+"""Add results extraction stamp to avaliacoes
+
+Revision ID: b4d6f8a0c213
+Revises: a9c3e5f7b102
+Create Date: 2026-10-20 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4d6f8a0c213'
+down_revision = 'a9c3e5f7b102'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('avaliacoes', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('data_resultados', sa.DateTime(), nullable=True))
+
+    # Avaliações que já têm resultados armazenados não precisam de nova extração
+    op.execute("""
+        UPDATE avaliacoes SET data_resultados = (
+            SELECT MAX(resultados_dominio.data_atualizacao) FROM resultados_dominio
+            WHERE resultados_dominio.avaliacao_id = avaliacoes.id
+        )
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('avaliacoes', schema=None) as batch_op:
+        batch_op.drop_column('data_resultados')
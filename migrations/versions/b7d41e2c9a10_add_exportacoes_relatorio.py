@@ -0,0 +1,42 @@
+"""Add exportacoes_relatorio table
+
+Revision ID: b7d41e2c9a10
+Revises: ad5f68c6a2b3
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d41e2c9a10'
+down_revision = 'ad5f68c6a2b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'exportacoes_relatorio',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('filtros', sa.JSON(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='pendente'),
+        sa.Column('em_segundo_plano', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('total_avaliacoes', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('avaliacoes_processadas', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('nome_arquivo', sa.String(length=255), nullable=True),
+        sa.Column('tamanho_bytes', sa.Integer(), nullable=True),
+        sa.Column('mensagem_erro', sa.Text(), nullable=True),
+        sa.Column('data_criacao', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+        sa.Column('data_conclusao', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_exportacoes_relatorio_user_id', 'exportacoes_relatorio', ['user_id'])
+
+
+def downgrade():
+    op.drop_index('ix_exportacoes_relatorio_user_id', table_name='exportacoes_relatorio')
+    op.drop_table('exportacoes_relatorio')
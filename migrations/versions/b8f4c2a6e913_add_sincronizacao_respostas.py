@@ -0,0 +1,43 @@
+"""Add offline answer sync (respostas.registrado_em, sincronizacoes_resposta)
+
+Revision ID: b8f4c2a6e913
+Revises: a3d9e1c7f502
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8f4c2a6e913'
+down_revision = 'a3d9e1c7f502'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('respostas', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('registrado_em', sa.DateTime(), nullable=True))
+
+    op.create_table(
+        'sincronizacoes_resposta',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('chave', sa.String(length=64), nullable=False),
+        sa.Column('avaliacao_id', sa.Integer(), nullable=False),
+        sa.Column('questao_id', sa.Integer(), nullable=False),
+        sa.Column('valor', sa.String(length=20), nullable=True),
+        sa.Column('resultado', sa.String(length=20), nullable=False),
+        sa.Column('registrado_em', sa.DateTime(), nullable=True),
+        sa.Column('recebido_em', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['avaliacao_id'], ['avaliacoes.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('avaliacao_id', 'chave', name='uq_sincronizacao_avaliacao_chave')
+    )
+
+
+def downgrade():
+    op.drop_table('sincronizacoes_resposta')
+
+    with op.batch_alter_table('respostas', schema=None) as batch_op:
+        batch_op.drop_column('registrado_em')
@@ -0,0 +1,49 @@
+"""Add resultados_dominio table
+
+Revision ID: c2a9f5d3e871
+Revises: b7d41e2c9a10
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2a9f5d3e871'
+down_revision = 'b7d41e2c9a10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'resultados_dominio',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('avaliacao_id', sa.Integer(), nullable=False),
+        sa.Column('paciente_id', sa.Integer(), nullable=False),
+        sa.Column('instrumento_id', sa.Integer(), nullable=False),
+        sa.Column('data_avaliacao', sa.Date(), nullable=False),
+        sa.Column('dominio_codigo', sa.String(length=50), nullable=False),
+        sa.Column('dominio_nome', sa.String(length=200), nullable=False),
+        sa.Column('ordem', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('escore', sa.Float(), nullable=True),
+        sa.Column('escore_maximo', sa.Float(), nullable=True),
+        sa.Column('t_score', sa.Float(), nullable=True),
+        sa.Column('classificacao', sa.String(length=100), nullable=True),
+        sa.Column('data_atualizacao', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+        sa.ForeignKeyConstraint(['avaliacao_id'], ['avaliacoes.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['paciente_id'], ['pacientes.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['instrumento_id'], ['instrumentos.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('avaliacao_id', 'dominio_codigo', name='uq_resultado_avaliacao_dominio')
+    )
+    op.create_index('ix_resultados_dominio_avaliacao_id', 'resultados_dominio', ['avaliacao_id'])
+    op.create_index('ix_resultados_dominio_paciente_instrumento', 'resultados_dominio',
+                    ['paciente_id', 'instrumento_id', 'data_avaliacao'])
+
+
+def downgrade():
+    op.drop_index('ix_resultados_dominio_paciente_instrumento', table_name='resultados_dominio')
+    op.drop_index('ix_resultados_dominio_avaliacao_id', table_name='resultados_dominio')
+    op.drop_table('resultados_dominio')
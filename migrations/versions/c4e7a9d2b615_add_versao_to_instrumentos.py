@@ -0,0 +1,26 @@
+"""Add versao to instrumentos
+
+Revision ID: c4e7a9d2b615
+Revises: b8f4c2a6e913
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e7a9d2b615'
+down_revision = 'b8f4c2a6e913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('instrumentos', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('versao', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade():
+    with op.batch_alter_table('instrumentos', schema=None) as batch_op:
+        batch_op.drop_column('versao')
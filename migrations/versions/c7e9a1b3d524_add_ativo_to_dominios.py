@@ -0,0 +1,27 @@
+"""Add ativo flag to dominios
+
+Revision ID: c7e9a1b3d524
+Revises: b4d6f8a0c213
+Create Date: 2026-10-20 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e9a1b3d524'
+down_revision = 'b4d6f8a0c213'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Todos os domínios existentes continuam ativos: contadores de progresso não mudam
+    with op.batch_alter_table('dominios', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('ativo', sa.Boolean(), nullable=False, server_default=sa.true()))
+
+
+def downgrade():
+    with op.batch_alter_table('dominios', schema=None) as batch_op:
+        batch_op.drop_column('ativo')
@@ -0,0 +1,45 @@
+"""Add progress counters to avaliacoes
+
+Revision ID: d1b5f8c3e427
+Revises: c4e7a9d2b615
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd1b5f8c3e427'
+down_revision = 'c4e7a9d2b615'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('avaliacoes', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('questoes_respondidas', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('total_questoes', sa.Integer(), nullable=False, server_default='0'))
+
+    # Preenche os contadores das avaliações existentes
+    op.execute("""
+        UPDATE avaliacoes SET
+            total_questoes = (
+                SELECT COUNT(*) FROM questoes
+                JOIN dominios ON dominios.id = questoes.dominio_id
+                WHERE dominios.instrumento_id = avaliacoes.instrumento_id
+                  AND questoes.ativo = TRUE
+            ),
+            questoes_respondidas = (
+                SELECT COUNT(*) FROM respostas
+                JOIN questoes ON questoes.id = respostas.questao_id
+                WHERE respostas.avaliacao_id = avaliacoes.id
+                  AND questoes.ativo = TRUE
+            )
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('avaliacoes', schema=None) as batch_op:
+        batch_op.drop_column('total_questoes')
+        batch_op.drop_column('questoes_respondidas')
@@ -0,0 +1,62 @@
+"""Add acesso_paciente table
+
+Revision ID: d8e3b17f4c52
+Revises: c2a9f5d3e871
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8e3b17f4c52'
+down_revision = 'c2a9f5d3e871'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'acesso_paciente',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('paciente_id', sa.Integer(), nullable=False),
+        sa.Column('nivel', sa.SmallInteger(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['paciente_id'], ['pacientes.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'paciente_id')
+    )
+    op.create_index('ix_acesso_paciente_paciente_id', 'acesso_paciente', ['paciente_id'])
+
+    # Carga inicial a partir das concessões existentes
+    op.execute("""
+        INSERT INTO acesso_paciente (user_id, paciente_id, nivel)
+        SELECT concessoes.user_id, concessoes.paciente_id, MAX(concessoes.grau)
+        FROM (
+            SELECT p.criador_id AS user_id, p.id AS paciente_id,
+                   CASE WHEN EXISTS (
+                       SELECT 1 FROM avaliacoes a
+                       WHERE a.paciente_id = p.id AND a.avaliador_id <> p.criador_id
+                   ) THEN 2 ELSE 3 END AS grau
+            FROM pacientes p
+            UNION ALL
+            SELECT pr.user_id, pr.paciente_id, 2 FROM paciente_responsavel pr
+            UNION ALL
+            SELECT a.avaliador_id, a.paciente_id, 1 FROM avaliacoes a
+            UNION ALL
+            SELECT c.recebeu_user_id, c.paciente_id,
+                   CASE c.tipo_acesso WHEN 'leitura' THEN 1 WHEN 'edicao' THEN 2
+                                      WHEN 'completo' THEN 3 ELSE 0 END
+            FROM compartilhamentos_paciente c
+            WHERE c.ativo
+        ) AS concessoes
+        JOIN pacientes ON pacientes.id = concessoes.paciente_id
+        WHERE concessoes.user_id IS NOT NULL
+        GROUP BY concessoes.user_id, concessoes.paciente_id
+        HAVING MAX(concessoes.grau) > 0
+    """)
+
+
+def downgrade():
+    op.drop_index('ix_acesso_paciente_paciente_id', table_name='acesso_paciente')
+    op.drop_table('acesso_paciente')
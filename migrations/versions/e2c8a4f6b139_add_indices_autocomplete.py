@@ -0,0 +1,50 @@
+"""Add search indexes for patient and evaluator autocomplete
+
+Revision ID: e2c8a4f6b139
+Revises: d1b5f8c3e427
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2c8a4f6b139'
+down_revision = 'd1b5f8c3e427'
+branch_labels = None
+depends_on = None
+
+
+# Índices trigram (PostgreSQL): atendem ILIKE 'termo%' e '% termo%' sem varrer a tabela
+TRIGRAM = (
+    ('ix_pacientes_nome_trgm', 'pacientes', 'nome'),
+    ('ix_pacientes_identificacao_trgm', 'pacientes', 'identificacao'),
+    ('ix_users_nome_completo_trgm', 'users', 'nome_completo'),
+)
+
+
+def upgrade():
+    # Ordenação alfabética das sugestões (todos os bancos); (nome, id) também
+    # é a chave da paginação da listagem de pacientes
+    op.create_index('ix_pacientes_nome_id', 'pacientes', ['nome', 'id'])
+    op.create_index('ix_users_nome_completo', 'users', ['nome_completo'])
+
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for nome, tabela, coluna in TRIGRAM:
+        op.create_index(
+            nome, tabela, [coluna],
+            postgresql_using='gin', postgresql_ops={coluna: 'gin_trgm_ops'}
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for nome, tabela, _ in TRIGRAM:
+            op.drop_index(nome, table_name=tabela)
+
+    op.drop_index('ix_users_nome_completo', table_name='users')
+    op.drop_index('ix_pacientes_nome_id', table_name='pacientes')
@@ -0,0 +1,119 @@
+"""Partition auditoria_acessos by month and add composite indexes
+
+Revision ID: e5a4c0b9d731
+Revises: d8e3b17f4c52
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from datetime import date
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a4c0b9d731'
+down_revision = 'd8e3b17f4c52'
+branch_labels = None
+depends_on = None
+
+
+COLUNAS = ('id, user_id, recurso_tipo, recurso_id, paciente_id, acao, detalhes, '
+           'ip_address, user_agent, data_acesso')
+
+# Partições criadas além do mês corrente (as seguintes ficam a cargo de "flask auditoria-particoes")
+MESES_FUTUROS = 3
+
+
+def _meses(inicio, quantidade):
+    ano, mes = inicio.year, inicio.month
+    for _ in range(quantidade):
+        yield date(ano, mes, 1)
+        ano, mes = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+
+
+def _criar_indices():
+    op.create_index('ix_auditoria_acessos_data_acesso', 'auditoria_acessos', ['data_acesso'])
+    op.create_index('ix_auditoria_acessos_paciente_data', 'auditoria_acessos', ['paciente_id', 'data_acesso'])
+    op.create_index('ix_auditoria_acessos_user_data', 'auditoria_acessos', ['user_id', 'data_acesso'])
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    if bind.dialect.name != 'postgresql':
+        # Sem particionamento nativo: apenas os índices compostos
+        op.create_index('ix_auditoria_acessos_paciente_data', 'auditoria_acessos', ['paciente_id', 'data_acesso'])
+        op.create_index('ix_auditoria_acessos_user_data', 'auditoria_acessos', ['user_id', 'data_acesso'])
+        return
+
+    op.execute('ALTER TABLE auditoria_acessos RENAME TO auditoria_acessos_legado')
+    op.execute('ALTER TABLE auditoria_acessos_legado RENAME CONSTRAINT auditoria_acessos_pkey TO auditoria_acessos_legado_pkey')
+    op.execute('DROP INDEX IF EXISTS ix_auditoria_acessos_data_acesso')
+
+    # A chave primária de uma tabela particionada precisa incluir a chave de partição
+    op.execute("""
+        CREATE TABLE auditoria_acessos (
+            id INTEGER NOT NULL DEFAULT nextval('auditoria_acessos_id_seq'),
+            user_id INTEGER REFERENCES users (id) ON DELETE SET NULL,
+            recurso_tipo VARCHAR(50) NOT NULL,
+            recurso_id INTEGER NOT NULL,
+            paciente_id INTEGER REFERENCES pacientes (id) ON DELETE SET NULL,
+            acao VARCHAR(50) NOT NULL,
+            detalhes TEXT,
+            ip_address VARCHAR(45),
+            user_agent VARCHAR(500),
+            data_acesso TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            PRIMARY KEY (id, data_acesso)
+        ) PARTITION BY RANGE (data_acesso)
+    """)
+    op.execute('ALTER SEQUENCE auditoria_acessos_id_seq OWNED BY auditoria_acessos.id')
+
+    inicio = bind.execute(sa.text('SELECT MIN(data_acesso) FROM auditoria_acessos_legado')).scalar()
+    hoje = date.today()
+    inicio = date(inicio.year, inicio.month, 1) if inicio else date(hoje.year, hoje.month, 1)
+    quantidade = (hoje.year - inicio.year) * 12 + (hoje.month - inicio.month) + 1 + MESES_FUTUROS
+
+    meses = list(_meses(inicio, quantidade + 1))
+    for mes, seguinte in zip(meses, meses[1:]):
+        op.execute(
+            f"CREATE TABLE auditoria_acessos_{mes.year}_{mes.month:02d} PARTITION OF auditoria_acessos "
+            f"FOR VALUES FROM ('{mes.isoformat()}') TO ('{seguinte.isoformat()}')"
+        )
+    op.execute('CREATE TABLE auditoria_acessos_padrao PARTITION OF auditoria_acessos DEFAULT')
+
+    op.execute(f'INSERT INTO auditoria_acessos ({COLUNAS}) SELECT {COLUNAS} FROM auditoria_acessos_legado')
+    op.execute('DROP TABLE auditoria_acessos_legado')
+
+    _criar_indices()
+
+
+def downgrade():
+    bind = op.get_bind()
+
+    if bind.dialect.name != 'postgresql':
+        op.drop_index('ix_auditoria_acessos_user_data', table_name='auditoria_acessos')
+        op.drop_index('ix_auditoria_acessos_paciente_data', table_name='auditoria_acessos')
+        return
+
+    op.execute('ALTER TABLE auditoria_acessos RENAME TO auditoria_acessos_particionada')
+    op.execute("""
+        CREATE TABLE auditoria_acessos (
+            id INTEGER NOT NULL DEFAULT nextval('auditoria_acessos_id_seq'),
+            user_id INTEGER REFERENCES users (id) ON DELETE SET NULL,
+            recurso_tipo VARCHAR(50) NOT NULL,
+            recurso_id INTEGER NOT NULL,
+            paciente_id INTEGER,
+            acao VARCHAR(50) NOT NULL,
+            detalhes TEXT,
+            ip_address VARCHAR(45),
+            user_agent VARCHAR(500),
+            data_acesso TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            CONSTRAINT auditoria_acessos_pkey PRIMARY KEY (id),
+            CONSTRAINT fk_auditoria_acessos_paciente_id FOREIGN KEY (paciente_id)
+                REFERENCES pacientes (id) ON DELETE SET NULL
+        )
+    """)
+    op.execute('ALTER SEQUENCE auditoria_acessos_id_seq OWNED BY auditoria_acessos.id')
+    op.execute(f'INSERT INTO auditoria_acessos ({COLUNAS}) SELECT {COLUNAS} FROM auditoria_acessos_particionada')
+    op.execute('DROP TABLE auditoria_acessos_particionada CASCADE')
+    op.create_index('ix_auditoria_acessos_data_acesso', 'auditoria_acessos', ['data_acesso'])
@@ -0,0 +1,32 @@
+"""Add composite indexes for keyset pagination
+
+Revision ID: f4a1c7e9d258
+Revises: e2c8a4f6b139
+Create Date: 2026-10-19 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4a1c7e9d258'
+down_revision = 'e2c8a4f6b139'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # O índice composto substitui o de coluna única que era prefixo dele;
+    # (nome, id) de pacientes já é criado em e2c8a4f6b139
+    op.create_index('ix_avaliacoes_data_id', 'avaliacoes', ['data_avaliacao', 'id'])
+    op.drop_index('ix_avaliacoes_data_avaliacao', table_name='avaliacoes')
+
+    op.create_index('ix_atendimentos_paciente_data_id', 'atendimentos', ['paciente_id', 'data_hora', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_atendimentos_paciente_data_id', table_name='atendimentos')
+
+    op.create_index('ix_avaliacoes_data_avaliacao', 'avaliacoes', ['data_avaliacao'])
+    op.drop_index('ix_avaliacoes_data_id', table_name='avaliacoes')
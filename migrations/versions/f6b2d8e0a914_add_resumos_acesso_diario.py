@@ -0,0 +1,42 @@
+"""Add resumos_acesso_diario table
+
+Revision ID: f6b2d8e0a914
+Revises: e5a4c0b9d731
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6b2d8e0a914'
+down_revision = 'e5a4c0b9d731'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'resumos_acesso_diario',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('data', sa.Date(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('paciente_id', sa.Integer(), nullable=False),
+        sa.Column('acao', sa.String(length=50), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('primeiro_acesso', sa.DateTime(), nullable=False),
+        sa.Column('ultimo_acesso', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['paciente_id'], ['pacientes.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('data', 'user_id', 'paciente_id', 'acao', name='uq_resumo_acesso_diario')
+    )
+    op.create_index('ix_resumos_acesso_paciente_data', 'resumos_acesso_diario', ['paciente_id', 'data'])
+    op.create_index('ix_resumos_acesso_user_data', 'resumos_acesso_diario', ['user_id', 'data'])
+
+
+def downgrade():
+    op.drop_index('ix_resumos_acesso_user_data', table_name='resumos_acesso_diario')
+    op.drop_index('ix_resumos_acesso_paciente_data', table_name='resumos_acesso_diario')
+    op.drop_table('resumos_acesso_diario')
@@ -62,5 +62,71 @@ def seed():
     print('Módulo Perfil Sensorial carregado com sucesso!')
 
 
+@app.cli.command()
+def reconstruir_acessos():
+    """Reconstrói a tabela materializada de acesso a pacientes"""
+    from app.services.acesso_paciente_service import AcessoPacienteService
+    total = AcessoPacienteService.reconstruir()
+    print(f'Tabela de acessos reconstruída: {total} concessões.')
+
+
+@app.cli.command()
+def expirar_compartilhamentos():
+    """Revoga os compartilhamentos de pacientes com prazo expirado"""
+    from app.services.permission_service import PermissionService
+    total = PermissionService.expirar_compartilhamentos()
+    print(f'Compartilhamentos expirados: {total}.')
+
+
+@app.cli.command()
+def expirar_exportacoes():
+    """Marca com erro as exportações de relatórios interrompidas"""
+    from app.services.exportacao_service import ExportacaoService
+    total = ExportacaoService.interromper_pendentes()
+    print(f'Exportações interrompidas: {total}.')
+
+
+@app.cli.command()
+def reconciliar_progresso():
+    """Recalcula os contadores de progresso de todas as avaliações"""
+    from app.services.resposta_service import RespostaService
+    total = RespostaService.reconciliar_progresso()
+    print(f'Progresso recalculado em {total} avaliações.')
+
+
+@app.cli.command()
+def atualizar_resultados():
+    """Extrai os resultados por domínio das avaliações concluídas que ainda não os têm"""
+    from app.services.evolucao_service import EvolucaoService
+    total = EvolucaoService.atualizar_pendentes()
+    print(f'Resultados extraídos de {total} avaliações.')
+
+
+@app.cli.command()
+def auditoria_particoes():
+    """Cria as partições mensais futuras da auditoria (Postgres)"""
+    from app.services.auditoria_service import AuditoriaService
+    criadas = AuditoriaService.garantir_particoes()
+    print(f'Partições criadas: {", ".join(criadas) if criadas else "nenhuma"}')
+
+
+@app.cli.command()
+def resumir_acessos():
+    """Atualiza os resumos diários de acesso a partir da auditoria"""
+    from app.services.relatorio_acesso_service import RelatorioAcessoService
+    total = RelatorioAcessoService.atualizar()
+    print(f'Resumos de acesso atualizados: {total} linhas.')
+
+
+@app.cli.command()
+def auditoria_arquivar():
+    """Arquiva e remove do banco a auditoria fora do período de retenção"""
+    from app.services.auditoria_service import AuditoriaService
+    arquivos = AuditoriaService.arquivar()
+    for caminho in arquivos:
+        print(f'Arquivado: {caminho}')
+    print(f'{len(arquivos)} mês(es) arquivado(s).')
+
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5001, debug=True)
@@ -9,8 +9,11 @@ from datetime import datetime, date
 from app import create_app, db
 from app.models import (
     User, Paciente, Instrumento, Dominio, Questao,
-    Avaliacao, Resposta, TabelaReferencia, AnexoAvaliacao, Modulo
+    Avaliacao, Resposta, TabelaReferencia, AnexoAvaliacao, Modulo,
+    ExportacaoRelatorio, ResultadoDominio, CompartilhamentoPaciente, AuditoriaAcesso,
+    AcessoPaciente, ResumoAcessoDiario, SincronizacaoResposta
 )
+from app.models.paciente import paciente_responsavel
 
 
 @pytest.fixture(scope='session')
@@ -54,6 +57,9 @@ def db_session(app):
     """Sessão de banco com rollback automático"""
     with app.app_context():
         # Limpar tabelas antes de cada teste
+        db.session.query(ResultadoDominio).delete()
+        db.session.query(ExportacaoRelatorio).delete()
+        db.session.query(SincronizacaoResposta).delete()
         db.session.query(Resposta).delete()
         db.session.query(Avaliacao).delete()
         db.session.query(AnexoAvaliacao).delete()
@@ -62,6 +68,11 @@ def db_session(app):
         db.session.query(TabelaReferencia).delete()
         db.session.query(Instrumento).delete()
         db.session.query(Modulo).delete()
+        db.session.query(AcessoPaciente).delete()
+        db.session.query(ResumoAcessoDiario).delete()
+        db.session.query(CompartilhamentoPaciente).delete()
+        db.session.query(AuditoriaAcesso).delete()
+        db.session.execute(paciente_responsavel.delete())
         db.session.query(Paciente).delete()
         db.session.query(User).delete()
         db.session.commit()
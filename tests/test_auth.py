@@ -104,6 +104,41 @@ class TestAuthentication:
         assert response.status_code == 200
 
 
+    def test_usuario_carregado_da_sessao(self, app, db_session, terapeuta_user):
+        """Loader reutiliza identidade da sessão e respeita invalidação/desativação"""
+        from sqlalchemy import event
+        from app import db
+        from app.services.usuario_sessao_service import UsuarioSessaoService
+
+        user_id = terapeuta_user.id
+        consultas = []
+
+        def contar(conn, cursor, statement, parameters, context, executemany):
+            if 'FROM users' in statement:
+                consultas.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', contar)
+        try:
+            with app.test_request_context('/'):
+                db_session.expunge_all()
+                assert UsuarioSessaoService.carregar(user_id).id == user_id
+                assert len(consultas) == 1
+
+                db_session.expunge_all()
+                user = UsuarioSessaoService.carregar(user_id)
+                assert user.username == 'terapeuta'
+                assert user.is_admin() is False
+                assert len(consultas) == 1
+
+                terapeuta_user = db_session.get(User, user_id)
+                terapeuta_user.ativo = False
+                db_session.commit()
+                UsuarioSessaoService.invalidar(user_id)
+                assert UsuarioSessaoService.carregar(user_id) is None
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', contar)
+
+
 @pytest.mark.unit
 class TestUserModel:
     """Testes do modelo User"""
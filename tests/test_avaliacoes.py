@@ -157,6 +157,63 @@ class TestAvaliacoesCRUD:
         response = logged_terapeuta.get(f'/avaliacoes/{avaliacao.id}')
         assert response.status_code == 200
 
+    def test_visualizar_e_relatorios_com_consultas_limitadas(self, logged_terapeuta, db_session, avaliacao_completa,
+                                                              instrumento):
+        """Detalhe, relatório e PEI devem carregar o grafo em um número fixo de consultas"""
+        from sqlalchemy import event
+        from app import db
+        from app.models import User
+
+        avaliacao_id = avaliacao_completa.id
+        instrumento_id = instrumento.id
+        paginas = {
+            f'/avaliacoes/{avaliacao_id}': 8,
+            f'/relatorios/avaliacao/{avaliacao_id}': 2,
+            f'/relatorios/pei/{avaliacao_id}': 4,
+        }
+
+        def consultas_por_pagina():
+            # Sessão limpa (exceto o usuário logado) para medir o carregamento completo
+            for objeto in list(db_session.identity_map.values()):
+                if not isinstance(objeto, User):
+                    db_session.expunge(objeto)
+
+            consultas = {}
+            for url in paginas:
+                executadas = []
+
+                def registrar(conn, cursor, statement, parameters, context, executemany):
+                    executadas.append(statement)
+
+                event.listen(db.engine, 'before_cursor_execute', registrar)
+                try:
+                    response = logged_terapeuta.get(url)
+                finally:
+                    event.remove(db.engine, 'before_cursor_execute', registrar)
+                assert response.status_code == 200
+                consultas[url] = len(executadas)
+            return consultas
+
+        poucas = consultas_por_pagina()
+
+        # Mais respostas, em outro domínio
+        dominio = Dominio(instrumento_id=instrumento_id, codigo='VIS', nome='Visão', ordem=2, escala_invertida=False)
+        db_session.add(dominio)
+        db_session.flush()
+        for numero in range(1, 11):
+            questao = Questao(dominio_id=dominio.id, numero=numero, numero_global=10 + numero,
+                              texto=f'Questão visual {numero}', ativo=True)
+            db_session.add(questao)
+            db_session.flush()
+            db_session.add(Resposta(avaliacao_id=avaliacao_id, questao_id=questao.id, valor='SEMPRE', pontuacao=1))
+        db_session.commit()
+
+        muitas = consultas_por_pagina()
+
+        assert muitas == poucas
+        for url, limite in paginas.items():
+            assert muitas[url] <= limite, url
+
     def test_visualizar_avaliacao_de_paciente_sem_permissao_negado(self, logged_professor, db_session, terapeuta_user, instrumento):
         """Não pode visualizar avaliação de paciente sem permissão"""
         from app.models import Paciente
@@ -252,6 +309,168 @@ class TestAvaliacaoWorkflow:
         assert resposta.valor == 'NUNCA'
         assert resposta.pontuacao == 4
 
+    def test_salvar_respostas_em_lote(self, logged_terapeuta, db_session, avaliacao, questoes):
+        """Endpoint JSON grava várias respostas de uma vez, atualizando as existentes"""
+        resposta = Resposta(
+            avaliacao_id=avaliacao.id,
+            questao_id=questoes[0].id,
+            valor='SEMPRE',
+            pontuacao=1
+        )
+        db_session.add(resposta)
+        db_session.commit()
+
+        response = logged_terapeuta.post(
+            f'/avaliacoes/{avaliacao.id}/respostas',
+            json={'respostas': {str(q.id): 'NUNCA' for q in questoes}}
+        )
+
+        assert response.status_code == 200
+        dados = response.get_json()
+        assert dados['salvas'] == len(questoes)
+        assert dados['respondidas'] == dados['total'] == len(questoes)
+        assert dados['progresso'] == 100
+
+        respostas = Resposta.query.filter_by(avaliacao_id=avaliacao.id).all()
+        assert len(respostas) == len(questoes)
+        assert {r.valor for r in respostas} == {'NUNCA'}
+        assert {r.pontuacao for r in respostas} == {4}
+
+    def test_responder_em_pagina_unica(self, logged_terapeuta, db_session, avaliacao, questoes):
+        """Página única lista todas as questões com as respostas já dadas marcadas"""
+        db_session.add(Resposta(
+            avaliacao_id=avaliacao.id,
+            questao_id=questoes[2].id,
+            valor='FREQUENTE',
+            pontuacao=2
+        ))
+        db_session.commit()
+
+        response = logged_terapeuta.get(f'/avaliacoes/{avaliacao.id}/responder/pagina')
+
+        assert response.status_code == 200
+        html = response.data.decode()
+        for questao in questoes:
+            assert questao.texto in html
+        assert f'/avaliacoes/{avaliacao.id}/respostas' in html
+        assert '1 de 5 questões' in html
+
+    def test_salvar_respostas_em_lote_rejeita_invalidas(self, logged_terapeuta, db_session, avaliacao, questoes):
+        """Lote com valor inválido ou questão de outro instrumento não grava nada"""
+        response = logged_terapeuta.post(
+            f'/avaliacoes/{avaliacao.id}/respostas',
+            json={'respostas': {str(questoes[0].id): 'NUNCA', str(questoes[1].id): 'TALVEZ', '999999': 'NUNCA'}}
+        )
+
+        assert response.status_code == 400
+        assert set(response.get_json()['erros']) == {str(questoes[1].id), '999999'}
+        assert Resposta.query.filter_by(avaliacao_id=avaliacao.id).count() == 0
+
+    def test_sincronizar_respostas_offline(self, logged_terapeuta, db_session, avaliacao, questoes):
+        """Sincronização aplica o lote, resolve conflitos pelo horário e é idempotente"""
+        db_session.add(Resposta(
+            avaliacao_id=avaliacao.id,
+            questao_id=questoes[1].id,
+            valor='SEMPRE',
+            pontuacao=1,
+            registrado_em=datetime(2030, 1, 1, 12, 0)
+        ))
+        db_session.commit()
+
+        pacote = logged_terapeuta.get(f'/avaliacoes/{avaliacao.id}/pacote').get_json()
+        assert [q[0] for q in pacote['questoes']] == [q.id for q in questoes]
+        assert pacote['escalas'][pacote['questoes'][0][4]][0] == ['NUNCA', 'Nunca']
+        assert pacote['respostas'][str(questoes[1].id)][0] == 'SEMPRE'
+
+        itens = [
+            {'chave': 'disp-1', 'questao_id': questoes[0].id, 'valor': 'NUNCA',
+             'registrado_em': '2030-01-01T10:00:00Z'},
+            {'chave': 'disp-2', 'questao_id': questoes[1].id, 'valor': 'NUNCA',
+             'registrado_em': '2030-01-01T10:00:00Z'},
+            {'chave': 'disp-3', 'questao_id': questoes[2].id, 'valor': 'TALVEZ',
+             'registrado_em': '2030-01-01T10:00:00Z'},
+        ]
+        response = logged_terapeuta.post(f'/avaliacoes/{avaliacao.id}/sincronizar', json={'itens': itens})
+        assert response.status_code == 200
+        resultados = {r['chave']: r for r in response.get_json()['resultados']}
+        assert resultados['disp-1']['resultado'] == 'aplicada'
+        assert resultados['disp-2']['resultado'] == 'conflito'
+        assert resultados['disp-2']['valor'] == 'SEMPRE'
+        assert resultados['disp-3']['resultado'] == 'rejeitada'
+
+        # Reenvio do mesmo lote (ex: resposta perdida pela rede) não grava de novo
+        response = logged_terapeuta.post(f'/avaliacoes/{avaliacao.id}/sincronizar', json={'itens': itens})
+        resultados = {r['chave']: r for r in response.get_json()['resultados']}
+        assert resultados['disp-1']['resultado'] == 'aplicada'
+        assert resultados['disp-1']['duplicado'] is True
+
+        respostas = {r.questao_id: r.valor for r in Resposta.query.filter_by(avaliacao_id=avaliacao.id)}
+        assert respostas == {questoes[0].id: 'NUNCA', questoes[1].id: 'SEMPRE'}
+
+    def test_sincronizar_chave_por_avaliacao_e_rejeitadas_sem_valor(self, logged_terapeuta, db_session,
+                                                                    avaliacao, questoes):
+        """A chave é única por avaliação; itens rejeitados não gravam o valor do cliente"""
+        from app.models import SincronizacaoResposta
+
+        outra = Avaliacao(
+            paciente_id=avaliacao.paciente_id,
+            instrumento_id=avaliacao.instrumento_id,
+            avaliador_id=avaliacao.avaliador_id,
+            data_avaliacao=avaliacao.data_avaliacao,
+            status='em_andamento'
+        )
+        db_session.add(outra)
+        db_session.commit()
+
+        item = {'chave': 'disp-1', 'questao_id': questoes[0].id, 'valor': 'NUNCA',
+                'registrado_em': '2030-01-01T10:00:00Z'}
+        invalido = {'chave': 'disp-2', 'questao_id': 10 ** 12, 'valor': 'X' * 100,
+                    'registrado_em': '2030-01-01T10:00:00Z'}
+
+        response = logged_terapeuta.post(f'/avaliacoes/{avaliacao.id}/sincronizar', json={'itens': [item, invalido]})
+        resultados = {r['chave']: r for r in response.get_json()['resultados']}
+        assert resultados['disp-2']['resultado'] == 'rejeitada'
+
+        response = logged_terapeuta.post(f'/avaliacoes/{outra.id}/sincronizar', json={'itens': [item]})
+        resultado = response.get_json()['resultados'][0]
+        assert resultado['resultado'] == 'aplicada'
+        assert 'duplicado' not in resultado
+        assert Resposta.query.filter_by(avaliacao_id=outra.id).count() == 1
+
+        rejeitado = SincronizacaoResposta.query.filter_by(avaliacao_id=avaliacao.id, chave='disp-2').one()
+        assert rejeitado.valor is None
+        assert rejeitado.questao_id == 0
+
+    def test_responder_usa_pacote_de_questoes_em_cache(self, app, logged_terapeuta, db_session,
+                                                       avaliacao, questoes, instrumento):
+        """Página de resposta não consulta o catálogo; edição do instrumento invalida o pacote"""
+        from app import db
+        from sqlalchemy import event
+
+        assert logged_terapeuta.get(f'/avaliacoes/{avaliacao.id}/responder').status_code == 200
+
+        consultas = []
+
+        def registrar(conn, cursor, statement, parameters, context, executemany):
+            consultas.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', registrar)
+        try:
+            response = logged_terapeuta.get(f'/avaliacoes/{avaliacao.id}/responder')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', registrar)
+
+        assert response.status_code == 200
+        assert not [sql for sql in consultas if 'FROM questoes' in sql or 'FROM dominios' in sql]
+
+        versao = instrumento.versao
+        questoes[0].texto = 'Texto revisado da questão'
+        db_session.commit()
+        assert instrumento.versao == versao + 1
+
+        response = logged_terapeuta.get(f'/avaliacoes/{avaliacao.id}/responder?q=0')
+        assert 'Texto revisado da questão' in response.data.decode()
+
     def test_nao_pode_responder_avaliacao_concluida(self, logged_terapeuta, db_session, avaliacao_completa):
         """Não deve permitir responder avaliação já concluída"""
         response = logged_terapeuta.get(f'/avaliacoes/{avaliacao_completa.id}/responder')
@@ -283,6 +502,77 @@ class TestAvaliacaoWorkflow:
         assert avaliacao.status == 'concluida'
         assert avaliacao.data_conclusao is not None
 
+    def test_finalizar_em_uma_transacao(self, logged_terapeuta, db_session, avaliacao, questoes, monkeypatch):
+        """Finalização deve gravar tudo com um commit e avisar os interessados depois dele"""
+        from sqlalchemy import event
+        from app import db
+        from app.models import ResultadoDominio
+        from app.services.classificacao_service import ClassificacaoService
+        from app.services.finalizacao_service import FinalizacaoService, avaliacao_finalizada
+
+        avaliacao_id = avaliacao.id
+        for questao in questoes:
+            db_session.add(Resposta(avaliacao_id=avaliacao_id, questao_id=questao.id, valor='SEMPRE', pontuacao=1))
+        db_session.commit()
+
+        # Falha no meio do pipeline: nada fica gravado (nem os escores já calculados)
+        def falhar(avaliacao, commit=True):
+            raise RuntimeError('tabela indisponível')
+
+        with monkeypatch.context() as m:
+            m.setattr(ClassificacaoService, 'classificar_avaliacao', staticmethod(falhar))
+            response = logged_terapeuta.post(f'/avaliacoes/{avaliacao_id}/finalizar')
+        assert response.status_code == 200
+
+        db_session.expire_all()
+        avaliacao = db_session.get(Avaliacao, avaliacao_id)
+        assert avaliacao.status == 'em_andamento'
+        assert avaliacao.escore_total is None
+        assert ResultadoDominio.query.filter_by(avaliacao_id=avaliacao_id).count() == 0
+
+        commits = []
+        recebidos = []
+
+        def contar_commit(session):
+            commits.append(session)
+
+        def receber(sender, avaliacao, recalculo):
+            recebidos.append((avaliacao.id, avaliacao.status, recalculo, len(commits)))
+
+        event.listen(db.session, 'after_commit', contar_commit)
+        avaliacao_finalizada.connect(receber)
+        try:
+            FinalizacaoService.finalizar(avaliacao)
+        finally:
+            avaliacao_finalizada.disconnect(receber)
+            event.remove(db.session, 'after_commit', contar_commit)
+
+        assert len(commits) == 1
+        assert recebidos == [(avaliacao_id, 'concluida', False, 1)]
+
+        db_session.expire_all()
+        avaliacao = db_session.get(Avaliacao, avaliacao_id)
+        assert avaliacao.status == 'concluida'
+        assert avaliacao.escore_soc == 5
+        assert avaliacao.data_conclusao is not None
+        assert ResultadoDominio.query.filter_by(avaliacao_id=avaliacao_id).count() > 0
+
+        # Edição de avaliação concluída: respostas e recálculo são confirmados juntos
+        item = {'chave': 'disp-1', 'questao_id': questoes[1].id, 'valor': 'NUNCA',
+                'registrado_em': '2099-01-01T10:00:00Z'}
+        with monkeypatch.context() as m:
+            m.setattr(ClassificacaoService, 'classificar_avaliacao', staticmethod(falhar))
+            response = logged_terapeuta.post(f'/avaliacoes/{avaliacao_id}/respostas',
+                                             json={'respostas': {str(questoes[0].id): 'NUNCA'}})
+            assert response.status_code == 500
+            response = logged_terapeuta.post(f'/avaliacoes/{avaliacao_id}/sincronizar', json={'itens': [item]})
+            assert response.status_code == 500
+
+        db_session.expire_all()
+        valores = {r.questao_id: r.valor for r in Resposta.query.filter_by(avaliacao_id=avaliacao_id)}
+        assert valores[questoes[0].id] == valores[questoes[1].id] == 'SEMPRE'
+        assert db_session.get(Avaliacao, avaliacao_id).escore_soc == 5
+
     def test_nao_pode_finalizar_sem_responder_todas(self, logged_terapeuta, db_session, avaliacao, questoes):
         """Não deve permitir finalizar sem responder todas as questões"""
         # Responder apenas a primeira questão
@@ -359,6 +649,105 @@ class TestAvaliacaoWorkflow:
         response = logged_terapeuta.get(f'/avaliacoes/{avaliacao.id}')
         assert response.status_code == 200
 
+    def test_contadores_de_progresso_mantidos(self, logged_terapeuta, db_session, avaliacao, questoes):
+        """Contadores da avaliação acompanham respostas, lote e questões desativadas"""
+        from app.services.resposta_service import RespostaService
+
+        assert (avaliacao.questoes_respondidas, avaliacao.total_questoes) == (0, len(questoes))
+
+        db_session.add(Resposta(avaliacao_id=avaliacao.id, questao_id=questoes[0].id, valor='SEMPRE', pontuacao=1))
+        db_session.commit()
+        assert avaliacao.questoes_respondidas == 1
+
+        logged_terapeuta.post(
+            f'/avaliacoes/{avaliacao.id}/respostas',
+            json={'respostas': {str(questoes[1].id): 'NUNCA', str(questoes[2].id): 'NUNCA'}}
+        )
+        db_session.refresh(avaliacao)
+        assert avaliacao.questoes_respondidas == 3
+        assert avaliacao.get_progresso_percentual() == 60
+
+        questoes[4].ativo = False
+        db_session.commit()
+        assert (avaliacao.questoes_respondidas, avaliacao.total_questoes) == (3, 4)
+
+        questoes[0].ativo = False
+        db_session.commit()
+        assert (avaliacao.questoes_respondidas, avaliacao.total_questoes) == (2, 3)
+        assert not avaliacao.esta_completa()
+
+        # Reconciliação corrige contadores alterados por fora da aplicação
+        db_session.execute(Avaliacao.__table__.update().values(questoes_respondidas=0, total_questoes=0))
+        db_session.commit()
+        assert RespostaService.reconciliar_progresso() == 1
+        assert (avaliacao.questoes_respondidas, avaliacao.total_questoes) == (2, 3)
+
+    def test_dominio_inativo_fora_do_progresso_e_do_questionario(self, db_session, avaliacao, dominio, questoes):
+        """Questões de domínios desativados não contam no progresso nem aparecem no questionário"""
+        from app.services.questionario_service import QuestionarioService
+        from app.services.resposta_service import RespostaService
+
+        outro = Dominio(instrumento_id=dominio.instrumento_id, codigo='VIS', nome='Visão', ordem=2)
+        db_session.add(outro)
+        db_session.flush()
+        extras = [Questao(dominio_id=outro.id, numero=i, numero_global=5 + i, texto=f'Visão {i}', ativo=True)
+                  for i in (1, 2)]
+        db_session.add_all(extras)
+        db_session.commit()
+
+        db_session.add(Resposta(avaliacao_id=avaliacao.id, questao_id=questoes[0].id, valor='SEMPRE', pontuacao=1))
+        db_session.add(Resposta(avaliacao_id=avaliacao.id, questao_id=extras[0].id, valor='SEMPRE', pontuacao=1))
+        db_session.commit()
+        assert (avaliacao.questoes_respondidas, avaliacao.total_questoes) == (2, 7)
+        assert len(QuestionarioService.obter(avaliacao.instrumento_id).questoes) == 7
+
+        outro.ativo = False
+        db_session.commit()
+        assert (avaliacao.questoes_respondidas, avaliacao.total_questoes) == (1, 5)
+
+        pacote = QuestionarioService.obter(avaliacao.instrumento_id)
+        assert [d.id for d in pacote.dominios] == [dominio.id]
+        assert {questao.id for questao in pacote.questoes} == {questao.id for questao in questoes}
+
+        db_session.execute(Avaliacao.__table__.update().values(questoes_respondidas=0, total_questoes=0))
+        db_session.commit()
+        RespostaService.reconciliar_progresso()
+        assert (avaliacao.questoes_respondidas, avaliacao.total_questoes) == (1, 5)
+
+
+    def test_avaliacao_bloqueada_antes_de_gravar_respostas(self, db_session, avaliacao, questoes):
+        """Escritores de respostas bloqueiam a avaliação antes do INSERT (contadores consistentes)"""
+        from app import db
+        from sqlalchemy import event
+        from app.services.resposta_service import RespostaService
+
+        comandos = []
+
+        def registrar(conn, cursor, statement, parameters, context, executemany):
+            comandos.append(' '.join(statement.split()))
+
+        def posicoes():
+            bloqueio = next(i for i, sql in enumerate(comandos)
+                            if sql.startswith('SELECT avaliacoes.id FROM avaliacoes'))
+            insercao = next(i for i, sql in enumerate(comandos) if sql.startswith('INSERT INTO respostas'))
+            return bloqueio, insercao
+
+        event.listen(db.engine, 'before_cursor_execute', registrar)
+        try:
+            db_session.add(Resposta(avaliacao_id=avaliacao.id, questao_id=questoes[0].id, valor='SEMPRE', pontuacao=1))
+            db_session.commit()
+            bloqueio, insercao = posicoes()
+            assert bloqueio < insercao
+
+            comandos.clear()
+            RespostaService.salvar_lote(avaliacao, {questoes[1].id: 'NUNCA'})
+            bloqueio, insercao = posicoes()
+            assert bloqueio < insercao
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', registrar)
+
+        db_session.refresh(avaliacao)
+        assert avaliacao.questoes_respondidas == 2
 
 @pytest.mark.integration
 class TestAvaliacaoPermissions:
@@ -462,6 +851,28 @@ class TestAvaliacaoFilters:
         response = logged_terapeuta.get(f'/avaliacoes/?paciente_id={p1.id}')
         assert response.status_code == 200
 
+    def test_filtros_usam_autocomplete(self, logged_terapeuta, db_session, terapeuta_user, professor_user, paciente):
+        """Listagem e nova avaliação não devem carregar todos os pacientes e avaliadores"""
+        from app.models import Paciente
+
+        outro = Paciente(nome='Paciente Nao Selecionado', identificacao='NSEL', data_nascimento=date(2015, 1, 1),
+                         sexo='M', criador_id=terapeuta_user.id)
+        db_session.add(outro)
+        db_session.commit()
+
+        response = logged_terapeuta.get(f'/avaliacoes/?paciente_id={paciente.id}')
+        assert response.status_code == 200
+        assert paciente.nome.encode() in response.data
+        assert b'Paciente Nao Selecionado' not in response.data
+        assert professor_user.nome_completo.encode() not in response.data
+
+        response = logged_terapeuta.get(f'/avaliacoes/nova?paciente_id={paciente.id}')
+        assert response.status_code == 200
+        assert b'Paciente Nao Selecionado' not in response.data
+
+        dados = logged_terapeuta.get('/avaliacoes/avaliadores/autocomplete?q=' + professor_user.nome_completo[:3]).get_json()
+        assert professor_user.id in [item['id'] for item in dados['resultados']]
+
     def test_filtrar_paciente_sem_permissao_redireciona(self, logged_professor, db_session, terapeuta_user, instrumento):
         """Filtrar por paciente sem permissão deve negar acesso"""
         from app.models import Paciente
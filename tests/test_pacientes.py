@@ -91,6 +91,132 @@ class TestPacientesCRUD:
         assert b'Silva' in response.data
         assert b'Maria Santos' not in response.data
 
+    def test_autocomplete_pacientes(self, app, logged_terapeuta, db_session, terapeuta_user, professor_user):
+        """Autocomplete deve sugerir só pacientes visíveis, por prefixo, respeitando o limite"""
+        pacientes = [
+            Paciente(nome=f'Ana Souza {i}', identificacao=f'ANA{i}', data_nascimento=date(2015, 1, 1),
+                     sexo='F', criador_id=terapeuta_user.id)
+            for i in range(5)
+        ]
+        pacientes.append(Paciente(nome='Carlos Andrade', identificacao='C100', data_nascimento=date(2015, 1, 1),
+                                  sexo='M', criador_id=terapeuta_user.id))
+        pacientes.append(Paciente(nome='Ana de Outro', identificacao='OUTRO', data_nascimento=date(2015, 1, 1),
+                                  sexo='F', criador_id=professor_user.id))
+        pacientes.append(Paciente(nome='Ana Inativa', identificacao='INATIVA', data_nascimento=date(2015, 1, 1),
+                                  sexo='F', criador_id=terapeuta_user.id, ativo=False))
+        db_session.add_all(pacientes)
+        db_session.commit()
+
+        dados = logged_terapeuta.get('/pacientes/autocomplete?q=ana').get_json()
+        nomes = [item['nome'] for item in dados['resultados']]
+        assert nomes == [f'Ana Souza {i}' for i in range(5)]
+        assert dados['resultados'][0]['texto'].endswith('anos')
+
+        # Início de palavra e identificação
+        nomes = [item['nome'] for item in logged_terapeuta.get('/pacientes/autocomplete?q=andr').get_json()['resultados']]
+        assert nomes == ['Carlos Andrade']
+        nomes = [item['nome'] for item in logged_terapeuta.get('/pacientes/autocomplete?q=c1').get_json()['resultados']]
+        assert nomes == ['Carlos Andrade']
+
+        # Curingas digitados não ampliam a busca
+        assert logged_terapeuta.get('/pacientes/autocomplete?q=%25').get_json()['resultados'] == []
+
+        # Limite pedido e limite máximo da configuração
+        assert len(logged_terapeuta.get('/pacientes/autocomplete?q=ana&limite=2').get_json()['resultados']) == 2
+        app.config['AUTOCOMPLETE_MAX_RESULTADOS'] = 3
+        try:
+            resultados = logged_terapeuta.get('/pacientes/autocomplete?limite=50').get_json()['resultados']
+        finally:
+            app.config['AUTOCOMPLETE_MAX_RESULTADOS'] = 20
+        assert len(resultados) == 3
+
+    def test_listar_pacientes_paginacao_por_chave(self, logged_terapeuta, db_session, terapeuta_user):
+        """Listagem deve navegar por cursor, inclusive com nomes repetidos"""
+        import re
+        from app.utils.paginacao import paginar_por_chave
+
+        # Nomes repetidos: o id desempata a chave
+        db_session.add_all([
+            Paciente(nome=f'Paciente {i // 2:02d}', identificacao=f'PG{i:02d}', data_nascimento=date(2015, 1, 1),
+                     sexo='M', criador_id=terapeuta_user.id)
+            for i in range(20)
+        ])
+        db_session.commit()
+
+        ordenados = [p.id for p in Paciente.query.order_by(Paciente.nome, Paciente.id)]
+        vistos = []
+        pagina = paginar_por_chave(Paciente.query, (Paciente.nome, Paciente.id), por_pagina=6)
+        assert not pagina.has_prev
+        while True:
+            vistos.extend(p.id for p in pagina.items)
+            if not pagina.has_next:
+                break
+            pagina = paginar_por_chave(Paciente.query, (Paciente.nome, Paciente.id), por_pagina=6,
+                                       apos=pagina.next_cursor)
+        assert vistos == ordenados
+
+        # Voltando da última página
+        pagina = paginar_por_chave(Paciente.query, (Paciente.nome, Paciente.id), por_pagina=6,
+                                   antes=pagina.prev_cursor)
+        assert [p.id for p in pagina.items] == ordenados[12:18]
+        assert pagina.has_prev and pagina.has_next
+
+        # Pela rota: 15 por página, link de próxima página com cursor
+        response = logged_terapeuta.get('/pacientes/')
+        assert response.status_code == 200
+        assert b'PG14' in response.data and b'PG15' not in response.data
+        cursor = re.search(rb'apos=([\w-]+)', response.data).group(1).decode()
+
+        response = logged_terapeuta.get(f'/pacientes/?apos={cursor}')
+        assert b'PG15' in response.data and b'PG14' not in response.data
+        assert b'de 20 paciente(s)' in response.data
+
+        # Cursor inválido volta ao início
+        response = logged_terapeuta.get('/pacientes/?apos=invalido')
+        assert response.status_code == 200
+        assert b'PG00' in response.data
+
+    def test_listar_pacientes_consultas_fixas(self, logged_terapeuta, db_session, terapeuta_user, instrumento):
+        """Listagem deve trazer os agregados na consulta da página, sem uma consulta por paciente"""
+        from sqlalchemy import event
+        from app import db
+
+        def criar(quantidade, inicio):
+            for i in range(inicio, inicio + quantidade):
+                p = Paciente(nome=f'Agregado {i:02d}', identificacao=f'AG{i:02d}',
+                             data_nascimento=date(2015, 1, 1), sexo='M', criador_id=terapeuta_user.id)
+                db_session.add(p)
+                db_session.flush()
+                for dia in (1, 2 + i):
+                    db_session.add(Avaliacao(paciente_id=p.id, instrumento_id=instrumento.id,
+                                             avaliador_id=terapeuta_user.id,
+                                             data_avaliacao=date(2024, 3, dia), status='em_andamento'))
+            db_session.commit()
+
+        def consultas_da_listagem():
+            consultas = []
+
+            def registrar(conn, cursor, statement, parameters, context, executemany):
+                consultas.append(statement)
+
+            event.listen(db.engine, 'before_cursor_execute', registrar)
+            try:
+                response = logged_terapeuta.get('/pacientes/')
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', registrar)
+            assert response.status_code == 200
+            return response, consultas
+
+        criar(2, 0)
+        _, poucas = consultas_da_listagem()
+
+        criar(10, 2)
+        response, muitas = consultas_da_listagem()
+
+        assert len(muitas) == len(poucas)
+        html = response.data.decode()
+        assert 'última em 13/03/2024' in html  # Agregado 11: avaliações em 01/03 e 13/03
+
     def test_filtrar_pacientes_por_sexo(self, logged_terapeuta, db_session, terapeuta_user):
         """Deve permitir filtrar pacientes por sexo"""
         # Criar pacientes
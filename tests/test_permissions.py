@@ -166,6 +166,343 @@ class TestPermissionService:
 
         assert auditoria is not None
 
+    def test_auditoria_assincrona_grava_em_lote(self, app, db_session, terapeuta_user, paciente):
+        """No modo assíncrono os eventos são gravados em lote; ações LGPD continuam síncronas"""
+        from app.models import AuditoriaAcesso
+        from app.services.auditoria_service import AuditoriaService
+
+        modo_original = app.config['AUDITORIA_MODO']
+        app.config['AUDITORIA_MODO'] = 'assincrono'
+        try:
+            PermissionService.registrar_acesso(terapeuta_user, 'paciente', paciente.id, 'exportar')
+            assert AuditoriaAcesso.query.filter_by(acao='exportar').count() == 1
+
+            for _ in range(5):
+                PermissionService.registrar_acesso(terapeuta_user, 'paciente', paciente.id, 'visualizar')
+            AuditoriaService.descarregar()
+        finally:
+            app.config['AUDITORIA_MODO'] = modo_original
+
+        registros = AuditoriaAcesso.query.filter_by(acao='visualizar').all()
+        assert len(registros) == 5
+        assert all(r.paciente_id == paciente.id for r in registros)
+
+    def test_auditoria_sincrona_nao_confirma_trabalho_do_chamador(self, db_session, terapeuta_user, paciente):
+        """Eventos síncronos usam savepoint: não confirmam nem descartam alterações pendentes"""
+        from app.models import AuditoriaAcesso, Paciente
+
+        paciente_id = paciente.id
+        nome_original = paciente.nome
+
+        # Alteração pendente: o evento acompanha a transação do chamador
+        paciente.nome = 'Nome pendente'
+        PermissionService.registrar_acesso(terapeuta_user, 'paciente', paciente_id, 'excluir')
+        db_session.rollback()
+        assert db_session.get(Paciente, paciente_id).nome == nome_original
+        assert AuditoriaAcesso.query.filter_by(acao='excluir').count() == 0
+
+        # Falha na auditoria desfaz apenas o savepoint
+        paciente = db_session.get(Paciente, paciente_id)
+        paciente.nome = 'Nome mantido'
+        PermissionService.registrar_acesso(terapeuta_user, 'paciente', paciente_id, None)
+        assert paciente.nome == 'Nome mantido'
+        db_session.commit()
+        db_session.expire_all()
+        assert db_session.get(Paciente, paciente_id).nome == 'Nome mantido'
+
+        # Sem trabalho pendente o evento é gravado imediatamente
+        PermissionService.registrar_acesso(terapeuta_user, 'paciente', paciente_id, 'acesso_negado')
+        db_session.rollback()
+        assert AuditoriaAcesso.query.filter_by(acao='acesso_negado').count() == 1
+
+    def test_nivel_acesso_paciente(self, db_session, admin_user, terapeuta_user, professor_user, paciente):
+        """Nível de acesso resolvido para cada origem de permissão"""
+        assert PermissionService.nivel_acesso_paciente(admin_user, paciente.id) == 'completo'
+        assert PermissionService.nivel_acesso_paciente(terapeuta_user, paciente.id) == 'completo'
+        assert PermissionService.nivel_acesso_paciente(professor_user, paciente.id) == 'nenhum'
+
+        PermissionService.compartilhar_paciente(
+            paciente.id, terapeuta_user.id, professor_user.id, 'leitura'
+        )
+        assert PermissionService.nivel_acesso_paciente(professor_user, paciente.id) == 'leitura'
+
+        PermissionService.vincular_responsavel(paciente.id, professor_user.id, 'professor')
+        assert PermissionService.nivel_acesso_paciente(professor_user, paciente.id) == 'edicao'
+
+    def test_nivel_acesso_paciente_em_uma_consulta(self, db_session, terapeuta_user, paciente):
+        """Todas as origens de permissão são avaliadas em uma única consulta"""
+        from sqlalchemy import event
+        from app import db
+
+        paciente_id = paciente.id
+        terapeuta_user.is_admin()
+        consultas = []
+
+        def contar(conn, cursor, statement, parameters, context, executemany):
+            consultas.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', contar)
+        try:
+            nivel = PermissionService.nivel_acesso_paciente(terapeuta_user, paciente_id)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', contar)
+
+        assert nivel == 'completo'
+        assert len(consultas) == 1
+
+    def test_nivel_memorizado_na_requisicao(self, app, db_session, terapeuta_user, professor_user, paciente):
+        """Consultas repetidas na mesma requisição reutilizam o nível; concessões o invalidam"""
+        from sqlalchemy import event
+        from app import db
+
+        paciente_id = paciente.id
+        terapeuta_user.is_admin()
+        professor_user.is_admin()
+        consultas = []
+
+        def contar(conn, cursor, statement, parameters, context, executemany):
+            consultas.append(statement)
+
+        with app.test_request_context('/'):
+            event.listen(db.engine, 'before_cursor_execute', contar)
+            try:
+                for _ in range(3):
+                    assert PermissionService.pode_editar_paciente(terapeuta_user, paciente_id) is True
+                    assert PermissionService.pode_acessar_paciente(terapeuta_user, paciente_id) is True
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', contar)
+            assert len(consultas) == 1
+
+            assert PermissionService.pode_acessar_paciente(professor_user, paciente_id) is False
+            PermissionService.compartilhar_paciente(
+                paciente_id, terapeuta_user.id, professor_user.id, 'leitura'
+            )
+            assert PermissionService.pode_acessar_paciente(professor_user, paciente_id) is True
+
+    def test_niveis_acesso_em_lote(self, db_session, terapeuta_user, professor_user, paciente, instrumento):
+        """Níveis de várias linhas resolvidos com uma única consulta"""
+        from datetime import date
+        from sqlalchemy import event
+        from app import db
+        from app.models import Avaliacao
+
+        outro = Paciente(nome='Outro', identificacao='OUTRO-1', data_nascimento=date(2016, 1, 1),
+                         sexo='F', criador_id=professor_user.id)
+        db_session.add(outro)
+        db_session.commit()
+        PermissionService.compartilhar_paciente(outro.id, professor_user.id, terapeuta_user.id, 'leitura')
+
+        avaliacao = Avaliacao(paciente_id=outro.id, instrumento_id=instrumento.id,
+                              avaliador_id=terapeuta_user.id, data_avaliacao=date.today(),
+                              status='em_andamento')
+        db_session.add(avaliacao)
+        db_session.commit()
+
+        ids = [paciente.id, outro.id, outro.id + 1000]
+        terapeuta_user.is_admin()
+        consultas = []
+
+        def contar(conn, cursor, statement, parameters, context, executemany):
+            consultas.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', contar)
+        try:
+            niveis = PermissionService.niveis_acesso_pacientes(terapeuta_user, ids)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', contar)
+
+        assert len(consultas) == 1
+        assert niveis == {paciente.id: 'completo', outro.id: 'leitura', outro.id + 1000: 'nenhum'}
+
+        # Avaliador da própria avaliação edita mesmo com acesso de leitura ao paciente
+        assert PermissionService.niveis_acesso_avaliacoes(terapeuta_user, [avaliacao.id]) == {
+            avaliacao.id: 'edicao'
+        }
+
+    def test_acesso_paciente_mantido_nas_concessoes(self, db_session, terapeuta_user, professor_user,
+                                                   paciente, instrumento):
+        """Tabela acesso_paciente acompanha criação, compartilhamento, revogação e avaliações"""
+        from datetime import date
+        from app.models import AcessoPaciente, Avaliacao
+        from app.services.acesso_paciente_service import AcessoPacienteService
+
+        def nivel(user):
+            acesso = AcessoPaciente.query.get((user.id, paciente.id))
+            return acesso.nivel if acesso else None
+
+        assert nivel(terapeuta_user) == 3
+        assert nivel(professor_user) is None
+
+        compartilhamento = PermissionService.compartilhar_paciente(
+            paciente.id, terapeuta_user.id, professor_user.id, 'edicao'
+        )
+        assert nivel(professor_user) == 2
+
+        PermissionService.revogar_compartilhamento(compartilhamento.id)
+        assert nivel(professor_user) is None
+
+        db_session.add(Avaliacao(
+            paciente_id=paciente.id,
+            instrumento_id=instrumento.id,
+            avaliador_id=professor_user.id,
+            data_avaliacao=date.today(),
+            status='em_andamento'
+        ))
+        db_session.commit()
+        assert nivel(professor_user) == 1
+        assert nivel(terapeuta_user) == 2  # Criador com avaliações de outros usuários
+
+        filtrados = PermissionService.filtrar_pacientes_por_permissao(Paciente.query, professor_user)
+        assert [p.id for p in filtrados] == [paciente.id]
+
+        esperado = {(a.user_id, a.paciente_id, a.nivel) for a in AcessoPaciente.query}
+        assert AcessoPacienteService.reconstruir() == len(esperado)
+        assert {(a.user_id, a.paciente_id, a.nivel) for a in AcessoPaciente.query} == esperado
+
+    def test_expirar_compartilhamentos(self, db_session, terapeuta_user, professor_user, admin_user, paciente):
+        """Varredura revoga apenas compartilhamentos vencidos e atualiza acesso_paciente"""
+        from datetime import datetime, timedelta
+        from app.models import AcessoPaciente
+
+        vencido = PermissionService.compartilhar_paciente(
+            paciente.id, terapeuta_user.id, professor_user.id, 'leitura',
+            data_expiracao=datetime.utcnow() + timedelta(hours=1)
+        )
+        vigente = PermissionService.compartilhar_paciente(
+            paciente.id, terapeuta_user.id, admin_user.id, 'leitura',
+            data_expiracao=datetime.utcnow() + timedelta(days=1)
+        )
+        assert AcessoPaciente.query.get((professor_user.id, paciente.id)) is not None
+
+        # Varredura executada depois do prazo do primeiro compartilhamento
+        agora = datetime.utcnow() + timedelta(hours=2)
+        assert PermissionService.expirar_compartilhamentos(agora) == 1
+        assert PermissionService.expirar_compartilhamentos(agora) == 0
+
+        db_session.refresh(vencido)
+        db_session.refresh(vigente)
+        assert vencido.ativo is False
+        assert vencido.data_revogacao == agora
+        assert vigente.ativo is True
+        assert AcessoPaciente.query.get((professor_user.id, paciente.id)) is None
+        assert PermissionService.nivel_acesso_paciente(professor_user, paciente.id) == 'nenhum'
+
+    def test_compartilhamento_expirado_nao_concede_acesso(self, db_session, terapeuta_user, professor_user, paciente):
+        """Prazo vencido encerra o acesso mesmo antes da varredura"""
+        from datetime import datetime, timedelta
+        from app.models import AcessoPaciente
+
+        compartilhamento = PermissionService.compartilhar_paciente(
+            paciente.id, terapeuta_user.id, professor_user.id, 'edicao',
+            data_expiracao=datetime.utcnow() - timedelta(minutes=1)
+        )
+
+        assert compartilhamento.ativo is True
+        assert PermissionService.nivel_acesso_paciente(professor_user, paciente.id) == 'nenhum'
+        assert AcessoPaciente.query.get((professor_user.id, paciente.id)) is None
+
+    def test_niveis_em_lote_ignoram_compartilhamento_vencido(self, app, db_session, terapeuta_user,
+                                                            professor_user, paciente, instrumento):
+        """Compartilhamento vencido ainda não varrido não concede acesso nas consultas em lote"""
+        from datetime import date, datetime, timedelta
+        from app.models import AcessoPaciente, Avaliacao
+
+        avaliacao = Avaliacao(paciente_id=paciente.id, instrumento_id=instrumento.id,
+                              avaliador_id=terapeuta_user.id, data_avaliacao=date.today(),
+                              status='em_andamento')
+        db_session.add(avaliacao)
+        compartilhamento = PermissionService.compartilhar_paciente(
+            paciente.id, terapeuta_user.id, professor_user.id, 'edicao',
+            data_expiracao=datetime.utcnow() + timedelta(hours=1)
+        )
+        # O prazo vence depois da materialização (antes da varredura periódica)
+        compartilhamento.data_expiracao = datetime.utcnow() - timedelta(minutes=1)
+        db_session.commit()
+        assert AcessoPaciente.query.get((professor_user.id, paciente.id)).nivel == 2
+
+        with app.test_request_context():
+            assert PermissionService.niveis_acesso_pacientes(professor_user, [paciente.id]) == {
+                paciente.id: 'nenhum'
+            }
+            assert PermissionService.niveis_acesso_avaliacoes(professor_user, [avaliacao.id]) == {
+                avaliacao.id: 'nenhum'
+            }
+            # Os níveis memorizados pela consulta em lote valem para as verificações individuais
+            assert PermissionService.pode_acessar_paciente(professor_user, paciente.id) is False
+            assert PermissionService.pode_editar_avaliacao(professor_user, avaliacao.id) is False
+
+    def test_auditoria_arquivar_fora_da_retencao(self, app, db_session, terapeuta_user, paciente, tmp_path):
+        """Meses fora da retenção vão para JSONL compactado e saem do banco"""
+        import gzip
+        import json
+        from datetime import datetime, timedelta
+        from app.models import AuditoriaAcesso
+        from app.services.auditoria_service import AuditoriaService
+
+        antigo = datetime.utcnow() - timedelta(days=800)
+        for data in (antigo, antigo + timedelta(minutes=1), datetime.utcnow()):
+            db_session.add(AuditoriaAcesso(
+                user_id=terapeuta_user.id, recurso_tipo='paciente', recurso_id=paciente.id,
+                paciente_id=paciente.id, acao='visualizar', data_acesso=data
+            ))
+        db_session.commit()
+
+        pasta_original = app.config.get('AUDITORIA_ARQUIVO_FOLDER')
+        app.config['AUDITORIA_ARQUIVO_FOLDER'] = str(tmp_path)
+        try:
+            arquivos = AuditoriaService.arquivar(meses_retencao=24)
+        finally:
+            app.config['AUDITORIA_ARQUIVO_FOLDER'] = pasta_original
+
+        assert len(arquivos) == 1
+        with gzip.open(arquivos[0], 'rt', encoding='utf-8') as arquivo:
+            linhas = [json.loads(linha) for linha in arquivo]
+        assert len(linhas) == 2
+        assert linhas[0]['paciente_id'] == paciente.id
+
+        assert AuditoriaAcesso.query.count() == 1
+        assert AuditoriaService.consultar(paciente_id=paciente.id).count() == 1
+
+    def test_resumo_acessos_para_revisao(self, db_session, terapeuta_user, professor_user, paciente):
+        """Resumos diários respondem às consultas de revisão e são atualizados de forma incremental"""
+        from datetime import datetime, timedelta
+        from app.models import AuditoriaAcesso, ResumoAcessoDiario
+        from app.services.relatorio_acesso_service import RelatorioAcessoService
+
+        agora = datetime.utcnow()
+        anteontem = datetime.combine(agora.date() - timedelta(days=2), datetime.min.time())
+        for user, data in ((terapeuta_user, anteontem.replace(hour=9)),
+                           (terapeuta_user, anteontem.replace(hour=15)),
+                           (terapeuta_user, agora),
+                           (professor_user, agora)):
+            db_session.add(AuditoriaAcesso(
+                user_id=user.id, recurso_tipo='paciente', recurso_id=paciente.id,
+                acao='visualizar', data_acesso=data
+            ))
+        db_session.commit()
+
+        assert RelatorioAcessoService.atualizar() == 3
+
+        linhas = {linha.user_id: linha for linha in RelatorioAcessoService.acessos_ao_paciente(paciente.id)}
+        assert linhas[terapeuta_user.id].acessos == 3
+        assert linhas[terapeuta_user.id].dias_com_acesso == 2
+        assert linhas[professor_user.id].acessos == 1
+
+        # Novo evento: apenas o último dia é reprocessado
+        db_session.add(AuditoriaAcesso(
+            user_id=professor_user.id, recurso_tipo='paciente', recurso_id=paciente.id,
+            paciente_id=paciente.id, acao='visualizar', data_acesso=agora
+        ))
+        db_session.commit()
+        RelatorioAcessoService.atualizar()
+        assert ResumoAcessoDiario.query.count() == 3
+
+        usuarios = RelatorioAcessoService.usuarios_com_muitos_pacientes(1)
+        assert {linha.user_id: linha.acessos for linha in usuarios} == {
+            terapeuta_user.id: 3, professor_user.id: 2
+        }
+        assert RelatorioAcessoService.usuarios_com_muitos_pacientes(2) == []
+
 
 @pytest.mark.functional
 class TestPermissionRoutes:
@@ -253,3 +590,41 @@ class TestPermissionRoutes:
 
         assert response.status_code == 200
         assert b'compartilhado' in response.data.lower() or b'sucesso' in response.data.lower()
+
+    def test_admin_visualiza_auditoria(self, logged_admin, db_session, terapeuta_user, paciente):
+        """Admin consulta a trilha de auditoria filtrando por paciente"""
+        PermissionService.registrar_acesso(terapeuta_user, 'paciente', paciente.id, 'visualizar')
+
+        response = logged_admin.get(f'/admin/auditoria?paciente_id={paciente.id}')
+        assert response.status_code == 200
+        assert 'visualizar'.encode() in response.data
+        assert terapeuta_user.nome_completo.encode() in response.data
+
+    def test_auditoria_nao_carrega_todos_os_usuarios(self, logged_admin, db_session, admin_user, terapeuta_user,
+                                                     professor_user):
+        """O filtro de usuário usa busca incremental: só o usuário selecionado vem na página"""
+        response = logged_admin.get(f'/admin/auditoria?user_id={terapeuta_user.id}')
+        assert response.status_code == 200
+        assert f'<option value="{terapeuta_user.id}" selected>{terapeuta_user.nome_completo}</option>'.encode() \
+            in response.data
+        assert professor_user.nome_completo.encode() not in response.data
+        assert b'/avaliacoes/avaliadores/autocomplete' in response.data
+
+    def test_admin_exporta_revisao_acessos_csv(self, logged_admin, db_session, terapeuta_user, paciente):
+        """Relatório de revisão de acessos exportado em CSV"""
+        from app.services.relatorio_acesso_service import RelatorioAcessoService
+
+        PermissionService.registrar_acesso(terapeuta_user, 'paciente', paciente.id, 'visualizar')
+        # Os resumos são atualizados pelo job (flask resumir-acessos), não pela página
+        RelatorioAcessoService.atualizar()
+
+        response = logged_admin.get(f'/admin/auditoria/revisao?relatorio=paciente&paciente_id={paciente.id}')
+        assert response.status_code == 200
+        assert terapeuta_user.nome_completo.encode() in response.data
+
+        response = logged_admin.get(
+            f'/admin/auditoria/revisao?relatorio=paciente&paciente_id={paciente.id}&formato=csv'
+        )
+        assert response.status_code == 200
+        assert response.mimetype == 'text/csv'
+        assert terapeuta_user.nome_completo.encode() in response.data
@@ -0,0 +1,365 @@
+"""
+Testes das rotas e serviços de relatórios
+"""
+import os
+import zipfile
+from io import BytesIO
+
+import pytest
+
+from app.models import Resposta, ExportacaoRelatorio
+from app.services.exportacao_service import ExportacaoService
+from app.services.pdf_cache_service import PDFCacheService
+from app.services.pdf_template_service import PDFTemplateService
+
+
+def _gerador_falso(contador):
+    def gerar(avaliacao, destino=None):
+        contador.append(avaliacao.id)
+        if destino is None:
+            return BytesIO(b'%PDF-1.4 relatorio de teste')
+        destino.write(b'%PDF-1.4 relatorio de teste')
+        return destino
+    return gerar
+
+
+@pytest.mark.integration
+class TestPDFCache:
+    """Testes do cache versionado de PDFs"""
+
+    def test_reutiliza_pdf_da_mesma_versao(self, db_session, avaliacao_completa):
+        """Downloads repetidos não devem gerar o PDF novamente"""
+        chamadas = []
+        caminho1, versao1, _ = PDFCacheService.obter_pdf(avaliacao_completa, _gerador_falso(chamadas))
+        caminho2, versao2, _ = PDFCacheService.obter_pdf(avaliacao_completa, _gerador_falso(chamadas))
+
+        assert caminho1 == caminho2
+        assert versao1 == versao2
+        assert len(chamadas) == 1
+        assert os.path.exists(caminho1)
+
+    def test_alteracao_de_resposta_invalida_cache(self, db_session, avaliacao_completa):
+        """Alterar respostas deve remover o PDF armazenado e mudar a versão"""
+        chamadas = []
+        caminho, versao, _ = PDFCacheService.obter_pdf(avaliacao_completa, _gerador_falso(chamadas))
+
+        resposta = Resposta.query.filter_by(avaliacao_id=avaliacao_completa.id).first()
+        resposta.valor = 'NUNCA'
+        resposta.pontuacao = 4
+        db_session.commit()
+
+        assert not os.path.exists(caminho)
+
+        _, nova_versao, _ = PDFCacheService.obter_pdf(avaliacao_completa, _gerador_falso(chamadas))
+        assert nova_versao != versao
+        assert len(chamadas) == 2
+
+    def test_pdf_removido_antes_da_abertura_e_gerado_novamente(self, db_session, avaliacao_completa, monkeypatch):
+        """Um PDF removido por geração/invalidação concorrente deve ser tratado como ausência no cache"""
+        chamadas = []
+        remover_versoes = PDFCacheService._remover_versoes
+
+        def remover_inclusive_a_gerada(diretorio, manter=None):
+            # Simula outra requisição invalidando o cache logo após o os.replace
+            if len(chamadas) == 1:
+                manter = None
+            remover_versoes(diretorio, manter)
+
+        monkeypatch.setattr(PDFCacheService, '_remover_versoes', staticmethod(remover_inclusive_a_gerada))
+
+        arquivo, versao, _ = PDFCacheService.abrir_pdf(avaliacao_completa, _gerador_falso(chamadas))
+        with arquivo:
+            assert arquivo.read().startswith(b'%PDF')
+
+        assert len(chamadas) == 2
+        diretorio = os.path.dirname(PDFCacheService.caminho_arquivo(avaliacao_completa.id, versao))
+        PDFCacheService.invalidar(avaliacao_completa.id)
+        # O diretório permanece para as gerações em andamento
+        assert os.path.isdir(diretorio)
+        assert os.listdir(diretorio) == []
+
+    def test_download_condicional_retorna_304(self, logged_terapeuta, db_session, avaliacao_completa, monkeypatch):
+        """Download com If-None-Match da versão atual deve retornar 304"""
+        from app.services.pdf_service import PDFService
+
+        chamadas = []
+        monkeypatch.setattr(PDFService, 'gerar_relatorio_avaliacao', staticmethod(_gerador_falso(chamadas)))
+
+        url = f'/relatorios/avaliacao/{avaliacao_completa.id}/pdf'
+        response = logged_terapeuta.get(url)
+        assert response.status_code == 200
+        assert response.headers['Content-Type'] == 'application/pdf'
+        etag = response.headers.get('ETag')
+        assert etag
+        assert response.headers.get('Last-Modified')
+        response.close()
+
+        response = logged_terapeuta.get(url, headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert len(chamadas) == 1
+
+
+@pytest.mark.integration
+class TestExportacaoLote:
+    """Testes da exportação em lote de relatórios (ZIP)"""
+
+    def test_gerar_zip_em_blocos(self, tmp_path):
+        """O ZIP deve ser produzido em vários blocos e conter todos os arquivos"""
+        arquivos = []
+        for indice in range(3):
+            caminho = tmp_path / f'relatorio_{indice}.pdf'
+            caminho.write_bytes(os.urandom(ExportacaoService.TAMANHO_BLOCO * 2))
+            arquivos.append((f'paciente/relatorio_{indice}.pdf', str(caminho)))
+
+        blocos = list(ExportacaoService.gerar_zip(arquivos))
+        assert len(blocos) > 3
+
+        with zipfile.ZipFile(BytesIO(b''.join(blocos))) as arquivo_zip:
+            assert arquivo_zip.namelist() == [nome for nome, _ in arquivos]
+            assert arquivo_zip.read('paciente/relatorio_1.pdf') == (tmp_path / 'relatorio_1.pdf').read_bytes()
+
+    def test_exportar_streaming_reutiliza_cache(self, logged_terapeuta, db_session, avaliacao_completa, monkeypatch):
+        """A exportação deve incluir o PDF em cache sem gerá-lo novamente"""
+        from app.services.pdf_service import PDFService
+
+        chamadas = []
+        monkeypatch.setattr(PDFService, 'gerar_relatorio_avaliacao', staticmethod(_gerador_falso(chamadas)))
+        PDFCacheService.obter_pdf(avaliacao_completa)
+
+        response = logged_terapeuta.post('/relatorios/exportar', data={'escola': ''})
+        assert response.status_code == 200
+        assert response.mimetype == 'application/zip'
+
+        with zipfile.ZipFile(BytesIO(response.get_data())) as arquivo_zip:
+            nomes = arquivo_zip.namelist()
+            assert len(nomes) == 1
+            assert arquivo_zip.read(nomes[0]).startswith(b'%PDF')
+
+        assert len(chamadas) == 1
+        exportacao = ExportacaoRelatorio.query.order_by(ExportacaoRelatorio.id.desc()).first()
+        assert exportacao.status == ExportacaoRelatorio.STATUS_CONCLUIDA
+        assert exportacao.avaliacoes_processadas == 1
+
+    def test_exportacao_em_segundo_plano(self, app, db_session, terapeuta_user, avaliacao_completa, monkeypatch):
+        """Exportações grandes geram o ZIP em disco para download posterior"""
+        from app.services.pdf_service import PDFService
+
+        monkeypatch.setattr(PDFService, 'gerar_relatorio_avaliacao', staticmethod(_gerador_falso([])))
+
+        selecao = ExportacaoService.selecionar_avaliacoes(terapeuta_user)
+        exportacao = ExportacaoService.criar_exportacao(terapeuta_user, {}, len(selecao), em_segundo_plano=True)
+        ExportacaoService.executar_em_segundo_plano(app, exportacao.id, selecao)
+
+        db_session.refresh(exportacao)
+        assert exportacao.disponivel
+        with zipfile.ZipFile(ExportacaoService.caminho_arquivo(exportacao)) as arquivo_zip:
+            assert len(arquivo_zip.namelist()) == 1
+
+    def test_exportacao_interrompida_registra_erro(self, app, logged_terapeuta, db_session, terapeuta_user, avaliacao_completa, monkeypatch):
+        """Download interrompido e exportações esquecidas não ficam em processamento"""
+        from datetime import datetime, timedelta
+        from app.services.pdf_service import PDFService
+
+        monkeypatch.setattr(PDFService, 'gerar_relatorio_avaliacao', staticmethod(_gerador_falso([])))
+
+        selecao = ExportacaoService.selecionar_avaliacoes(terapeuta_user)
+        exportacao = ExportacaoService.criar_exportacao(terapeuta_user, {}, len(selecao))
+        gerador = ExportacaoService.gerar_conteudo(exportacao.id, selecao)
+        next(gerador)
+        gerador.close()
+
+        db_session.refresh(exportacao)
+        assert exportacao.status == ExportacaoRelatorio.STATUS_ERRO
+
+        antiga = ExportacaoService.criar_exportacao(terapeuta_user, {}, 1, em_segundo_plano=True)
+        antiga.status = ExportacaoRelatorio.STATUS_PROCESSANDO
+        antiga.data_criacao = antiga.data_atualizacao = datetime.utcnow() - timedelta(days=1)
+        # Criada há muito tempo, mas ainda registrando progresso
+        longa = ExportacaoService.criar_exportacao(terapeuta_user, {}, 1, em_segundo_plano=True)
+        longa.status = ExportacaoRelatorio.STATUS_PROCESSANDO
+        longa.data_criacao = datetime.utcnow() - timedelta(days=1)
+        recente = ExportacaoService.criar_exportacao(terapeuta_user, {}, 1, em_segundo_plano=True)
+        db_session.commit()
+
+        # A listagem não interrompe exportações; apenas o comando periódico
+        assert logged_terapeuta.get('/relatorios/exportar').status_code == 200
+        db_session.refresh(antiga)
+        assert antiga.status == ExportacaoRelatorio.STATUS_PROCESSANDO
+
+        assert ExportacaoService.interromper_pendentes() == 1
+        db_session.refresh(antiga)
+        db_session.refresh(longa)
+        db_session.refresh(recente)
+        assert antiga.status == ExportacaoRelatorio.STATUS_ERRO
+        assert longa.status == ExportacaoRelatorio.STATUS_PROCESSANDO
+        assert recente.status == ExportacaoRelatorio.STATUS_PENDENTE
+
+
+@pytest.mark.integration
+class TestPDFTemplates:
+    """Testes da camada de templates compartilhada pelos relatórios PDF"""
+
+    def test_estilos_construidos_uma_vez(self):
+        """Estilos e presets de tabela devem ser reaproveitados entre documentos"""
+        assert PDFTemplateService.estilos() is PDFTemplateService.estilos()
+        assert PDFTemplateService.estilo_tabela('escores') is PDFTemplateService.estilo_tabela('escores')
+
+        with pytest.raises(ValueError):
+            PDFTemplateService.estilo_tabela('inexistente')
+
+    def test_relatorios_usam_camada_compartilhada(self, db_session, avaliacao_completa, monkeypatch):
+        """Os relatórios de avaliação e do PEI devem ser gerados com os estilos compartilhados"""
+        from app.services.grafico_service import GraficoService
+        from app.services.pdf_service import PDFService
+        from app.services.pei_pdf_service import PeiPDFService
+
+        monkeypatch.setattr(GraficoService, 'obter_grafico_radar', staticmethod(lambda *args, **kwargs: {}))
+        monkeypatch.setattr(GraficoService, 'obter_grafico_barras', staticmethod(lambda *args, **kwargs: {}))
+
+        PDFTemplateService.estilos.cache_clear()
+        avaliacao_completa.relacionamento_respondente = 'mae'
+        relatorio = PDFService.gerar_relatorio_avaliacao(avaliacao_completa)
+        pei = PeiPDFService.gerar_relatorio_pei(avaliacao_completa, [])
+
+        assert relatorio.getvalue().startswith(b'%PDF')
+        assert pei.getvalue().startswith(b'%PDF')
+        assert PDFTemplateService.estilos.cache_info().misses == 1
+
+
+@pytest.mark.integration
+class TestPDFStreaming:
+    """Testes das respostas de PDF gravadas em arquivo temporário"""
+
+    def test_pdf_em_andamento_com_content_length(self, logged_terapeuta, db_session, avaliacao, monkeypatch):
+        """Avaliações não concluídas devem ser enviadas em streaming com Content-Length"""
+        from app.services.pdf_service import PDFService
+
+        chamadas = []
+        monkeypatch.setattr(PDFService, 'gerar_relatorio_avaliacao', staticmethod(_gerador_falso(chamadas)))
+
+        response = logged_terapeuta.get(f'/relatorios/avaliacao/{avaliacao.id}/pdf')
+        assert response.status_code == 200
+        assert response.is_streamed
+        conteudo = response.get_data()
+        assert conteudo.startswith(b'%PDF')
+        assert int(response.headers['Content-Length']) == len(conteudo)
+        response.close()
+
+    def test_arquivo_temporario_vai_para_disco(self, app):
+        """Documentos acima do limite devem sair da memória"""
+        limite_original = app.config['PDF_SPOOL_MAX_BYTES']
+        app.config['PDF_SPOOL_MAX_BYTES'] = 16
+        try:
+            arquivo = PDFTemplateService.arquivo_temporario()
+            arquivo.write(b'x' * 32)
+            assert arquivo._rolled
+            arquivo.close()
+        finally:
+            app.config['PDF_SPOOL_MAX_BYTES'] = limite_original
+
+
+@pytest.mark.integration
+class TestEvolucao:
+    """Testes do motor de evolução longitudinal"""
+
+    def _nova_avaliacao(self, db_session, avaliacao, dias, escore):
+        from datetime import timedelta
+        from app.models import Avaliacao
+
+        nova = Avaliacao(
+            paciente_id=avaliacao.paciente_id,
+            instrumento_id=avaliacao.instrumento_id,
+            avaliador_id=avaliacao.avaliador_id,
+            data_avaliacao=avaliacao.data_avaliacao - timedelta(days=dias),
+            status='concluida',
+            escore_soc=escore,
+            escore_total=escore
+        )
+        db_session.add(nova)
+        db_session.commit()
+        return nova
+
+    def test_serie_armazenada_e_reduzida(self, app, db_session, avaliacao_completa):
+        """A série deve vir dos escores armazenados e respeitar o limite de pontos"""
+        from app.services.evolucao_service import EvolucaoService
+
+        for indice in range(5):
+            self._nova_avaliacao(db_session, avaliacao_completa, dias=30 * (indice + 1), escore=10 + indice)
+
+        atualizadas = EvolucaoService.atualizar_pendentes(avaliacao_completa.paciente_id,
+                                                          avaliacao_completa.instrumento_id)
+        assert atualizadas == 6
+        assert EvolucaoService.atualizar_pendentes(avaliacao_completa.paciente_id,
+                                                   avaliacao_completa.instrumento_id) == 0
+
+        serie = EvolucaoService.obter_serie(avaliacao_completa.paciente_id, avaliacao_completa.instrumento_id,
+                                            limite_pontos=3)
+        assert serie['total_avaliacoes'] == 6
+        assert len(serie['datas']) == 3
+        assert serie['datas'][0] < serie['datas'][-1]
+        assert serie['avaliacao_ids'][-1] == avaliacao_completa.id
+
+        codigo, nome, valores = serie['dominios'][0]
+        assert codigo == 'SOC'
+        assert valores[-1] == 5
+
+    def test_reduzir_pontos_preserva_extremos(self):
+        """A amostragem deve manter a primeira e a última avaliação"""
+        from app.services.evolucao_service import EvolucaoService
+
+        indices = EvolucaoService.reduzir_pontos(100, 10)
+        assert len(indices) == 10
+        assert indices[0] == 0 and indices[-1] == 99
+        assert EvolucaoService.reduzir_pontos(5, 10) == [0, 1, 2, 3, 4]
+
+    def test_grafico_em_cache_ate_nova_avaliacao(self, db_session, avaliacao_completa, monkeypatch):
+        """A figura deve ser reaproveitada até os resultados mudarem"""
+        from app.services.evolucao_service import EvolucaoService
+        from app.services.grafico_service import GraficoService
+
+        chamadas = []
+        original = GraficoService.criar_grafico_evolucao
+
+        def contar(serie, titulo=None):
+            chamadas.append(serie['total_avaliacoes'])
+            return original(serie, titulo)
+
+        monkeypatch.setattr(GraficoService, 'criar_grafico_evolucao', staticmethod(contar))
+
+        instrumento = avaliacao_completa.instrumento
+        EvolucaoService.atualizar_pendentes()
+        primeiro = EvolucaoService.obter_grafico(avaliacao_completa.paciente_id, instrumento)
+        segundo = EvolucaoService.obter_grafico(avaliacao_completa.paciente_id, instrumento)
+        assert primeiro == segundo
+        assert chamadas == [1]
+
+        nova = self._nova_avaliacao(db_session, avaliacao_completa, dias=60, escore=12)
+        EvolucaoService.salvar_resultados(nova)
+        EvolucaoService.obter_grafico(avaliacao_completa.paciente_id, instrumento)
+        assert chamadas == [1, 2]
+
+    def test_avaliacao_sem_resultados_nao_fica_pendente(self, db_session, avaliacao_completa, monkeypatch):
+        """A extração sem resultados (ex: COPM sem problemas) deve ser registrada uma única vez"""
+        from app.models import ResultadoDominio
+        from app.services.evolucao_service import EvolucaoService
+
+        monkeypatch.setattr(EvolucaoService, 'extrair_resultados', staticmethod(lambda avaliacao: []))
+
+        # A consulta do gráfico não grava resultados
+        assert EvolucaoService.obter_grafico(avaliacao_completa.paciente_id, avaliacao_completa.instrumento) is None
+        assert avaliacao_completa.data_resultados is None
+
+        assert EvolucaoService.atualizar_pendentes() == 1
+        assert avaliacao_completa.data_resultados is not None
+        assert ResultadoDominio.query.filter_by(avaliacao_id=avaliacao_completa.id).count() == 0
+        assert EvolucaoService.atualizar_pendentes() == 0
+
+    def test_rota_evolucao(self, logged_terapeuta, db_session, avaliacao_completa):
+        """A página de evolução deve exibir o gráfico do instrumento"""
+        from app.services.evolucao_service import EvolucaoService
+
+        EvolucaoService.atualizar_pendentes()
+        response = logged_terapeuta.get(f'/relatorios/evolucao/{avaliacao_completa.paciente_id}'
+                                        f'?instrumento_id={avaliacao_completa.instrumento_id}')
+        assert response.status_code == 200
+        assert 'Evolução - SPM 5-12 anos (Casa)' in response.get_data(as_text=True)